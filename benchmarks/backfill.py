@@ -0,0 +1,109 @@
+"""
+Пропускная способность и память backfill-history.
+
+Генерируется CSV-выгрузка: 4 пары по строке в минуту, последние --rows строк
+до текущего момента (старшие дни ложатся часовыми барами, новые - минутными).
+Каждый прогон - отдельный процесс с пустым каталогом данных; печатаются
+строки/с, пиковый RSS процесса и повторный прогон по той же выгрузке
+(всё - дубликаты). Пиковая память должна зависеть от --batch-sizes, а не
+от размера файла.
+
+Запуск: python benchmarks/backfill.py [--rows 500000] [--batch-sizes 10000,50000]
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+PAIRS = ("BTC_USD", "ETH_USD", "SOL_USD", "EUR_USD")
+
+
+def _write_dump(path: Path, rows: int) -> None:
+    minutes = rows // len(PAIRS) + 1
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    start -= timedelta(minutes=minutes)
+    with path.open("w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["pair", "timestamp", "rate", "source"])
+        for i in range(rows):
+            ts = start + timedelta(minutes=i // len(PAIRS), seconds=i % len(PAIRS))
+            stamp = ts.replace(tzinfo=None).isoformat() + "Z"
+            writer.writerow([PAIRS[i % len(PAIRS)], stamp, 100 + i % 97, "bench"])
+
+
+def _run(dump: Path, batch_size: int) -> dict:
+    from valutatrade_hub.parser_service.history import (
+        get_history_store,
+        read_rate_dump,
+    )
+
+    store = get_history_store()
+    result = {}
+    for label in ("first", "repeat"):
+        started = time.perf_counter()
+        report = store.backfill(read_rate_dump(dump), batch_size=batch_size)
+        elapsed = time.perf_counter() - started
+        result[label] = {
+            "rows_per_s": report["rows"] / elapsed if elapsed else 0.0,
+            "imported": report["imported"],
+            "duplicates": report["duplicates"],
+        }
+    # ru_maxrss: КиБ в Linux, байты в macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_mb"] = maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--batch-sizes", default="10000,50000")
+    parser.add_argument("--dump", help=argparse.SUPPRESS)
+    parser.add_argument("--batch-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.dump:
+        sys.path.insert(0, str(ROOT))
+        print(json.dumps(_run(Path(args.dump), args.batch_size)))
+        return 0
+
+    print(f"{'batch':>7} {'rows':>8} {'rows/s':>9} {'repeat/s':>9} "
+          f"{'imported':>9} {'dups':>8} {'peak MB':>8}")
+    failed = False
+    with tempfile.TemporaryDirectory(prefix="valutatrade-backfill-") as tmp:
+        dump = Path(tmp) / "rates.csv"
+        _write_dump(dump, args.rows)
+        for batch_size in (int(n) for n in args.batch_sizes.split(",")):
+            with tempfile.TemporaryDirectory(dir=tmp) as base_dir:
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--dump", str(dump),
+                     "--batch-size", str(batch_size)],
+                    env=dict(os.environ, VALUTA_BASE_DIR=base_dir),
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    check=True,
+                )
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            first, repeat = r["first"], r["repeat"]
+            # Повторная загрузка той же выгрузки не должна добавить ни строки
+            failed = failed or repeat["imported"] != 0
+            print(f"{batch_size:>7} {args.rows:>8} {first['rows_per_s']:>9.0f} "
+                  f"{repeat['rows_per_s']:>9.0f} {first['imported']:>9} "
+                  f"{repeat['duplicates']:>8} {r['peak_mb']:>8.1f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
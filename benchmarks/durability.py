@@ -0,0 +1,158 @@
+"""
+Пропускная способность и задержка записи при разных уровнях DURABILITY.
+
+Нагрузки (каждая комбинация в отдельном процессе с пустым каталогом данных):
+  trade  - --threads клиентов параллельно покупают через TradingService
+           (CachedStore: запись portfolios.json на каждую сделку)
+  rates  - последовательные обновления курсов: append_history + write_snapshot
+           на --pairs пар в одной группе fsync, как в RatesUpdater.run_update
+
+Уровни: none, fsync, group.
+
+Запуск: python benchmarks/durability.py [--ops 200] [--threads 8]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LEVELS = ("none", "fsync", "group")
+WORKLOADS = ("trade", "rates")
+
+SEED_RATES = {
+    "pairs": {
+        "BTC_USD": {"rate": 77308.0, "updated_at": "2099-01-01T00:00:00Z",
+                    "source": "bench"},
+    },
+    "last_refresh": "2099-01-01T00:00:00Z",
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _trade(ops: int, threads: int) -> List[float]:
+    from valutatrade_hub.infra.database import DatabaseManager
+    from valutatrade_hub.server.service import CachedStore, TradingService
+
+    service = TradingService(CachedStore(DatabaseManager()))
+    tokens = []
+    for i in range(threads):
+        service.register(f"bench{i}", "secret")
+        tokens.append(service.login(f"bench{i}", "secret")["token"])
+
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def client(token: str) -> None:
+        local = []
+        for _ in range(ops):
+            started = time.perf_counter()
+            service.buy(token, "BTC", 0.001)
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=client, args=(t,)) for t in tokens]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return latencies
+
+
+def _rates(ops: int, pairs: int) -> List[float]:
+    from valutatrade_hub.core.durability import deferred_commit
+    from valutatrade_hub.core.rates import Pair
+    from valutatrade_hub.parser_service.storage import append_history, write_snapshot
+
+    latencies = []
+    for i in range(ops):
+        batch = {Pair(f"C{n:03d}", "USD"): 1.0 + i / 1000 + n for n in range(pairs)}
+        started = time.perf_counter()
+        with deferred_commit():
+            append_history(batch, source="bench")
+            write_snapshot(batch, source="bench")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def _run(workload: str, level: str, ops: int, threads: int, pairs: int) -> dict:
+    from valutatrade_hub.infra.settings import get_settings
+
+    get_settings().set("DURABILITY", level)
+    data_dir = Path(get_settings().get("DATA_DIR"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    (data_dir / "rates.json").write_text(json.dumps(SEED_RATES), encoding="utf-8")
+
+    started = time.perf_counter()
+    if workload == "trade":
+        latencies = _trade(ops, threads)
+    else:
+        latencies = _rates(ops, pairs)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "workload": workload,
+        "level": level,
+        "ops": len(latencies),
+        "ops_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--pairs", type=int, default=10)
+    parser.add_argument("--workload", choices=WORKLOADS, help=argparse.SUPPRESS)
+    parser.add_argument("--level", choices=LEVELS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.workload:
+        sys.path.insert(0, str(ROOT))
+        result = _run(args.workload, args.level, args.ops, args.threads, args.pairs)
+        print(json.dumps(result))
+        return 0
+
+    print(f"{'workload':<8} {'level':<6} {'ops':>6} {'ops/s':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for workload in WORKLOADS:
+        for level in LEVELS:
+            with tempfile.TemporaryDirectory(prefix="valutatrade-dur-") as tmp:
+                env = dict(os.environ, VALUTA_BASE_DIR=tmp)
+                proc = subprocess.run(
+                    [sys.executable, __file__, "--workload", workload,
+                     "--level", level, "--ops", str(args.ops),
+                     "--threads", str(args.threads), "--pairs", str(args.pairs)],
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    check=True,
+                )
+            r = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(f"{r['workload']:<8} {r['level']:<6} {r['ops']:>6} "
+                  f"{r['ops_per_s']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+"""
+Масштабирование Hub по потокам: каждый поток - свой пользователь.
+
+Поток повторяет buy 1.0 BTC, sell 0.5 BTC, valuation; пропускная способность
+(операций/с) сравнивается с одним потоком при том же числе операций на
+поток. После прогона проверяется, что баланс каждого пользователя ровно
+0.5 * итераций (потерянные обновления дали бы другое число). Режим
+--same-user направляет все потоки в одного пользователя: сделки идут по
+очереди, баланс тоже должен сойтись.
+
+Уровни DURABILITY: none (упирается в GIL) и group (ожидание fsync идёт
+без блокировок, параллельные сделки делят один fsync). Линейного
+ускорения нет ни на одном уровне: проверяется корректность при
+параллельных сделках, ускорение печатается для сравнения.
+
+Запуск: python benchmarks/hub_stress.py [--iterations 100] [--threads 1,2,4,8]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from valutatrade_hub import Hub  # noqa: E402
+from valutatrade_hub.infra.settings import get_settings  # noqa: E402
+
+LEVELS = ("none", "group")
+
+SEED_RATES = {
+    "pairs": {
+        "BTC_USD": {"rate": 77308.0, "updated_at": "2099-01-01T00:00:00Z",
+                    "source": "bench"},
+    },
+    "last_refresh": "2099-01-01T00:00:00Z",
+}
+
+
+def _run(threads: int, iterations: int, same_user: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="valutatrade-hub-") as tmp:
+        data_dir = Path(tmp) / "data"
+        data_dir.mkdir()
+        (data_dir / "rates.json").write_text(json.dumps(SEED_RATES), encoding="utf-8")
+        hub = Hub(tmp)
+
+        users = 1 if same_user else threads
+        sessions = []
+        for i in range(users):
+            hub.register(f"bench{i}", "secret")
+            sessions.append(hub.login(f"bench{i}", "secret"))
+
+        errors: List[BaseException] = []
+        barrier = threading.Barrier(threads + 1)
+
+        def worker(n: int) -> None:
+            session = sessions[n % users]
+            barrier.wait()
+            try:
+                for _ in range(iterations):
+                    hub.buy(session, "BTC", 1.0)
+                    hub.sell(session, "BTC", 0.5)
+                    hub.valuation(session)
+            except BaseException as exc:
+                errors.append(exc)
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        per_user = iterations * threads // users
+        lost = 0
+        for session in sessions:
+            wallets = {w["currency"]: w for w in hub.valuation(session)["wallets"]}
+            if wallets["BTC"]["balance"] != 0.5 * per_user:
+                lost += 1
+    ops = threads * iterations * 3
+    return {
+        "ops_per_s": ops / elapsed if elapsed else 0.0,
+        "errors": len(errors),
+        "mismatched": lost,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--threads", default="1,2,4,8")
+    parser.add_argument("--same-user", action="store_true")
+    args = parser.parse_args()
+    counts = [int(n) for n in args.threads.split(",")]
+
+    print(f"{'level':<6} {'threads':>7} {'ops/s':>9} {'speedup':>8} "
+          f"{'errors':>7} {'mismatched':>10}")
+    failed = False
+    for level in LEVELS:
+        get_settings().set("DURABILITY", level)
+        single = None
+        for threads in counts:
+            r = _run(threads, args.iterations, args.same_user)
+            single = single or r["ops_per_s"]
+            speedup = r["ops_per_s"] / single if single else 0.0
+            failed = failed or bool(r["errors"] or r["mismatched"])
+            print(f"{level:<6} {threads:>7} {r['ops_per_s']:>9.1f} "
+                  f"{speedup:>7.2f}x {r['errors']:>7} {r['mismatched']:>10}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Пропускная способность массовой регистрации пользователей.
+
+Режимы (каждый в отдельном процессе с пустым каталогом данных):
+  register   - register_user в цикле (--register-users штук, по умолчанию 500,
+               время растёт квадратично, поэтому выборка меньше)
+  import-1   - import_users в один процесс
+  import-N   - import_users с пулом процессов по числу CPU
+
+Запуск: python benchmarks/import_users.py [--users 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = ("register", "import-1", "import-N")
+
+
+def _rows(count: int) -> Iterator[Tuple[str, str]]:
+    for i in range(count):
+        yield f"partner_{i:06d}", f"secret-{i}"
+
+
+def _run_mode(mode: str, users: int) -> dict:
+    from valutatrade_hub.core.usecases import import_users, register_user
+
+    started = time.perf_counter()
+    if mode == "register":
+        for username, password in _rows(users):
+            register_user(username=username, password=password)
+    else:
+        workers = 1 if mode == "import-1" else (os.cpu_count() or 1)
+        import_users(_rows(users), workers=workers)
+    elapsed = time.perf_counter() - started
+
+    return {"mode": mode, "users": users, "seconds": elapsed}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=50000)
+    parser.add_argument("--register-users", type=int, default=500)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        sys.path.insert(0, str(ROOT))
+        print(json.dumps(_run_mode(args.mode, args.users)))
+        return 0
+
+    print(f"{'mode':<10} {'users':>7} {'seconds':>9} {'users/s':>9}")
+    for mode in MODES:
+        users = args.register_users if mode == "register" else args.users
+        with tempfile.TemporaryDirectory(prefix="valutatrade-import-") as tmp:
+            env = dict(os.environ, VALUTA_BASE_DIR=tmp)
+            proc = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--users", str(users)],
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+            )
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        rate = r["users"] / r["seconds"] if r["seconds"] else 0.0
+        print(f"{r['mode']:<10} {r['users']:>7} {r['seconds']:>9.2f} {rate:>9.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Нагрузочный генератор для локального API (команда serve).
+
+Для каждого уровня конкурентности создаёт по пользователю на клиента,
+затем клиенты параллельно шлют смесь get-rate / buy / show-portfolio.
+Печатает запросы в секунду и перцентили задержки (p50, p99).
+
+По умолчанию поднимает сервер в этом же процессе во временном каталоге
+данных. С --url работает против уже запущенного сервера.
+
+Запуск: python benchmarks/loadgen.py [--clients 1,8,64] [--requests 200]
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SEED_RATES = {
+    "pairs": {
+        "BTC_USD": {"rate": 77308.0, "updated_at": "2026-01-01T00:00:00Z",
+                    "source": "loadgen"},
+        "ETH_USD": {"rate": 2312.3, "updated_at": "2026-01-01T00:00:00Z",
+                    "source": "loadgen"},
+        "EUR_USD": {"rate": 1.08, "updated_at": "2026-01-01T00:00:00Z",
+                    "source": "loadgen"},
+    },
+    "last_refresh": "2026-01-01T00:00:00Z",
+}
+
+
+def _call(
+        host: str,
+        port: int,
+        command: str,
+        payload: Dict[str, Any],
+        token: Optional[str] = None,
+) -> Tuple[int, Dict[str, Any]]:
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    headers = {"Content-Type": "application/json"}
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    try:
+        conn.request("POST", f"/api/{command}", json.dumps(payload), headers)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _client_loop(
+        host: str,
+        port: int,
+        token: str,
+        requests: int,
+        latencies: List[float],
+        errors: List[int],
+) -> None:
+    ops = (
+        ("get-rate", {"from": "BTC", "to": "USD"}),
+        ("buy", {"currency": "BTC", "amount": 0.01}),
+        ("get-rate", {"from": "EUR", "to": "USD"}),
+        ("show-portfolio", {"base": "USD"}),
+    )
+    local: List[float] = []
+    failed = 0
+    for i in range(requests):
+        command, payload = ops[i % len(ops)]
+        started = time.perf_counter()
+        status, _ = _call(host, port, command, payload, token)
+        local.append(time.perf_counter() - started)
+        if status != 200:
+            failed += 1
+    latencies.extend(local)
+    errors.append(failed)
+
+
+def run_level(host: str, port: int, clients: int, requests: int, run_id: str) -> Dict:
+    tokens = []
+    for i in range(clients):
+        username = f"load_{run_id}_{clients}_{i}"
+        _call(host, port, "register", {"username": username, "password": "pass1234"})
+        status, body = _call(
+            host, port, "login", {"username": username, "password": "pass1234"}
+        )
+        if status != 200:
+            raise RuntimeError(f"login failed: {body}")
+        tokens.append(body["token"])
+
+    latencies: List[float] = []
+    errors: List[int] = []
+    threads = [
+        threading.Thread(
+            target=_client_loop,
+            args=(host, port, token, requests, latencies, errors),
+        )
+        for token in tokens
+    ]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", default="1,8,64")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="запросов на одного клиента")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--url", default=None,
+                        help="адрес запущенного сервера, например http://127.0.0.1:8765")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        parsed = urlparse(args.url)
+        host, port = parsed.hostname or "127.0.0.1", parsed.port or 80
+    else:
+        # Каталог данных задаётся до первого обращения к SettingsLoader
+        base_dir = Path(tempfile.mkdtemp(prefix="valutatrade-load-"))
+        (base_dir / "data").mkdir()
+        (base_dir / "data" / "rates.json").write_text(
+            json.dumps(SEED_RATES), encoding="utf-8"
+        )
+        os.environ["VALUTA_BASE_DIR"] = str(base_dir)
+        sys.path.insert(0, str(ROOT))
+        from valutatrade_hub.server.api import create_server
+
+        server = create_server("127.0.0.1", 0, args.workers)
+        host, port = server.server_address[:2]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"in-process server on {host}:{port}, data in {base_dir}")
+
+    run_id = str(int(time.time()))
+    print(f"{'clients':>8} {'requests':>9} {'errors':>7} {'rps':>9} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for clients in (int(c) for c in args.clients.split(",")):
+            r = run_level(host, port, clients, args.requests, run_id)
+            print(f"{r['clients']:>8} {r['requests']:>9} {r['errors']:>7} "
+                  f"{r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
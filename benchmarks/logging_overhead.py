@@ -0,0 +1,108 @@
+"""
+Накладные расходы log_action на один вызов при разных схемах логирования.
+
+Режимы (каждый в отдельном процессе, с чистой настройкой logging):
+  baseline       - функция без декоратора
+  null           - декоратор, обработчиков нет (только сборка записей)
+  sync           - файл JSON Lines + консоль в вызывающем потоке
+  async          - QueueHandler/QueueListener (по умолчанию в приложении)
+  async-sampled  - async + LOG_SAMPLE_RATE=0.1
+
+Консольный вывод дочерних процессов отправляется в /dev/null.
+
+Запуск: python benchmarks/logging_overhead.py [--calls N]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = ("baseline", "null", "sync", "async", "async-sampled")
+
+RESULT = (
+    "Покупка выполнена: 0.0100 BTC\n"
+    "Изменения в портфеле:\n"
+    "- BTC: было 1.0000 → стало 1.0100\n"
+    "Оценочная стоимость покупки: 773.08 USD"
+)
+
+
+def _run_mode(mode: str, calls: int) -> dict:
+    import logging
+
+    from valutatrade_hub.decorators import log_action
+    from valutatrade_hub.infra.settings import get_settings
+    from valutatrade_hub.logging_config import configure_logging
+
+    def trade(currency_code: str, amount: float, username: str) -> str:
+        return RESULT
+
+    settings = get_settings()
+    if mode == "null":
+        logging.getLogger().setLevel(logging.INFO)
+        logging.getLogger().addHandler(logging.NullHandler())
+    elif mode in ("sync", "async", "async-sampled"):
+        settings.set("LOG_ASYNC", mode != "sync")
+        settings.set("LOG_SAMPLE_RATE", 0.1 if mode == "async-sampled" else 1.0)
+        configure_logging()
+
+    func = trade if mode == "baseline" else log_action("BUY", verbose=True)(trade)
+
+    started = time.perf_counter()
+    for _ in range(calls):
+        func(currency_code="BTC", amount=0.01, username="bench")
+    elapsed = time.perf_counter() - started
+
+    # Время, за которое фоновый поток дописывает очередь
+    drain_started = time.perf_counter()
+    from valutatrade_hub import logging_config
+
+    logging_config._stop_listener()
+    drain = time.perf_counter() - drain_started
+
+    return {
+        "mode": mode,
+        "us_per_call": elapsed / calls * 1e6,
+        "drain_ms": drain * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        sys.path.insert(0, str(ROOT))
+        print(json.dumps(_run_mode(args.mode, args.calls)))
+        return 0
+
+    print(f"{'mode':<14} {'us/call':>9} {'drain ms':>9}")
+    for mode in MODES:
+        with tempfile.TemporaryDirectory(prefix="valutatrade-log-") as tmp:
+            env = dict(os.environ, VALUTA_BASE_DIR=tmp)
+            proc = subprocess.run(
+                [sys.executable, __file__, "--mode", mode,
+                 "--calls", str(args.calls)],
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+            )
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{r['mode']:<14} {r['us_per_call']:>9.2f} {r['drain_ms']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
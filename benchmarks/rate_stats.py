@@ -0,0 +1,85 @@
+"""
+Онлайн-статистика курсов в RatesUpdater: цена тика и качество карантина.
+
+RateFilter.filter замеряется на --ticks тиков (не меньше 100 на пару)
+для 10, 1 000 и 10 000 пар: время на тик не должно расти с числом пар
+и длиной истории. По каждой паре идёт геометрическое броуновское
+блуждание (сигма 0,3% за тик), в котором доля --spike-share тиков заменена
+скачком x0.5-x3 (или нулём); печатается доля пойманных скачков
+и нормальных тиков, ушедших в карантин.
+
+Запуск: python benchmarks/rate_stats.py [--ticks 200000] [--spike-share 0.001]
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _series(rng: random.Random, pairs: list, ticks: int, spike_share: float):
+    # -> [(пара, курс, скачок ли)]
+    levels = {pair: 100.0 for pair in pairs}
+    for i in range(ticks):
+        pair = pairs[i % len(pairs)]
+        levels[pair] *= math.exp(rng.gauss(0.0, 0.003))
+        # Скачки - после разогрева: RATES_OUTLIER_MIN_SAMPLES тиков пары
+        if i // len(pairs) >= 25 and rng.random() < spike_share:
+            factor = rng.choice((0.0, 0.5, 2.0, 3.0))
+            yield pair, levels[pair] * factor, True
+        else:
+            yield pair, levels[pair], False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ticks", type=int, default=200000)
+    parser.add_argument("--spike-share", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="valutatrade-rate-stats-") as tmp:
+        os.environ["VALUTA_BASE_DIR"] = tmp
+        (Path(tmp) / "data").mkdir()
+
+        from valutatrade_hub.core.rates import Pair
+        from valutatrade_hub.parser_service.rate_stats import RateFilter
+
+        print(f"{'pairs':>6} {'ticks':>8} {'us/tick':>8} {'spikes':>7} "
+              f"{'caught':>7} {'false q':>8}")
+        failed = False
+        for count in (10, 1000, 10000):
+            pairs = [Pair(f"C{i}", "USD") for i in range(count)]
+            total = max(args.ticks, 100 * count)
+            ticks = list(_series(
+                random.Random(count), pairs, total, args.spike_share
+            ))
+            rate_filter = RateFilter()
+            caught = false_hits = spikes = 0
+            started = time.perf_counter()
+            for pair, rate, spike in ticks:
+                accepted, _ = rate_filter.filter({pair: rate})
+                if spike:
+                    spikes += 1
+                    caught += not accepted
+                elif not accepted:
+                    false_hits += 1
+            elapsed = time.perf_counter() - started
+            normal = len(ticks) - spikes
+            print(f"{count:>6} {len(ticks):>8} "
+                  f"{elapsed / len(ticks) * 1e6:>8.2f} {spikes:>7} "
+                  f"{caught / max(spikes, 1):>7.1%} "
+                  f"{false_hits / max(normal, 1):>8.3%}")
+            failed = failed or caught < spikes
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Ребалансировка всей книги портфелей: время по этапам и базовая линия.
+
+В пустом каталоге данных создаются --users портфелей по 2-5 валют из CODES.
+rebalance_portfolios(all_users=True) замеряется с --dry-run (загрузка и
+расчёт ордеров) и с применением (buy/sell по лотам и одна запись
+portfolios.json). Для сравнения первые --baseline-orders ордеров проводятся
+через buy_currency/sell_currency, где каждая сделка перезаписывает файл,
+и время пересчитывается на все ордера.
+
+Запуск: python benchmarks/rebalance.py [--users 20000] [--baseline-orders 10]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+CODES = ("USD", "EUR", "BTC", "ETH", "SOL", "GBP")
+PRICES = {"EUR": 1.08, "BTC": 77308.0, "ETH": 2510.0, "SOL": 98.5, "GBP": 1.27}
+TARGETS = "USD=40,BTC=30,ETH=20,SOL=10"
+
+
+def _seed(data_dir: Path, users: int) -> None:
+    from valutatrade_hub.core.models import Portfolio, User
+    from valutatrade_hub.infra.database import DatabaseManager
+
+    stamp = "2099-01-01T00:00:00Z"
+    rates = {
+        "pairs": {
+            f"{code}_USD": {"rate": rate, "updated_at": stamp, "source": "bench"}
+            for code, rate in PRICES.items()
+        },
+        "last_refresh": stamp,
+        "version": 1,
+    }
+    (data_dir / "rates.json").write_text(json.dumps(rates), encoding="utf-8")
+
+    rng = random.Random(7)
+    db = DatabaseManager()
+    portfolios = []
+    for user_id in range(1, users + 1):
+        wallets = {
+            code: {"balance": rng.uniform(1, 10_000) / PRICES.get(code, 1.0)}
+            for code in rng.sample(CODES, rng.randint(2, 5))
+        }
+        portfolios.append(Portfolio(user_id=user_id, wallets=wallets))
+    db.save_portfolios(portfolios)
+    db.save_users([
+        User(user_id=user_id, username=f"bench{user_id}", hashed_password="-",
+             salt="-", registration_date=None)
+        for user_id in range(1, users + 1)
+    ])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--baseline-orders", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="valutatrade-rebalance-") as tmp:
+        os.environ["VALUTA_BASE_DIR"] = tmp
+        data_dir = Path(tmp) / "data"
+        data_dir.mkdir()
+        _seed(data_dir, args.users)
+
+        from valutatrade_hub.core.rebalance import parse_targets
+        from valutatrade_hub.core.usecases import (
+            buy_currency,
+            rebalance_portfolios,
+            sell_currency,
+        )
+
+        targets = parse_targets(TARGETS)
+        started = time.perf_counter()
+        plan = rebalance_portfolios(targets, all_users=True, dry_run=True)
+        dry_run = time.perf_counter() - started
+
+        started = time.perf_counter()
+        rebalance_portfolios(targets, all_users=True)
+        applied = time.perf_counter() - started
+        orders = plan["orders"]
+
+        again = rebalance_portfolios(targets, all_users=True, dry_run=True)
+
+        # Базовая линия: те же ордера по одному через торговый путь CLI
+        _seed(data_dir, args.users)
+        sample = orders[:args.baseline_orders]
+        started = time.perf_counter()
+        for order in sample:
+            trade = buy_currency if order.side == "buy" else sell_currency
+            trade(currency_code=order.currency_code, amount=order.amount,
+                  username=f"bench{order.user_id}")
+        per_order = (time.perf_counter() - started) / max(len(sample), 1)
+
+    print(f"users: {args.users}, orders: {len(orders)}")
+    print(f"{'dry-run (load + plan)':<28} {dry_run * 1000:>10.1f} ms")
+    print(f"{'apply (plan + trades + commit)':<28} {applied * 1000:>10.1f} ms")
+    print(f"{'buy/sell per order':<28} {per_order * 1000:>10.1f} ms "
+          f"(~{per_order * len(orders):.0f} s for all orders)")
+    print(f"orders left after apply: {len(again['orders'])}")
+    return 1 if again["orders"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Воспроизведение записанной нагрузки CLI: задержки по командам и пропускная способность.
+
+Запись: VALUTA_RECORD_WORKLOAD=workload.jsonl python main.py <команда> ...
+(или интерактивная сессия). Пароли в записи заменены на <redacted>.
+
+Нагрузка выполняется в отдельном процессе на временном каталоге данных
+(копия --data, если задан), без сети: update-rates пропускается, фоновое
+обновление устаревших курсов выключено. Для сравнения версий кода:
+  python benchmarks/replay.py workload.jsonl --speed max --json before.json
+  python benchmarks/replay.py workload.jsonl --speed max --compare before.json
+
+Запуск: python benchmarks/replay.py WORKLOAD [--speed 1|10|max] [--data DIR]
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _parse_speed(value: str) -> Optional[float]:
+    if value == "max":
+        return None
+    speed = float(value)
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed должен быть > 0 или max")
+    return speed
+
+
+def _child(workload: Path, speed: Optional[float], include_network: bool) -> dict:
+    from valutatrade_hub.cli.interface import run_cli
+    from valutatrade_hub.infra.settings import get_settings
+    from valutatrade_hub.logging_config import configure_logging
+    from valutatrade_hub.workload import load_workload, replay, summarize
+
+    # Без сети: иначе задержки зависят от внешних API
+    get_settings().set("RATES_REVALIDATE", False)
+    configure_logging()
+    entries = load_workload(workload)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        result = replay(entries, run_cli, speed=speed, include_network=include_network)
+    return summarize(result)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("workload", type=Path)
+    parser.add_argument("--speed", type=_parse_speed, default=1.0)
+    parser.add_argument("--data", type=Path, help="исходный каталог data/")
+    parser.add_argument("--include-network", action="store_true")
+    parser.add_argument("--json", type=Path, help="сохранить результат")
+    parser.add_argument("--compare", type=Path, help="результат прошлого прогона")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.path.insert(0, str(ROOT))
+        summary = _child(args.workload.resolve(), args.speed, args.include_network)
+        print(json.dumps(summary))
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="valutatrade-replay-") as tmp:
+        if args.data:
+            shutil.copytree(args.data, Path(tmp) / "data")
+        env = dict(os.environ, VALUTA_BASE_DIR=tmp)
+        # Воспроизведение не должно дописывать саму нагрузку
+        env.pop("VALUTA_RECORD_WORKLOAD", None)
+        cmd = [sys.executable, __file__, str(args.workload.resolve()), "--child",
+               "--speed", "max" if args.speed is None else str(args.speed)]
+        if args.include_network:
+            cmd.append("--include-network")
+        proc = subprocess.run(
+            cmd,
+            env=env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            check=True,
+        )
+    summary = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    sys.path.insert(0, str(ROOT))
+    from valutatrade_hub.workload import format_summary
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+    print(format_summary(summary, baseline))
+    if args.json:
+        args.json.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
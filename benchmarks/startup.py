@@ -0,0 +1,94 @@
+"""
+Бенчмарк старта CLI на основе `python -X importtime`.
+
+Запускает импорт точки входа несколько раз в отдельных процессах,
+берёт медиану кумулятивного времени импорта и сравнивает с бюджетом.
+Дополнительно проверяет, что тяжёлые модули не попадают в старт.
+
+Запуск: python benchmarks/startup.py [--runs N] [--budget-ms MS]
+Код возврата 1, если бюджет превышен или загружен запрещённый модуль.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_MODULE = "main"
+
+DEFAULT_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "120"))
+
+# Модули, которые должны подгружаться только командами, где они нужны
+FORBIDDEN_PREFIXES: Tuple[str, ...] = (
+    "requests",
+    "urllib3",
+    "prettytable",
+    "numpy",
+    "valutatrade_hub.parser_service",
+)
+
+
+def _measure_once() -> Tuple[float, List[str]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {ENTRY_MODULE}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative: Dict[str, int] = {}
+    modules: List[str] = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _self_us, cum_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        modules.append(name)
+        cumulative[name] = int(cum_us)
+    return cumulative.get(ENTRY_MODULE, 0) / 1000.0, modules
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    args = parser.parse_args()
+
+    timings: List[float] = []
+    loaded: set[str] = set()
+    for _ in range(args.runs):
+        ms, modules = _measure_once()
+        timings.append(ms)
+        loaded.update(modules)
+
+    median = statistics.median(timings)
+    print(
+        f"startup import '{ENTRY_MODULE}': median {median:.1f} ms, "
+        f"min {min(timings):.1f} ms, max {max(timings):.1f} ms "
+        f"({args.runs} runs, budget {args.budget_ms:.0f} ms)"
+    )
+
+    failed = False
+    forbidden = sorted(
+        m for m in loaded
+        if any(m == p or m.startswith(p + ".") for p in FORBIDDEN_PREFIXES)
+    )
+    if forbidden:
+        print("FAIL: heavy modules imported at startup: " + ", ".join(forbidden))
+        failed = True
+    if median > args.budget_ms:
+        print(f"FAIL: startup budget exceeded ({median:.1f} > {args.budget_ms} ms)")
+        failed = True
+    if not failed:
+        print("OK")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""
+Задержка тик -> rates.json у потокового клиента при разных микробатчах.
+
+Локальный FeedSimulator шлёт --rate тиков в секунду в течение --seconds,
+каждые --drop-every секунд рвёт соединения (клиент переподключается
+с resume_from). Режимы (каждый в отдельном процессе с пустым каталогом данных):
+  per-tick  - батч из одного тика (запись на каждый тик)
+  50ms      - STREAM_BATCH_MAX_DELAY = 0.05
+  200ms     - STREAM_BATCH_MAX_DELAY = 0.2 (по умолчанию)
+Для сравнения: при опросе раз в interval секунд средняя задержка - interval/2.
+
+Запуск: python benchmarks/streaming.py [--rate 200] [--seconds 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+MODES = {
+    "per-tick": (1, 0.0),
+    "50ms": (500, 0.05),
+    "200ms": (500, 0.2),
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _run_mode(mode: str, rate: float, seconds: float, drop_every: float) -> dict:
+    from valutatrade_hub.parser_service.config import ParserConfig
+    from valutatrade_hub.parser_service.simulator import FeedSimulator
+    from valutatrade_hub.parser_service.streaming import NdjsonStreamClient
+    from valutatrade_hub.parser_service.updater import RatesUpdater
+
+    max_ticks, max_delay = MODES[mode]
+    config = ParserConfig(
+        STREAM_BATCH_MAX_TICKS=max_ticks,
+        STREAM_BATCH_MAX_DELAY=max_delay,
+        STREAM_RECONNECT_MAX_DELAY=0.5,
+    )
+    latencies: List[float] = []
+    feed = FeedSimulator(rate=rate, seed=1)
+    host, port = feed.start(generate=False)
+    client = NdjsonStreamClient(config, host=host, port=port)
+    updater = RatesUpdater([])
+    stop = threading.Event()
+    consumer = threading.Thread(
+        target=client.run,
+        args=(lambda pairs: updater.publish(pairs, client.source), stop,
+              latencies.extend),
+    )
+    consumer.start()
+    time.sleep(0.2)
+
+    interval = 1.0 / rate
+    started = time.monotonic()
+    next_drop = started + drop_every
+    next_at = started
+    while time.monotonic() - started < seconds:
+        feed.emit()
+        if drop_every and time.monotonic() >= next_drop:
+            feed.drop_connections()
+            next_drop += drop_every
+        next_at += interval
+        delay = next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    # Дать клиенту дочитать и сбросить последний батч
+    deadline = time.monotonic() + 5
+    while client.last_seq != feed.seq and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(max_delay + 0.1)
+    stop.set()
+    consumer.join()
+    feed.stop()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "sent": feed.seq,
+        "received": client.stats["ticks"],
+        "batches": client.stats["batches"],
+        "reconnects": client.stats["reconnects"],
+        "duplicates": client.stats["duplicates"],
+        "p50_ms": _percentile(latencies, 50) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--drop-every", type=float, default=2.0)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        sys.path.insert(0, str(ROOT))
+        result = _run_mode(args.mode, args.rate, args.seconds, args.drop_every)
+        print(json.dumps(result))
+        return 0
+
+    print(f"{'mode':<9} {'sent':>6} {'recv':>6} {'batches':>8} {'reconn':>7} "
+          f"{'dups':>5} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in MODES:
+        with tempfile.TemporaryDirectory(prefix="valutatrade-stream-") as tmp:
+            env = dict(os.environ, VALUTA_BASE_DIR=tmp)
+            proc = subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--rate", str(args.rate),
+                 "--seconds", str(args.seconds),
+                 "--drop-every", str(args.drop_every)],
+                env=env,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                check=True,
+            )
+        r = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{r['mode']:<9} {r['sent']:>6} {r['received']:>6} "
+              f"{r['batches']:>8} {r['reconnects']:>7} {r['duplicates']:>5} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,12 @@
+import sys
+
 from valutatrade_hub.cli.interface import run_cli
 from valutatrade_hub.logging_config import configure_logging
 
 
 def main() -> None:
     configure_logging()
-    run_cli()
+    run_cli(sys.argv[1:])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.settings import SettingsLoader
+from valutatrade_hub.server.service import CachedStore
+
+
+@pytest.fixture
+def stores(tmp_path):
+    settings = SettingsLoader.isolated(tmp_path)
+    store = CachedStore(DatabaseManager.isolated(settings))
+    for name in ("alice", "bob"):
+        usecases.register_user(name, "secret", db=store)
+    # Второй писатель - как CLI или run-scheduler в другом процессе
+    return store, DatabaseManager.isolated(settings)
+
+
+def _user_id(db, username):
+    return db.get_user_by_username(username).user_id
+
+
+def _deposit(db, username, code, amount):
+    portfolio = db.get_portfolio_by_user_id(_user_id(db, username))
+    portfolio.add_currency(code).deposit(amount)
+    db.save_portfolio(portfolio)
+
+
+def _balance(db, username, code):
+    wallet = db.get_portfolio_by_user_id(_user_id(db, username)).get_wallet(code)
+    return wallet.balance if wallet else 0.0
+
+
+def test_external_portfolio_write_survives_store_save(stores):
+    store, other = stores
+    store.get_portfolio_by_user_id(_user_id(store, "alice"))
+
+    _deposit(other, "alice", "BTC", 1.5)
+    _deposit(store, "bob", "ETH", 2.0)
+
+    assert _balance(other, "alice", "BTC") == 1.5
+    assert _balance(other, "bob", "ETH") == 2.0
+    assert _balance(store, "alice", "BTC") == 1.5
+
+
+def test_external_user_write_survives_store_save(stores):
+    store, other = stores
+    usecases.register_user("carol", "secret", db=other)
+
+    assert store.get_user_by_username("carol") is not None
+    usecases.register_user("dave", "secret", db=store)
+    assert {u.username for u in other.load_users()} == {
+        "alice", "bob", "carol", "dave",
+    }
+
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core.exceptions import CircuitOpenError
+from valutatrade_hub.parser_service import circuit
+from valutatrade_hub.parser_service.circuit import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreakers,
+    with_circuit_breaker,
+)
+from valutatrade_hub.parser_service.config import ParserConfig
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class _FlakyClient:
+    # Источник курсов, который падает, пока failing=True
+    source = "FlakyClient"
+
+    def __init__(self) -> None:
+        self.config = ParserConfig(
+            CIRCUIT_FAILURE_THRESHOLD=2, CIRCUIT_COOLDOWN_SECONDS=60.0,
+            REQUEST_TIMEOUT=5,
+        )
+        self.failing = True
+        self.calls = 0
+
+    @with_circuit_breaker
+    def fetch_rates(self):
+        self.calls += 1
+        if self.failing:
+            raise ConnectionError("недоступен")
+        return {}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(circuit, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def breakers(tmp_path, monkeypatch, clock):
+    breakers = CircuitBreakers(tmp_path / "circuit_breakers.json")
+    monkeypatch.setattr(circuit, "_BREAKERS", breakers)
+    return breakers
+
+
+def _state(breakers: CircuitBreakers) -> str:
+    return breakers.states()[_FlakyClient.source]["state"]
+
+
+def test_open_half_open_closed(breakers, clock):
+    client = _FlakyClient()
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            client.fetch_rates()
+    assert _state(breakers) == OPEN
+
+    # Открытый автомат не вызывает источник до конца cooldown
+    clock.now += 59
+    with pytest.raises(CircuitOpenError):
+        client.fetch_rates()
+    assert client.calls == 2
+
+    clock.now += 2
+    client.failing = False
+    assert client.fetch_rates() == {}
+    assert client.calls == 3
+    assert _state(breakers) == CLOSED
+
+
+def test_failed_probe_reopens(breakers, clock):
+    client = _FlakyClient()
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            client.fetch_rates()
+    clock.now += 61
+    with pytest.raises(ConnectionError):
+        client.fetch_rates()
+    assert _state(breakers) == OPEN
+    with pytest.raises(CircuitOpenError):
+        client.fetch_rates()
+
+
+def test_hung_probe_times_out(breakers, clock):
+    name = _FlakyClient.source
+    for _ in range(2):
+        breakers.record_failure(name, threshold=2)
+    clock.now += 61
+    breakers.before_call(name, cooldown=60, probe_timeout=10)
+    assert _state(breakers) == HALF_OPEN
+
+    # Пока зонд идёт, остальные вызовы пропускаются
+    with pytest.raises(CircuitOpenError):
+        breakers.before_call(name, cooldown=60, probe_timeout=10)
+    # Зависший зонд не держит автомат полуоткрытым дольше probe_timeout
+    clock.now += 11
+    breakers.before_call(name, cooldown=60, probe_timeout=10)
+    assert _state(breakers) == HALF_OPEN
+
+
+def test_state_is_shared_between_processes(tmp_path, clock):
+    path = tmp_path / "circuit_breakers.json"
+    scheduler, cli = CircuitBreakers(path), CircuitBreakers(path)
+    name = _FlakyClient.source
+    assert cli.states() == {}
+
+    for _ in range(2):
+        scheduler.record_failure(name, threshold=2)
+    with pytest.raises(CircuitOpenError):
+        cli.before_call(name, cooldown=60, probe_timeout=10)
+
+    cli.record_success(name)
+    assert scheduler.states()[name]["state"] == CLOSED
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub.core import durability
+from valutatrade_hub.core.durability import GroupCommitter
+
+
+class _FakeSync:
+    # Вместо fsync: запоминает группы путей. Первая группа ждёт release,
+    # чтобы за время её "fsync" накопились последователи
+    def __init__(self, fail_on=()) -> None:
+        self.batches = []
+        self.fail_on = set(fail_on)
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, paths, mode) -> None:
+        self.batches.append(set(paths))
+        if len(self.batches) == 1:
+            self.entered.set()
+            self.release.wait(5)
+        if len(self.batches) in self.fail_on:
+            raise OSError("fsync: EIO")
+
+
+def _commit_all(committer, paths):
+    errors = {}
+
+    def commit(path):
+        try:
+            committer.commit([path])
+        except OSError as exc:
+            errors[path] = exc
+
+    threads = [threading.Thread(target=commit, args=(p,)) for p in paths]
+    for thread in threads:
+        thread.start()
+    return threads, errors
+
+
+def _wait_pending(committer, count):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with committer._cond:
+            if len(committer._pending) >= count:
+                return
+        time.sleep(0.005)
+    raise AssertionError("followers did not queue")
+
+
+@pytest.fixture
+def sync(monkeypatch):
+    def install(**kwargs):
+        fake = _FakeSync(**kwargs)
+        monkeypatch.setattr(durability, "_sync_files", fake)
+        return fake
+    return install
+
+
+def _run_two_batches(committer, fake, followers):
+    leader, leader_errors = _commit_all(committer, [Path("first")])
+    assert fake.entered.wait(5)
+    threads, errors = _commit_all(committer, followers)
+    _wait_pending(committer, len(followers))
+    fake.release.set()
+    for thread in leader + threads:
+        thread.join(5)
+    return leader_errors, errors
+
+
+def test_followers_share_one_fsync(sync):
+    fake = sync()
+    committer = GroupCommitter(window=0)
+    followers = [Path(f"f{i}") for i in range(8)]
+
+    leader_errors, errors = _run_two_batches(committer, fake, followers)
+
+    assert leader_errors == {} and errors == {}
+    assert fake.batches == [{Path("first")}, set(followers)]
+
+
+def test_failed_batch_raises_in_every_waiter(sync):
+    fake = sync(fail_on={2})
+    committer = GroupCommitter(window=0)
+    followers = [Path(f"f{i}") for i in range(8)]
+
+    leader_errors, errors = _run_two_batches(committer, fake, followers)
+
+    assert leader_errors == {}
+    assert set(errors) == set(followers)
+    # Следующая группа фиксируется как обычно
+    committer.commit([Path("later")])
+    assert fake.batches[-1] == {Path("later")}
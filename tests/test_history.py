@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from valutatrade_hub.core.utils import load_json, save_json
+from valutatrade_hub.parser_service import history
+from valutatrade_hub.parser_service.history import HistoryStore, format_ts
+from valutatrade_hub.parser_service.storage import history_lock
+
+NOW = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+
+def _tick(ts: datetime, rate: float = 100.0) -> dict:
+    return {
+        "id": f"BTC_USD_{format_ts(ts)}",
+        "from_currency": "BTC",
+        "to_currency": "USD",
+        "rate": rate,
+        "timestamp": format_ts(ts),
+        "source": "test",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    raw_file = tmp_path / "exchange_rates.json"
+    ticks = [_tick(NOW - timedelta(days=10, minutes=i)) for i in range(5)]
+    ticks.append(_tick(NOW - timedelta(hours=1)))
+    save_json(raw_file, ticks)
+    return HistoryStore(raw_file, tmp_path / "history")
+
+
+def test_compact_keeps_ticks_appended_meanwhile(store, monkeypatch):
+    append_bars = store._append_bars
+    late = _tick(NOW - timedelta(minutes=1), 101.0)
+
+    def append_and_tick(*args):
+        written = append_bars(*args)
+        # run-scheduler дописывает тик, пока идёт уплотнение
+        with history_lock(store.raw_file).hold(1.0):
+            save_json(store.raw_file, load_json(store.raw_file, []) + [late])
+        return written
+
+    monkeypatch.setattr(store, "_append_bars", append_and_tick)
+    result = store.compact(now=NOW)
+
+    raw = load_json(store.raw_file, [])
+    assert result["raw_archived"] == 5
+    assert [r["timestamp"] for r in raw] == [
+        format_ts(NOW - timedelta(hours=1)), late["timestamp"],
+    ]
+    assert result["raw_remaining"] == 2
+
+
+def test_segment_writers_exclude_each_other(store, monkeypatch):
+    monkeypatch.setattr(history, "_SEGMENTS_LOCK_WAIT_SECONDS", 0.1)
+    assert store._segments_lock.acquire(0)
+    try:
+        with pytest.raises(TimeoutError):
+            store.compact(now=NOW)
+        with pytest.raises(TimeoutError):
+            store.backfill([], now=NOW, is_known_code=lambda code: True)
+        # dry-run только читает и не ждёт
+        assert store.compact(now=NOW, dry_run=True)["raw_archived"] == 5
+    finally:
+        store._segments_lock.release()
+    assert store.compact(now=NOW)["raw_archived"] == 5
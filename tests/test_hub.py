@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+from valutatrade_hub import Hub
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.settings import SettingsLoader, get_settings
+
+# Курс старше RATES_HARD_STALE_SECONDS: без изоляции Hub обновлял бы его
+# синхронно через глобальное хранилище
+STALE_RATES = {
+    "pairs": {
+        "BTC_USD": {"rate": 50000.0, "updated_at": "2000-01-01T00:00:00Z",
+                    "source": "test"},
+    },
+    "last_refresh": "2000-01-01T00:00:00Z",
+}
+
+
+def _hub(base_dir):
+    data_dir = base_dir / "data"
+    data_dir.mkdir(parents=True)
+    (data_dir / "rates.json").write_text(json.dumps(STALE_RATES), encoding="utf-8")
+    return Hub(base_dir)
+
+
+def _listing(path):
+    return sorted(p.name for p in path.iterdir()) if path.exists() else []
+
+
+def test_hub_does_not_revalidate_outside_base_dir(tmp_path, monkeypatch):
+    cwd = tmp_path / "cwd"
+    cwd.mkdir()
+    monkeypatch.chdir(cwd)
+    monkeypatch.delenv("VALUTA_BASE_DIR", raising=False)
+    global_data = Path(get_settings().get("DATA_DIR"))
+    before = _listing(global_data)
+    hub = _hub(tmp_path / "hub")
+    hub.register("alice", "secret")
+    session = hub.login("alice", "secret")
+    hub.buy(session, "BTC", 0.01)
+
+    assert hub.valuation(session)["stale"]
+    assert list(cwd.iterdir()) == []
+    assert _listing(global_data) == before
+
+
+def test_hub_rejects_revalidate(tmp_path):
+    with pytest.raises(ValueError):
+        Hub(tmp_path, RATES_REVALIDATE=True)
+
+
+def test_external_portfolio_write_survives_hub_trade(tmp_path):
+    hub = _hub(tmp_path)
+    for name in ("alice", "bob"):
+        hub.register(name, "secret")
+    alice = hub.login("alice", "secret")
+    bob = hub.login("bob", "secret")
+    hub.valuation(alice)
+
+    # run-scheduler с VALUTA_BASE_DIR на каталог Hub: исполнение ордера
+    scheduler = DatabaseManager.isolated(SettingsLoader.isolated(tmp_path))
+    user_id = scheduler.get_user_by_username("alice").user_id
+    portfolio = scheduler.get_portfolio_by_user_id(user_id)
+    portfolio.add_currency("BTC").deposit(0.5)
+    scheduler.save_portfolio(portfolio)
+
+    hub.buy(bob, "BTC", 0.01)
+
+    stored = scheduler.get_portfolio_by_user_id(user_id).get_wallet("BTC")
+    assert stored.balance == 0.5
+    wallets = {w["currency"]: w for w in hub.valuation(alice)["wallets"]}
+    assert wallets["BTC"]["balance"] == 0.5
+
+
+def test_concurrent_trades_keep_balances(tmp_path):
+    hub = _hub(tmp_path)
+    threads, iterations = 8, 20
+    sessions = []
+    for i in range(threads):
+        hub.register(f"user{i}", "secret")
+        sessions.append(hub.login(f"user{i}", "secret"))
+    errors = []
+
+    def worker(session) -> None:
+        try:
+            for _ in range(iterations):
+                hub.buy(session, "BTC", 0.01)
+                hub.sell(session, "BTC", 0.005)
+        except Exception as exc:
+            errors.append(exc)
+
+    pool = [threading.Thread(target=worker, args=(s,)) for s in sessions]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    assert errors == []
+    for session in sessions:
+        wallets = {w["currency"]: w for w in hub.valuation(session)["wallets"]}
+        assert wallets["BTC"]["balance"] == pytest.approx(0.005 * iterations)
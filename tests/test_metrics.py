@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+from valutatrade_hub.metrics import MetricsRegistry, read_textfile
+
+
+def test_textfile_round_trip(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("trades_total", "Trades").inc(3, side="buy", user='a"b')
+    histogram = registry.histogram("latency_seconds", "Latency")
+    for value in (0.002, 0.02, 0.2, 3.0, 20.0):
+        histogram.observe(value, op="buy")
+    path = tmp_path / "metrics.prom"
+    registry.write_textfile(path)
+
+    restored = read_textfile(path)
+
+    assert restored.format_summary() == registry.format_summary()
+    counts = restored.histogram("latency_seconds").samples()[0][1]
+    assert counts == histogram.samples()[0][1]
+
+
+def test_merge_keeps_one_family_per_name(tmp_path):
+    process = MetricsRegistry()
+    process.counter("trades_total", "Trades").inc(2, side="buy")
+    process.histogram("latency_seconds", "Latency").observe(0.02, op="buy")
+    path = tmp_path / "metrics.prom"
+    process.write_textfile(path)
+    process.counter("trades_total", "Trades").inc(1, side="buy")
+    process.counter("trades_total", "Trades").inc(1, side="sell")
+
+    combined = read_textfile(path)
+    combined.merge(process)
+    rendered = combined.render_prometheus()
+
+    types = [line for line in rendered.splitlines() if line.startswith("# TYPE")]
+    assert sorted(types) == [
+        "# TYPE latency_seconds histogram",
+        "# TYPE trades_total counter",
+    ]
+    assert "# HELP trades_total Trades" in rendered
+    assert 'trades_total{side="buy"} 3.0' in rendered
+    assert 'trades_total{side="sell"} 1.0' in rendered
+    assert 'latency_seconds_count{op="buy"} 1' in rendered
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.core.orders import (
+    BUY,
+    EXECUTED,
+    FAILED,
+    OPEN,
+    SELL,
+    LimitOrder,
+    OrderBook,
+    OrderStore,
+)
+from valutatrade_hub.core.rates import Pair
+from valutatrade_hub.core.utils import save_json
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.settings import SettingsLoader
+
+BTC = Pair("BTC", "USD")
+
+
+def _order(order_id: int, side: str, price: float, user_id: int = 1) -> LimitOrder:
+    return LimitOrder(order_id, user_id, "alice", side, "BTC", 1.0, price)
+
+
+def _crossed(book: OrderBook, price: float) -> list:
+    return [o.order_id for o in book.pop_crossed(BTC, price)]
+
+
+def test_buy_crosses_at_or_below_limit():
+    book = OrderBook([_order(1, BUY, 100.0)])
+    assert _crossed(book, 100.01) == []
+    assert _crossed(book, 100.0) == [1]
+    assert book.open_count() == 0
+
+
+def test_sell_crosses_at_or_above_limit():
+    book = OrderBook([_order(1, SELL, 100.0)])
+    assert _crossed(book, 99.99) == []
+    assert _crossed(book, 100.0) == [1]
+
+
+def test_equal_prices_cross_together_in_arrival_order():
+    book = OrderBook([
+        _order(3, BUY, 100.0), _order(1, BUY, 100.0), _order(2, BUY, 90.0),
+        _order(4, SELL, 100.0), _order(5, SELL, 100.0), _order(6, SELL, 110.0),
+    ])
+    assert _crossed(book, 100.0) == [1, 3, 4, 5]
+    assert book.open_count() == 2
+
+
+def test_cancel_after_trigger_is_rejected():
+    book = OrderBook([_order(1, SELL, 100.0)])
+    [order] = book.pop_crossed(BTC, 100.0)
+    order.close(EXECUTED, price=100.0)
+    with pytest.raises(ValueError):
+        book.cancel(1, user_id=1)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    settings = SettingsLoader.isolated(tmp_path)
+    db = DatabaseManager.isolated(settings)
+    save_json(db.rates_file, {
+        "pairs": {"BTC_USD": {"rate": 100.0, "updated_at": "2099-01-01T00:00:00Z",
+                              "source": "test"}},
+        "last_refresh": "2099-01-01T00:00:00Z",
+    })
+    usecases.register_user("alice", "secret", db=db)
+    store = OrderStore(tmp_path / "orders.json")
+    monkeypatch.setattr(usecases, "get_order_store", lambda: store)
+    user_id = db.get_user_by_username("alice").user_id
+    book = store.book()
+    for order_id, side in ((1, BUY), (2, BUY), (3, BUY)):
+        book.place(LimitOrder(order_id, user_id, "alice", side, "BTC", 1.0, 100.0))
+    store.save()
+    return db, store
+
+
+def test_failed_sell_closes_order_as_failed(env):
+    db, store = env
+    user_id = db.get_user_by_username("alice").user_id
+    store.book().place(LimitOrder(9, user_id, "alice", SELL, "ETH", 1.0, 50.0))
+
+    usecases.execute_triggered_orders({Pair("ETH", "USD"): 50.0}, db=db)
+
+    order = OrderStore(store.path).book().orders[9]
+    assert order.status == FAILED
+    assert order.reason
+
+
+def test_unexecuted_orders_return_to_index_after_error(env, monkeypatch):
+    db, store = env
+    execute = usecases._execute_order
+    calls = []
+
+    def fail_second(order, price, db=None):
+        calls.append(order.order_id)
+        if len(calls) == 2:
+            raise OSError("диск полон")
+        return execute(order, price, db)
+
+    monkeypatch.setattr(usecases, "_execute_order", fail_second)
+    with pytest.raises(OSError):
+        usecases.execute_triggered_orders({BTC: 100.0}, db=db)
+
+    # Исполненная заявка сохранена, остальные снова в индексе открытыми
+    saved = OrderStore(store.path).book().orders
+    assert saved[1].status == EXECUTED
+    assert saved[2].status == OPEN and saved[3].status == OPEN
+    assert sorted(o.order_id for o in store.book().pop_crossed(BTC, 100.0)) == [2, 3]
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+
+from valutatrade_hub.core import usecases
+from valutatrade_hub.infra.database import DatabaseManager
+from valutatrade_hub.infra.settings import SettingsLoader
+
+
+@pytest.fixture
+def db(tmp_path):
+    settings = SettingsLoader.isolated(tmp_path, ADMIN_USERS=["root"])
+    db = DatabaseManager.isolated(settings)
+    for name in ("alice", "bob", "root"):
+        usecases.register_user(name, "secret", db=db)
+    yield db
+    usecases.set_current_username(None)
+
+
+def test_risk_of_other_user_requires_login(db):
+    usecases.set_current_username(None)
+    with pytest.raises(PermissionError):
+        usecases.show_risk(target="alice", db=db)
+
+
+def test_risk_of_other_user_requires_admin(db):
+    usecases.set_current_username("bob")
+    with pytest.raises(PermissionError):
+        usecases.show_risk(target="alice", db=db)
+
+
+def test_admin_sees_other_user_risk(db):
+    pytest.importorskip("numpy")
+    usecases.set_current_username("root")
+    report = usecases.get_portfolio_risk(target="alice", db=db)
+    assert report["username"] == "alice"
@@ -0,0 +1,53 @@
+"""
+Бюджет старта CLI: импорт точки входа не тянет тяжёлые модули
+и укладывается в STARTUP_BUDGET_MS (см. benchmarks/startup.py).
+"""
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+import startup  # noqa: E402
+
+
+def _loaded_after(code: str) -> list:
+    proc = subprocess.run(
+        [sys.executable, "-c", code + "; import sys, json; "
+         "print(json.dumps(sorted(sys.modules)))"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _forbidden(modules: list) -> list:
+    return [
+        m for m in modules
+        if any(m == p or m.startswith(p + ".") for p in startup.FORBIDDEN_PREFIXES)
+    ]
+
+
+def test_entry_point_has_no_heavy_imports():
+    assert _forbidden(_loaded_after("import main")) == []
+
+
+def test_cli_help_has_no_heavy_imports():
+    code = "import main; main.run_cli(['help'])"
+    assert _forbidden(_loaded_after(code)) == []
+
+
+def test_startup_within_budget():
+    proc = subprocess.run(
+        [sys.executable, str(ROOT / "benchmarks" / "startup.py"), "--runs", "5"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from valutatrade_hub.parser_service.config import ParserConfig
+from valutatrade_hub.parser_service.simulator import FeedSimulator
+from valutatrade_hub.parser_service.streaming import MicroBatcher, NdjsonStreamClient
+
+
+class _Run:
+    # Клиент в фоновом потоке; батчи копятся в rates
+    def __init__(self, port: int) -> None:
+        config = ParserConfig(
+            STREAM_BATCH_MAX_TICKS=1,
+            STREAM_BATCH_MAX_DELAY=0.01,
+            STREAM_RECONNECT_MAX_DELAY=0.2,
+        )
+        self.client = NdjsonStreamClient(config, host="127.0.0.1", port=port)
+        self.batches = []
+        self.stop = threading.Event()
+        self.thread = threading.Thread(
+            target=self.client.run, args=(self.batches.append, self.stop), daemon=True
+        )
+
+    def wait_ticks(self, count: int, timeout: float = 5.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.client.stats["ticks"] >= count:
+                return
+            time.sleep(0.01)
+        raise AssertionError(f"{self.client.stats['ticks']} ticks of {count}")
+
+
+@pytest.fixture
+def feed():
+    feed = FeedSimulator(prices={"BTC_USD": 100.0}, rate=0, heartbeat=0.1)
+    feed.start(generate=False)
+    yield feed
+    feed.stop()
+
+
+def _wait_subscribed(feed: FeedSimulator, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not feed._subscribers and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_resume_after_disconnect(feed):
+    run = _Run(feed.address[1])
+    run.thread.start()
+    _wait_subscribed(feed)
+    for _ in range(3):
+        feed.emit("BTC_USD")
+    run.wait_ticks(3)
+
+    feed.drop_connections()
+    for _ in range(2):
+        # Тики во время разрыва досылаются из буфера
+        feed.emit("BTC_USD")
+    run.wait_ticks(5)
+    run.stop.set()
+    run.thread.join(timeout=5)
+
+    assert run.client.stats["ticks"] == 5
+    assert run.client.stats["duplicates"] == 0
+    assert run.client.stats["resets"] == 0
+
+
+def test_duplicate_seq_is_dropped():
+    client = NdjsonStreamClient(ParserConfig())
+    batcher = MicroBatcher(10, 1.0)
+    tick = {"type": "tick", "seq": 7, "pair": "BTC_USD", "rate": 1.0, "ts": 0}
+    client._accept({"type": "hello", "epoch": "a", "seq": 7}, batcher)
+    client._accept(tick, batcher)
+    client._accept(tick, batcher)
+
+    assert client.stats["ticks"] == 1
+    assert client.stats["duplicates"] == 1
+
+
+def test_feed_restart_resets_seq(feed):
+    port = feed.address[1]
+    run = _Run(port)
+    run.thread.start()
+    _wait_subscribed(feed)
+    for _ in range(5):
+        feed.emit("BTC_USD")
+    run.wait_ticks(5)
+    feed.stop()
+
+    # Новый фид на том же порту нумерует тики с 1
+    restarted = FeedSimulator(port=port, prices={"BTC_USD": 200.0}, rate=0,
+                              heartbeat=0.1)
+    restarted.start(generate=False)
+    try:
+        for _ in range(2):
+            restarted.emit("BTC_USD")
+        _wait_subscribed(restarted)
+        restarted.emit("BTC_USD")
+        run.wait_ticks(8)
+    finally:
+        run.stop.set()
+        run.thread.join(timeout=5)
+        restarted.stop()
+
+    assert run.client.stats["resets"] == 1
+    assert run.client.stats["ticks"] == 8
+    assert run.client.stats["duplicates"] == 0
+
+
+def test_resume_beyond_feed_seq_replays_buffer(feed):
+    for _ in range(3):
+        feed.emit("BTC_USD")
+    conn = object()
+    _, backlog, missed, resume_from = feed._subscribe(conn, 50, feed.epoch)
+    feed._unsubscribe(conn)
+    assert resume_from == 0
+    assert [t["seq"] for t in backlog] == [1, 2, 3]
+    assert missed == 0
@@ -1,3 +1,13 @@
-__all__ = ["__version__"]
+__all__ = ["Hub", "Session", "__version__"]
 
 __version__ = "0.1.0"
+
+
+def __getattr__(name: str) -> object:
+    # Hub тянет usecases и хранилище - импорт по первому обращению,
+    # чтобы не замедлять запуск CLI
+    if name in ("Hub", "Session"):
+        from . import hub
+
+        return getattr(hub, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,27 +1,44 @@
 from __future__ import annotations
 
+import csv
+import json
 import shlex
-from typing import Dict, List, Optional
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, TextIO, Tuple
 
 from ..core.exceptions import (
     ApiRequestError,
     CurrencyNotFoundError,
 )
+from ..core.rates import Pair, RateItem
 from ..core.usecases import (
     buy_currency,
+    cancel_order,
+    convert_currency,
+    execute_triggered_orders,
     get_current_username,
     get_rate,
+    import_users,
+    iter_rates,
+    list_orders,
     login_user,
+    place_order,
     register_user,
     sell_currency,
     set_current_username,
     show_portfolio,
     show_rates,
+    show_rebalance,
+    show_risk,
 )
-from ..parser_service.api_clients import CoinGeckoClient, ExchangeRateApiClient
-from ..parser_service.config import ParserConfig
-from ..parser_service.updater import RatesUpdater
-from ..parser_service.scheduler import run_scheduler
+from ..workload import get_recorder
+
+# parser_service (и вместе с ним requests) импортируется лениво внутри команд,
+# чтобы не замедлять старт CLI для команд, которым сеть не нужна.
+
 
 def _parse_options(tokens: List[str]) -> Dict[str, str]:
     opts: Dict[str, str] = {}
@@ -44,17 +61,35 @@ def _print_help() -> None:
     print("Доступные команды:")
     print("  register --username NAME --password PASS")
     print("  login --username NAME --password PASS")
-    print("  show-portfolio [--base USD]")
+    print("  import-users --file users.csv [--workers N]")
+    print("  show-portfolio [--base USD] [--pnl]")
+    print("  risk [--user NAME] [--window 30d]")
     print("  buy --currency CODE --amount N")
     print("  sell --currency CODE --amount N")
     print("  get-rate --from CODE --to CODE")
-    print("  update-rates [--source coingecko|exchangerate]")
-    print("  run-scheduler [--interval SECONDS]")
-    print("  show-rates [--currency CODE] [--top N]")
+    print("  place-order --side buy|sell --currency CODE --amount N --price P")
+    print("  cancel-order --id ID")
+    print("  list-orders [--all]")
+    print("  rebalance --targets USD=50,BTC=30,ETH=20 [--all-users] [--dry-run]")
+    print("  update-rates [--source coingecko|cryptocompare|exchangerate]")
+    print(
+        "  run-scheduler [--interval SECONDS] [--metrics-file PATH] "
+        "[--mem-snapshot-every CYCLES]"
+    )
+    print("  scheduler-status")
+    print("  stream-rates [--host HOST] [--port PORT]")
+    print("  simulate-feed [--port PORT] [--rate TICKS_PER_SEC]")
+    print("  compact-history [--dry-run]")
+    print("  backfill-history --file rates.csv|rates.jsonl [--batch-size N]")
+    print("  show-rates [--currency CODE] [--top N] [--format table|json|csv]")
+    print("  convert --from CODE --to CODE --amount N")
+    print("  serve [--host HOST] [--port PORT] [--workers N]")
+    print("  stats [--format prometheus] [--file PATH]")
     print("  whoami")
     print("  logout")
     print("  help")
     print("  exit / quit")
+    print("Любую команду можно запустить с --profile и/или --trace-mem.")
 
 
 def _cmd_register(args: List[str]) -> None:
@@ -71,6 +106,49 @@ def _cmd_register(args: List[str]) -> None:
     print(msg)
 
 
+def _read_user_rows(path: str) -> Iterable[Tuple[str, str]]:
+    # Построчное чтение CSV с колонками username,password
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row.get("username") or "", row.get("password") or ""
+
+
+def _cmd_import_users(args: List[str]) -> None:
+    opts = _parse_options(args)
+    path = opts.get("file", "").strip()
+    if not path:
+        print("Укажите --file с колонками username,password")
+        return
+    try:
+        workers = int(opts["workers"]) if opts.get("workers") else None
+    except ValueError:
+        print("'workers' должно быть целым числом")
+        return
+
+    started = time.perf_counter()
+    try:
+        report = import_users(_read_user_rows(path), workers=workers)
+    except OSError as exc:
+        print(f"Не удалось прочитать файл: {exc}")
+        return
+    elapsed = time.perf_counter() - started
+
+    rate = report["imported"] / elapsed if elapsed else 0.0
+    print(
+        f"Импортировано пользователей: {report['imported']} "
+        f"за {elapsed:.2f} с ({rate:.0f}/с)"
+    )
+    duplicates = report["duplicates"]
+    if duplicates:
+        shown = ", ".join(duplicates[:10])
+        more = f" и ещё {len(duplicates) - 10}" if len(duplicates) > 10 else ""
+        print(f"Пропущено занятых имён: {len(duplicates)}: {shown}{more}")
+    for username, reason in report["invalid"][:10]:
+        print(f"Пропущена строка '{username}': {reason}")
+    if len(report["invalid"]) > 10:
+        print(f"... всего некорректных строк: {len(report['invalid'])}")
+
+
 def _cmd_login(args: List[str]) -> None:
     opts = _parse_options(args)
     username = opts.get("username", "").strip()
@@ -86,12 +164,24 @@ def _cmd_show_portfolio(args: List[str]) -> None:
     opts = _parse_options(args)
     base = opts.get("base", "USD").strip() or "USD"
     try:
-        msg = show_portfolio(base_currency=base)
+        msg = show_portfolio(base_currency=base, pnl="pnl" in opts)
         print(msg)
     except PermissionError as exc:
         print(str(exc))
 
 
+def _cmd_risk(args: List[str]) -> None:
+    opts = _parse_options(args)
+    target = opts.get("user", "").strip() or None
+    window = opts.get("window", "").strip() or "30d"
+    try:
+        print(show_risk(window, target=target))
+    except PermissionError as exc:
+        print(str(exc))
+    except (ImportError, ValueError) as exc:
+        print(f"Ошибка: {exc}")
+
+
 def _cmd_buy(args: List[str]) -> None:
     opts = _parse_options(args)
     currency = opts.get("currency", "").strip()
@@ -132,6 +222,66 @@ def _cmd_sell(args: List[str]) -> None:
         print(str(exc))
 
 
+def _cmd_place_order(args: List[str]) -> None:
+    opts = _parse_options(args)
+    side = opts.get("side", "").strip()
+    currency = opts.get("currency", "").strip()
+    amount_raw = opts.get("amount", "").strip()
+    price_raw = opts.get("price", "").strip()
+    if not side or not currency or not amount_raw or not price_raw:
+        print("Укажите --side, --currency, --amount и --price")
+        return
+    try:
+        amount = float(amount_raw)
+        price = float(price_raw)
+    except ValueError:
+        print("'amount' и 'price' должны быть числами")
+        return
+    try:
+        print(place_order(side, currency, amount, price))
+    except (PermissionError, CurrencyNotFoundError) as exc:
+        print(str(exc))
+
+
+def _cmd_cancel_order(args: List[str]) -> None:
+    opts = _parse_options(args)
+    try:
+        order_id = int(opts.get("id", "").strip())
+    except ValueError:
+        print("Укажите --id заявки (целое число)")
+        return
+    try:
+        print(cancel_order(order_id))
+    except PermissionError as exc:
+        print(str(exc))
+
+
+def _cmd_list_orders(args: List[str]) -> None:
+    opts = _parse_options(args)
+    try:
+        print(list_orders(include_closed="all" in opts))
+    except PermissionError as exc:
+        print(str(exc))
+
+
+def _cmd_rebalance(args: List[str]) -> None:
+    opts = _parse_options(args)
+    targets = opts.get("targets", "").strip()
+    if not targets:
+        print("Укажите --targets, например USD=50,BTC=30,ETH=20")
+        return
+    try:
+        print(show_rebalance(
+            targets,
+            all_users="all-users" in opts,
+            dry_run="dry-run" in opts,
+        ))
+    except PermissionError as exc:
+        print(str(exc))
+    except (ImportError, ValueError, CurrencyNotFoundError) as exc:
+        print(f"Ошибка: {exc}")
+
+
 def _cmd_get_rate(args: List[str]) -> None:
     opts = _parse_options(args)
     from_code = opts.get("from", "").strip()
@@ -152,22 +302,57 @@ def _cmd_get_rate(args: List[str]) -> None:
         print(str(exc))
 
 
+def _cmd_convert(args: List[str]) -> None:
+    opts = _parse_options(args)
+    from_code = opts.get("from", "").strip()
+    to_code = opts.get("to", "").strip()
+    amount_raw = opts.get("amount", "").strip()
+    if not from_code or not to_code or not amount_raw:
+        print("Укажите --from, --to и --amount")
+        return
+    try:
+        amount = float(amount_raw)
+    except ValueError:
+        print("'amount' должен быть числом")
+        return
+    try:
+        print(convert_currency(from_code, to_code, amount))
+    except CurrencyNotFoundError as exc:
+        print(str(exc))
+
+
 def _cmd_update_rates(args: List[str]) -> None:
+    from ..parser_service.api_clients import (
+        CoinGeckoClient,
+        CryptoCompareClient,
+        ExchangeRateApiClient,
+    )
+    from ..parser_service.config import ParserConfig
+    from ..parser_service.hedging import crypto_client
+    from ..parser_service.updater import RatesUpdater
+
     opts = _parse_options(args)
     source = opts.get("source", "").strip().lower() or "all"
 
     config = ParserConfig()
     clients = []
-    if source in ("all", "coingecko"):
+    if source == "all":
+        clients.append(crypto_client(config))
+    elif source == "coingecko":
         clients.append(CoinGeckoClient(config))
+    elif source == "cryptocompare":
+        clients.append(CryptoCompareClient(config))
     if source in ("all", "exchangerate"):
         clients.append(ExchangeRateApiClient(config))
 
     if not clients:
-        print("Неизвестный source. Используйте coingecko или exchangerate.")
+        print(
+            "Неизвестный source. Используйте coingecko, cryptocompare "
+            "или exchangerate."
+        )
         return
 
-    updater = RatesUpdater(clients)
+    updater = RatesUpdater(clients, listeners=[execute_triggered_orders])
     try:
         result = updater.run_update()
     except ApiRequestError as exc:
@@ -180,10 +365,19 @@ def _cmd_update_rates(args: List[str]) -> None:
         print("Update completed with errors. См. логи.")
     else:
         print("Update successful.")
+    for reason in result["skipped"]:
+        print(f"Пропущен источник: {reason}")
     print(f"Total rates updated: {total}")
+    if result["quarantined"]:
+        print(
+            f"В карантине (выбросы): {result['quarantined']}. "
+            "См. RATES_QUARANTINE_FILE."
+        )
 
 
 def _cmd_run_scheduler(args: List[str]) -> None:
+    from ..parser_service.scheduler import run_scheduler
+
     opts = _parse_options(args)
     interval = 300
     if "interval" in opts:
@@ -192,17 +386,202 @@ def _cmd_run_scheduler(args: List[str]) -> None:
         except ValueError:
             print("Ошибка: interval должен быть целым числом")
             return
+    metrics_file = opts.get("metrics-file", "").strip() or None
+    mem_every = None
+    if opts.get("mem-snapshot-every"):
+        try:
+            mem_every = int(opts["mem-snapshot-every"])
+        except ValueError:
+            print("Ошибка: mem-snapshot-every должен быть целым числом")
+            return
     try:
-        run_scheduler(interval=interval)
+        run_scheduler(
+            interval=interval,
+            metrics_file=metrics_file,
+            mem_snapshot_every=mem_every,
+        )
     except KeyboardInterrupt:
         # Перехватываем здесь, чтобы не крашить весь CLI при выходе из функции
         print("\nПланировщик остановлен.")
 
 
+def _format_epoch(value: Optional[float]) -> str:
+    if not value:
+        return "-"
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(value))
+
+
+def _cmd_scheduler_status() -> None:
+    from ..parser_service.leader import get_lease_election
+
+    election = get_lease_election()
+    lease = election.read()
+    if lease is None:
+        print("Аренда планировщика не занята: run-scheduler не запускался.")
+        return
+    left = lease.get("expires_at", 0) - time.time()
+    if left > 0:
+        print(f"Лидер: {lease['holder']} (term {lease.get('term')})")
+        print(f"Аренда истекает через {left:.1f} с")
+    else:
+        print(f"Лидера нет: аренда {lease['holder']} "
+              f"(term {lease.get('term')}) истекла {-left:.1f} с назад")
+    print(f"Лидер с: {_format_epoch(lease.get('acquired_at'))}")
+    print(f"Последний heartbeat: {_format_epoch(lease.get('renewed_at'))}")
+    print(f"Последнее обновление курсов: {_format_epoch(lease.get('last_run_at'))}")
+    print(f"Срок аренды (ttl): {lease.get('ttl', election.ttl):g} с")
+
+
+def _cmd_stream_rates(args: List[str]) -> None:
+    from ..parser_service.streaming import run_stream
+
+    opts = _parse_options(args)
+    try:
+        port = int(opts["port"]) if opts.get("port") else None
+    except ValueError:
+        print("Ошибка: port должен быть целым числом")
+        return
+    host = opts.get("host", "").strip() or None
+    print("Поток курсов запущен. Ctrl+C - остановить.")
+    try:
+        run_stream(host=host, port=port)
+    except KeyboardInterrupt:
+        print("\nПоток курсов остановлен.")
+
+
+def _cmd_simulate_feed(args: List[str]) -> None:
+    from ..parser_service.simulator import run_simulator
+
+    opts = _parse_options(args)
+    try:
+        port = int(opts["port"]) if opts.get("port") else 9100
+        rate = float(opts["rate"]) if opts.get("rate") else 50.0
+    except ValueError:
+        print("Ошибка: port - целое число, rate - число тиков в секунду")
+        return
+    try:
+        run_simulator(port=port, rate=rate)
+    except KeyboardInterrupt:
+        print("\nСимулятор остановлен.")
+
+
+def _cmd_compact_history(args: List[str]) -> None:
+    from ..parser_service.history import get_history_store
+
+    opts = _parse_options(args)
+    dry_run = "dry-run" in opts
+    store = get_history_store()
+    try:
+        result = store.compact(dry_run=dry_run)
+    except TimeoutError as exc:
+        print(f"Ошибка: {exc} (идёт compact-history или backfill-history)")
+        return
+
+    prefix = "[dry-run] " if dry_run else ""
+    print(
+        f"{prefix}Сырых тиков в архив: {result['raw_archived']} "
+        f"-> минутных баров: {result['minute_bars']}"
+    )
+    print(
+        f"{prefix}Минутных сегментов свёрнуто: "
+        f"{result['minute_segments_rolled']} "
+        f"-> часовых баров: {result['hour_bars']}"
+    )
+    print(f"{prefix}Осталось сырых тиков: {result['raw_remaining']}")
+
+
+def _cmd_backfill_history(args: List[str]) -> None:
+    from ..parser_service.history import get_history_store, read_rate_dump
+
+    opts = _parse_options(args)
+    path = opts.get("file", "").strip()
+    if not path:
+        print("Укажите --file с выгрузкой курсов (CSV или JSONL)")
+        return
+    try:
+        batch_size = int(opts["batch-size"]) if opts.get("batch-size") else None
+    except ValueError:
+        print("'batch-size' должно быть целым числом")
+        return
+    if batch_size is not None and batch_size <= 0:
+        print("'batch-size' должно быть положительным")
+        return
+
+    started = time.perf_counter()
+    try:
+        report = get_history_store().backfill(
+            read_rate_dump(Path(path)), batch_size=batch_size
+        )
+    except TimeoutError as exc:
+        print(f"Ошибка: {exc} (идёт compact-history или backfill-history)")
+        return
+    except OSError as exc:
+        print(f"Не удалось прочитать файл: {exc}")
+        return
+    elapsed = time.perf_counter() - started
+
+    rate = report["rows"] / elapsed if elapsed else 0.0
+    print(
+        f"Обработано строк: {report['rows']} за {elapsed:.2f} с ({rate:.0f}/с)"
+    )
+    print(
+        f"Загружено: {report['imported']} -> баров: {report['bars']} "
+        f"в сегментах: {report['segments']}"
+    )
+    print(f"Пропущено дубликатов: {report['duplicates']}")
+    print(f"Отклонено строк: {report['rejected']}")
+    for number, reason in report["errors"]:
+        print(f"  строка {number}: {reason}")
+
+
+def _cmd_serve(args: List[str]) -> None:
+    from ..server.api import serve
+
+    opts = _parse_options(args)
+    try:
+        port = int(opts["port"]) if opts.get("port") else None
+        workers = int(opts["workers"]) if opts.get("workers") else None
+    except ValueError:
+        print("Ошибка: port и workers должны быть целыми числами")
+        return
+    serve(host=opts.get("host") or None, port=port, workers=workers)
+
+
+_RATE_FIELDS = ("pair", "rate", "updated_at", "source")
+
+
+def _rate_row(pair: Pair, data: dict) -> Dict[str, object]:
+    return {
+        "pair": str(pair),
+        "rate": float(data.get("rate", 0)),
+        "updated_at": data.get("updated_at"),
+        "source": data.get("source"),
+    }
+
+
+def _stream_rates_json(items: Iterable[RateItem], out: TextIO) -> None:
+    # Массив пишется поэлементно, без сборки всего документа в памяти
+    out.write("[")
+    first = True
+    for pair, data in items:
+        out.write("\n  " if first else ",\n  ")
+        out.write(json.dumps(_rate_row(pair, data), ensure_ascii=False))
+        first = False
+    out.write("\n]\n" if not first else "]\n")
+
+
+def _stream_rates_csv(items: Iterable[RateItem], out: TextIO) -> None:
+    writer = csv.DictWriter(out, fieldnames=_RATE_FIELDS, lineterminator="\n")
+    writer.writeheader()
+    for pair, data in items:
+        writer.writerow(_rate_row(pair, data))
+
+
 def _cmd_show_rates(args: List[str]) -> None:
     opts = _parse_options(args)
     currency = opts.get("currency")
     top_raw = opts.get("top")
+    fmt = opts.get("format", "").strip().lower() or "table"
     top = None
     if top_raw:
         try:
@@ -210,8 +589,68 @@ def _cmd_show_rates(args: List[str]) -> None:
         except ValueError:
             print("'--top' должно быть целым числом")
             return
-    msg = show_rates(currency=currency, top=top)
-    print(msg)
+    if fmt == "table":
+        msg = show_rates(currency=currency, top=top)
+        print(msg)
+    elif fmt == "json":
+        _stream_rates_json(iter_rates(currency=currency, top=top), sys.stdout)
+    elif fmt == "csv":
+        _stream_rates_csv(iter_rates(currency=currency, top=top), sys.stdout)
+    else:
+        print("Неизвестный формат. Используйте json, csv или table.")
+
+
+def _cmd_stats(args: List[str]) -> None:
+    from ..infra.settings import get_settings
+    from ..metrics import MetricsRegistry, get_metrics, read_textfile
+
+    opts = _parse_options(args)
+    prometheus = opts.get("format", "").strip().lower() == "prometheus"
+    # Метрики этого процесса (интерактивная оболочка) и файл, который
+    # пишет run-scheduler: в разовом запуске CLI процесс начинает с нуля
+    path = opts.get("file", "").strip() or get_settings().get("METRICS_TEXTFILE")
+    textfile = Path(path) if path else None
+    if textfile is not None and not textfile.exists():
+        print(f"Файл метрик {textfile} ещё не создан (его пишет run-scheduler).")
+        textfile = None
+
+    metrics = get_metrics()
+    if prometheus:
+        # Одна экспозиция: те же семейства из файла и процесса дали бы
+        # повторные # HELP/# TYPE, а такой вывод Prometheus не принимает
+        combined = MetricsRegistry()
+        if textfile is not None:
+            try:
+                combined = read_textfile(textfile)
+            except (OSError, ValueError) as exc:
+                print(f"Не удалось прочитать {textfile}: {exc}")
+        combined.merge(metrics)
+        print(combined.render_prometheus(), end="")
+        return
+
+    shown = False
+    summary = metrics.format_summary()
+    if summary:
+        print("Текущий процесс:")
+        print(summary)
+        shown = True
+    if textfile is not None:
+        try:
+            saved = read_textfile(textfile).format_summary()
+        except (OSError, ValueError) as exc:
+            print(f"Не удалось прочитать {textfile}: {exc}")
+            saved = ""
+        if saved:
+            updated = datetime.fromtimestamp(textfile.stat().st_mtime)
+            print(f"Из {textfile} (обновлён {updated:%Y-%m-%d %H:%M:%S}):")
+            print(saved)
+            shown = True
+    if not shown:
+        print(
+            "Метрик пока нет. Разовый запуск CLI начинает с пустого реестра: "
+            "задайте METRICS_TEXTFILE для run-scheduler или используйте "
+            "интерактивный режим и serve (GET /metrics)."
+        )
 
 
 def _cmd_whoami() -> None:
@@ -227,7 +666,100 @@ def _cmd_logout() -> None:
     print("Вы вышли из системы")
 
 
-def run_cli() -> None:
+_PROFILE_FLAGS = ("--profile", "--trace-mem")
+
+
+def _dispatch(cmd: str, args: List[str]) -> None:
+    if cmd == "help":
+        _print_help()
+    elif cmd == "register":
+        _cmd_register(args)
+    elif cmd == "login":
+        _cmd_login(args)
+    elif cmd == "import-users":
+        _cmd_import_users(args)
+    elif cmd == "show-portfolio":
+        _cmd_show_portfolio(args)
+    elif cmd == "risk":
+        _cmd_risk(args)
+    elif cmd == "buy":
+        _cmd_buy(args)
+    elif cmd == "sell":
+        _cmd_sell(args)
+    elif cmd == "get-rate":
+        _cmd_get_rate(args)
+    elif cmd == "place-order":
+        _cmd_place_order(args)
+    elif cmd == "cancel-order":
+        _cmd_cancel_order(args)
+    elif cmd == "list-orders":
+        _cmd_list_orders(args)
+    elif cmd == "rebalance":
+        _cmd_rebalance(args)
+    elif cmd == "update-rates":
+        _cmd_update_rates(args)
+    elif cmd == "run-scheduler":
+        _cmd_run_scheduler(args)
+    elif cmd == "scheduler-status":
+        _cmd_scheduler_status()
+    elif cmd == "stream-rates":
+        _cmd_stream_rates(args)
+    elif cmd == "simulate-feed":
+        _cmd_simulate_feed(args)
+    elif cmd == "compact-history":
+        _cmd_compact_history(args)
+    elif cmd == "backfill-history":
+        _cmd_backfill_history(args)
+    elif cmd == "show-rates":
+        _cmd_show_rates(args)
+    elif cmd == "convert":
+        _cmd_convert(args)
+    elif cmd == "serve":
+        _cmd_serve(args)
+    elif cmd == "stats":
+        _cmd_stats(args)
+    elif cmd == "whoami":
+        _cmd_whoami()
+    elif cmd == "logout":
+        _cmd_logout()
+    else:
+        print("Неизвестная команда. Напишите 'help' для списка.")
+
+
+def _run_command(tokens: List[str]) -> None:
+    cmd = tokens[0]
+    # --profile и --trace-mem допустимы у любой команды и в неё не передаются
+    args = [t for t in tokens[1:] if t not in _PROFILE_FLAGS]
+    profile = "--profile" in tokens
+    trace_mem = "--trace-mem" in tokens
+    if not profile and not trace_mem:
+        _dispatch(cmd, args)
+        return
+
+    from ..profiling import profile_command
+
+    with profile_command(cmd, profile=profile, trace_mem=trace_mem):
+        _dispatch(cmd, args)
+
+
+def _run_recorded(tokens: List[str]) -> None:
+    # При VALUTA_RECORD_WORKLOAD команда с таймингом пишется в нагрузку
+    recorder = get_recorder()
+    if recorder is None:
+        _run_command(tokens)
+        return
+    with recorder.record(tokens):
+        _run_command(tokens)
+
+
+def run_cli(argv: Optional[List[str]] = None) -> None:
+    # С аргументами - одна команда и выход (для скриптов),
+    # без аргументов - интерактивный режим
+    if argv:
+        if argv[0] not in ("exit", "quit"):
+            _run_recorded(list(argv))
+        return
+
     print("ValutaTrade Hub CLI. Напишите 'help' для списка команд.")
     while True:
         try:
@@ -244,34 +776,6 @@ def run_cli() -> None:
             print(f"Ошибка парсинга команды: {exc}")
             continue
 
-        cmd = tokens[0]
-        args = tokens[1:]
-
-        if cmd in ("exit", "quit"):
+        if tokens[0] in ("exit", "quit"):
             break
-        if cmd == "help":
-            _print_help()
-        elif cmd == "register":
-            _cmd_register(args)
-        elif cmd == "login":
-            _cmd_login(args)
-        elif cmd == "show-portfolio":
-            _cmd_show_portfolio(args)
-        elif cmd == "buy":
-            _cmd_buy(args)
-        elif cmd == "sell":
-            _cmd_sell(args)
-        elif cmd == "get-rate":
-            _cmd_get_rate(args)
-        elif cmd == "update-rates":
-            _cmd_update_rates(args)
-        elif cmd == "run-scheduler":
-            _cmd_run_scheduler(args)
-        elif cmd == "show-rates":
-            _cmd_show_rates(args)
-        elif cmd == "whoami":
-            _cmd_whoami()
-        elif cmd == "logout":
-            _cmd_logout()
-        else:
-            print("Неизвестная команда. Напишите 'help' для списка.")
+        _run_recorded(tokens)
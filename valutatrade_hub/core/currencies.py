@@ -1,7 +1,15 @@
+from __future__ import annotations
+
+import logging
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
 
 from valutatrade_hub.core.exceptions import CurrencyNotFoundError
+from valutatrade_hub.core.utils import load_json, save_json
+
+logger = logging.getLogger(__name__)
 
 
 class Currency(ABC):
@@ -15,11 +23,17 @@ class Currency(ABC):
 
         self.name = name
         self.code = code_upper
+        # Назначается реестром, стабилен между запусками
+        self.currency_id: Optional[int] = None
 
     @abstractmethod
     def get_display_info(self) -> str:
         raise NotImplementedError
 
+    @abstractmethod
+    def to_dict(self) -> dict:
+        raise NotImplementedError
+
 
 class FiatCurrency(Currency):
     def __init__(self, name: str, code: str, issuing_country: str = "Unknown") -> None:
@@ -32,6 +46,15 @@ class FiatCurrency(Currency):
             f"(Issuing: {self.issuing_country})"
         )
 
+    def to_dict(self) -> dict:
+        return {
+            "id": self.currency_id,
+            "code": self.code,
+            "type": "fiat",
+            "name": self.name,
+            "issuing_country": self.issuing_country,
+        }
+
 
 class CryptoCurrency(Currency):
     def __init__(
@@ -51,21 +74,199 @@ class CryptoCurrency(Currency):
             f"(Algo: {self.algorithm}, MCAP: {self.market_cap:.2e})"
         )
 
+    def to_dict(self) -> dict:
+        return {
+            "id": self.currency_id,
+            "code": self.code,
+            "type": "crypto",
+            "name": self.name,
+            "algorithm": self.algorithm,
+            "market_cap": self.market_cap,
+        }
+
+
+# Встроенный набор на случай, если data/currencies.json ещё не создан.
+# Порядок задаёт id: 1, 2, 3, ... - не переставлять
+_DEFAULT_CURRENCIES: List[dict] = [
+    {"code": "USD", "type": "fiat", "name": "US Dollar",
+     "issuing_country": "United States"},
+    {"code": "EUR", "type": "fiat", "name": "Euro",
+     "issuing_country": "Eurozone"},
+    {"code": "RUB", "type": "fiat", "name": "Russian Ruble",
+     "issuing_country": "Russia"},
+    {"code": "BTC", "type": "crypto", "name": "Bitcoin",
+     "algorithm": "SHA-256", "market_cap": 1.12e12},
+    {"code": "ETH", "type": "crypto", "name": "Ethereum",
+     "algorithm": "Ethash", "market_cap": 4.5e11},
+    {"code": "SOL", "type": "crypto", "name": "Solana",
+     "algorithm": "Proof-of-History", "market_cap": 8.0e10},
+    {"code": "GBP", "type": "fiat", "name": "British Pound",
+     "issuing_country": "United Kingdom"},
+]
+
+
+def _currency_from_dict(item: dict) -> Currency:
+    if item.get("type") == "crypto":
+        currency: Currency = CryptoCurrency(
+            item.get("name") or item["code"],
+            item["code"],
+            item.get("algorithm", "Unknown"),
+            float(item.get("market_cap", 0.0)),
+        )
+    else:
+        currency = FiatCurrency(
+            item.get("name") or item["code"],
+            item["code"],
+            item.get("issuing_country", "Unknown"),
+        )
+    currency.currency_id = item.get("id")
+    return currency
+
+
+class CurrencyRegistry:
+    # Реестр валют из data/currencies.json. id - порядковый номер
+    # регистрации, по нему упорядочен файл; ключи курсов и кошельков - коды.
+    # Загружается при первом обращении, а не при импорте модуля
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._by_code: Dict[str, Currency] = {}
+        self._by_id: Dict[int, Currency] = {}
+        self._loaded_sig: Optional[tuple] = None
+        self._loaded = False
+
+    def _file_sig(self) -> Optional[tuple]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> None:
+        sig = self._file_sig()
+        raw = load_json(self.path, None) if sig else None
+        if not raw:
+            raw = [dict(item, id=i) for i, item in enumerate(_DEFAULT_CURRENCIES, 1)]
+
+        by_code: Dict[str, Currency] = {}
+        by_id: Dict[int, Currency] = {}
+        next_id = max((int(item.get("id") or 0) for item in raw), default=0) + 1
+        for item in raw:
+            if not item.get("id"):
+                # Старые записи без id получают следующий свободный
+                item = dict(item, id=next_id)
+                next_id += 1
+            currency = _currency_from_dict(item)
+            by_code[currency.code] = currency
+            by_id[currency.currency_id] = currency
+
+        self._by_code, self._by_id = by_code, by_id
+        self._loaded_sig = sig
+        self._loaded = True
 
-# Реестр валют
-_CURRENCY_REGISTRY: Dict[str, Currency] = {
-    "USD": FiatCurrency("US Dollar", "USD", "United States"),
-    "EUR": FiatCurrency("Euro", "EUR", "Eurozone"),
-    "RUB": FiatCurrency("Russian Ruble", "RUB", "Russia"),
-    "BTC": CryptoCurrency("Bitcoin", "BTC", "SHA-256", 1.12e12),
-    "ETH": CryptoCurrency("Ethereum", "ETH", "Ethash", 4.5e11),
-    "SOL": CryptoCurrency("Solana", "SOL", "Proof-of-History", 8.0e10),
-}
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def _reload_if_changed(self) -> bool:
+        # Другой процесс (например, парсер) мог дописать новые коды
+        with self._lock:
+            if self._file_sig() == self._loaded_sig:
+                return False
+            self._load()
+            return True
+
+    def _save(self) -> None:
+        data = [c.to_dict() for c in sorted(self._by_id.values(),
+                                            key=lambda c: c.currency_id)]
+        save_json(self.path, data)
+        self._loaded_sig = self._file_sig()
+
+    def get(self, code: str) -> Currency:
+        self._ensure_loaded()
+        normalized = code.upper()
+        currency = self._by_code.get(normalized)
+        if currency is None and self._reload_if_changed():
+            currency = self._by_code.get(normalized)
+        if currency is None:
+            raise CurrencyNotFoundError(code=normalized)
+        return currency
+
+    def all(self) -> List[Currency]:
+        self._ensure_loaded()
+        return sorted(self._by_id.values(), key=lambda c: c.currency_id)
+
+    def register(
+            self,
+            code: str,
+            kind: str = "fiat",
+            name: Optional[str] = None,
+    ) -> Currency:
+        self._ensure_loaded()
+        normalized = code.upper()
+        with self._lock:
+            # Перечитываем файл, чтобы не выдать уже занятый id
+            self._reload_if_changed()
+            existing = self._by_code.get(normalized)
+            if existing is not None:
+                return existing
+
+            currency = _currency_from_dict({
+                "code": normalized,
+                "type": kind,
+                "name": name or normalized,
+                "id": max(self._by_id, default=0) + 1,
+            })
+            self._by_code[currency.code] = currency
+            self._by_id[currency.currency_id] = currency
+            self._save()
+        logger.info(
+            "Registered currency %s (%s) with id=%d",
+            currency.code, kind, currency.currency_id,
+        )
+        return currency
+
+    def ensure(self, codes: Iterable[str], kind: str = "fiat") -> List[Currency]:
+        # Регистрирует коды, которых ещё нет; некорректные пропускает
+        self._ensure_loaded()
+        result: List[Currency] = []
+        for code in codes:
+            currency = self._by_code.get(code.upper())
+            if currency is None:
+                try:
+                    currency = self.register(code, kind=kind)
+                except ValueError as exc:
+                    logger.warning("Skipping currency %r: %s", code, exc)
+                    continue
+            result.append(currency)
+        return result
+
+
+_REGISTRY: Optional[CurrencyRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> CurrencyRegistry:
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                from valutatrade_hub.infra.settings import get_settings
+
+                path = Path(get_settings().get("CURRENCIES_FILE"))
+                _REGISTRY = CurrencyRegistry(path)
+    return _REGISTRY
 
 
 def get_currency(code: str) -> Currency:
-    normalized = code.upper()
-    currency = _CURRENCY_REGISTRY.get(normalized)
-    if not currency:
-        raise CurrencyNotFoundError(code=normalized)
-    return currency
\ No newline at end of file
+    return get_registry().get(code)
+
+
+def register_currency(
+        code: str,
+        kind: str = "fiat",
+        name: Optional[str] = None,
+) -> Currency:
+    return get_registry().register(code, kind=kind, name=name)
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterable, Iterator, List, Optional, Set
+
+from valutatrade_hub.metrics import get_metrics
+
+# Уровни DURABILITY:
+#   none  - запись во временный файл и rename, без fsync (быстро, но после
+#           сбоя питания последние записи могут пропасть)
+#   fsync - fsync файла до rename и каталога после, на каждую запись
+#   group - запись видна сразу после rename, а вызов возвращается после
+#           общего fsync: записи, накопившиеся за время предыдущего fsync
+#           (и GROUP_COMMIT_WINDOW_MS), делят один fsync на файл и каталог.
+#           До этого fsync новая версия файла может не пережить сбой,
+#           но вызывающий ещё не получил ответ
+NONE = "none"
+FSYNC = "fsync"
+GROUP = "group"
+LEVELS = (NONE, FSYNC, GROUP)
+
+
+def durability_level() -> str:
+    from valutatrade_hub.infra.settings import get_settings
+
+    level = str(get_settings().get("DURABILITY", NONE)).lower()
+    if level not in LEVELS:
+        raise ValueError(f"DURABILITY должен быть одним из {', '.join(LEVELS)}")
+    return level
+
+
+def _fsync_dir(directory: Path) -> None:
+    # Фиксирует сам rename; на Windows каталоги не открываются - пропускаем
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _observe(mode: str, started: float, files: int) -> None:
+    metrics = get_metrics()
+    metrics.histogram(
+        "valutatrade_storage_fsync_seconds", "fsync duration per commit"
+    ).observe(time.perf_counter() - started, mode=mode)
+    metrics.counter(
+        "valutatrade_storage_fsyncs_total", "Files fsynced by durability mode"
+    ).inc(files, mode=mode)
+
+
+def _sync_files(paths: Iterable[Path], mode: str) -> None:
+    started = time.perf_counter()
+    paths = list(paths)
+    for path in paths:
+        _fsync_path(path)
+    for directory in {path.parent for path in paths}:
+        _fsync_dir(directory)
+    _observe(mode, started, len(paths))
+
+
+class GroupCommitter:
+    # Лидер-последователь: свободный писатель становится лидером, забирает
+    # пути всех ожидающих, делает fsync и будит их. Кто записал, пока шёл
+    # fsync, попадает в следующую группу, поэтому группы сами растут
+    # с ценой fsync. window > 0 дополнительно ждёт попутчиков перед fsync
+    def __init__(self, window: float) -> None:
+        self.window = window
+        self._cond = threading.Condition()
+        self._pending: Set[Path] = set()
+        self._next_batch = 1
+        self._flushed = 0
+        self._leader = False
+        self._failed: Optional[tuple] = None
+
+    def commit(self, paths: Iterable[Path]) -> None:
+        with self._cond:
+            self._pending.update(paths)
+            batch = self._next_batch
+            while self._flushed < batch:
+                if not self._leader:
+                    self._leader = True
+                    break
+                self._cond.wait()
+            else:
+                if self._failed is not None and self._failed[0] == batch:
+                    raise OSError(f"group commit failed: {self._failed[1]}")
+                return
+
+        flushing = None
+        try:
+            if self.window:
+                time.sleep(self.window)
+            with self._cond:
+                paths, self._pending = self._pending, set()
+                flushing = self._next_batch
+                self._next_batch += 1
+            get_metrics().histogram(
+                "valutatrade_group_commit_batch_files",
+                "Distinct files per group commit",
+                buckets=(1, 2, 4, 8, 16, 32, 64),
+            ).observe(len(paths))
+            _sync_files(paths, GROUP)
+        except OSError as exc:
+            with self._cond:
+                self._failed = (flushing, exc)
+            raise
+        finally:
+            with self._cond:
+                if flushing is not None:
+                    self._flushed = flushing
+                self._leader = False
+                self._cond.notify_all()
+
+
+_COMMITTER: Optional[GroupCommitter] = None
+_COMMITTER_LOCK = threading.Lock()
+
+
+def _group_committer() -> GroupCommitter:
+    global _COMMITTER
+    if _COMMITTER is None:
+        with _COMMITTER_LOCK:
+            if _COMMITTER is None:
+                from valutatrade_hub.infra.settings import get_settings
+
+                window_ms = float(get_settings().get("GROUP_COMMIT_WINDOW_MS", 0))
+                _COMMITTER = GroupCommitter(window_ms / 1000)
+    return _COMMITTER
+
+
+_deferred = threading.local()
+
+
+@contextmanager
+def deferred_commit() -> Iterator[None]:
+    # В режиме group ожидание fsync переносится на выход из блока.
+    # Нужен, когда save_json вызывается под блокировкой приложения:
+    # иначе писатели ждут окно по очереди и не попадают в одну группу
+    outer = getattr(_deferred, "paths", None)
+    if outer is not None:
+        yield
+        return
+    paths: List[Path] = []
+    _deferred.paths = paths
+    try:
+        yield
+    finally:
+        _deferred.paths = None
+    if paths:
+        _group_committer().commit(paths)
+
+
+def _commit_group(path: Path) -> None:
+    paths = getattr(_deferred, "paths", None)
+    if paths is not None:
+        paths.append(path)
+    else:
+        _group_committer().commit([path])
+
+
+def replace_durably(tmp_path: Path, path: Path, f: IO[bytes]) -> None:
+    # Завершает атомарную запись: f - открытый временный файл с данными
+    level = durability_level()
+    if level == FSYNC:
+        started = time.perf_counter()
+        f.flush()
+        os.fsync(f.fileno())
+        f.close()
+        tmp_path.replace(path)
+        _fsync_dir(path.parent)
+        _observe(FSYNC, started, 1)
+        return
+
+    f.close()
+    tmp_path.replace(path)
+    if level == GROUP:
+        _commit_group(path)
+
+
+def commit_file(path: Path) -> None:
+    # Для файлов, дописываемых на месте (сегменты истории)
+    level = durability_level()
+    if level == FSYNC:
+        _sync_files([path], FSYNC)
+    elif level == GROUP:
+        _commit_group(path)
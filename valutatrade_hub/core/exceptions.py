@@ -22,3 +22,13 @@ class ApiRequestError(Exception):
         msg = f"Ошибка при обращении к внешнему API: {reason}"
         super().__init__(msg)
         self.reason = reason
+
+
+class CircuitOpenError(ApiRequestError):
+    def __init__(self, source: str, retry_in: float) -> None:
+        super().__init__(
+            f"{source} временно отключён после серии ошибок, "
+            f"повтор через {max(retry_in, 0):.0f} с"
+        )
+        self.source = source
+        self.retry_in = retry_in
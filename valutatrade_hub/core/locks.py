@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _read_token(path: Path) -> str:
+    # Пустой токен - владелец умер между созданием файла и записью
+    return path.read_text(encoding="utf-8", errors="replace")
+
+
+class FileLock:
+    # Межпроцессная блокировка: O_EXCL-файл вместо flock, работает и на
+    # сетевых томах. В файле - токен захвата, по нему снимается только
+    # своя блокировка. Файл старше stale_seconds считается брошенным
+    # умершим процессом; долгие операции продлевают его через refresh()
+    def __init__(self, path: Path, stale_seconds: float, owner: str = "") -> None:
+        self.path = path
+        self.stale_seconds = stale_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}"
+        self._token: Optional[str] = None
+
+    def acquire(self, wait_seconds: float) -> bool:
+        deadline = time.monotonic() + wait_seconds
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        token = f"{self.owner}:{uuid.uuid4().hex}"
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    seen = _read_token(self.path)
+                    age = time.time() - self.path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if age > self.stale_seconds:
+                    self._break_stale(seen)
+                    continue
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.05)
+                continue
+            try:
+                os.write(fd, token.encode("utf-8"))
+            finally:
+                os.close(fd)
+            self._token = token
+            return True
+
+    @contextmanager
+    def hold(self, wait_seconds: float) -> Iterator[None]:
+        # Для операций, которые без блокировки выполнять нельзя
+        if not self.acquire(wait_seconds):
+            raise TimeoutError(f"Файл занят другим процессом: {self.path}")
+        try:
+            yield
+        finally:
+            self.release()
+
+    def refresh(self) -> None:
+        # Продление: mtime свежий, другие процессы блокировку не снимут
+        if self._token is not None:
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                pass
+
+    def release(self) -> None:
+        # Блокировку могли снять как зависшую и взять заново:
+        # чужую не удаляем
+        token, self._token = self._token, None
+        try:
+            if token is not None and _read_token(self.path) == token:
+                self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _break_stale(self, seen: str) -> None:
+        # Зависшая блокировка переименовывается в уникальное имя: rename
+        # атомарен, поэтому забрать её может только один процесс. Между
+        # stat и rename её мог снять и взять заново другой процесс, так что
+        # токен и возраст проверяются ещё раз у уже переименованного файла
+        stale = self.path.with_name(
+            f"{self.path.name}.{os.getpid()}.{uuid.uuid4().hex[:6]}.stale"
+        )
+        try:
+            os.rename(self.path, stale)
+        except FileNotFoundError:
+            return
+        try:
+            age = time.time() - stale.stat().st_mtime
+            if _read_token(stale) == seen and age > self.stale_seconds:
+                logger.warning("Removed stale lock %s (%.0fs old)", self.path, age)
+                return
+            # Забрана живая блокировка: возвращаем её, если место свободно
+            try:
+                os.link(stale, self.path)
+            except OSError:
+                logger.warning("Could not restore lock %s", self.path)
+        finally:
+            try:
+                stale.unlink()
+            except FileNotFoundError:
+                pass
@@ -1,7 +1,15 @@
+from collections import deque
 from datetime import datetime
-from typing import Dict, Optional, Union, Any
+from typing import Deque, Dict, Iterable, List, Optional, Union, Any
 from valutatrade_hub.core.utils import generate_salt, hash_password
 
+# Сопоставление продаж с лотами покупок
+FIFO = "fifo"
+AVERAGE = "average"
+COST_METHODS = (FIFO, AVERAGE)
+# Остаток лота меньше этого считается нулём (погрешность float)
+_LOT_EPSILON = 1e-12
+
 
 class User:
     def __init__(
@@ -84,9 +92,24 @@ class User:
 
 
 class Wallet:
-    def __init__(self, currency_code: str, balance: float = 0.0):
+    def __init__(
+            self,
+            currency_code: str,
+            balance: float = 0.0,
+            lots: Optional[Iterable[List[float]]] = None,
+            realized_pnl: float = 0.0,
+    ):
         self.currency_code = currency_code.upper()
         self.balance = balance
+        # Лоты покупок [количество, цена в базовой валюте] от старых к новым.
+        # Баланс сверх лотов (куплено до учёта лотов или без курса) - позиция
+        # без цены. Суммы по лотам ведутся на ходу, без обхода очереди
+        self._lots: Deque[List[float]] = deque(
+            [float(amount), float(price)] for amount, price in lots or ()
+        )
+        self._lot_amount = sum(lot[0] for lot in self._lots)
+        self._cost = sum(lot[0] * lot[1] for lot in self._lots)
+        self.realized_pnl = float(realized_pnl)
 
     @property
     def balance(self) -> float:
@@ -115,26 +138,116 @@ class Wallet:
             raise ValueError(f"Недостаточно средств: доступно {self.balance}, требуется {amount}")
         self.balance -= float(amount)
 
+    @property
+    def cost_basis(self) -> float:
+        # Стоимость покупки количества в лотах
+        return self._cost
+
+    @property
+    def lot_amount(self) -> float:
+        return self._lot_amount
+
+    @property
+    def unpriced_amount(self) -> float:
+        return max(0.0, self._balance - self._lot_amount)
+
+    def _collapse_lots(self) -> None:
+        # Средняя цена: лоты сливаются в один (при смене метода - один раз)
+        if len(self._lots) > 1:
+            self._lots = deque([[self._lot_amount, self._cost / self._lot_amount]])
+
+    def record_buy(
+            self,
+            amount: float,
+            price: Optional[float],
+            method: str = FIFO,
+    ) -> None:
+        # Пополнение с новым лотом; без курса количество остаётся без цены
+        self.deposit(amount)
+        if price is None:
+            return
+        amount, price = float(amount), float(price)
+        self._lot_amount += amount
+        self._cost += amount * price
+        if method == AVERAGE and self._lots:
+            self._collapse_lots()
+            self._lots[0] = [self._lot_amount, self._cost / self._lot_amount]
+        else:
+            self._lots.append([amount, price])
+
+    def record_sell(
+            self,
+            amount: float,
+            price: Optional[float],
+            method: str = FIFO,
+    ) -> float:
+        # Снятие с сопоставлением лотов: сначала списывается количество без
+        # цены, затем лоты с начала очереди (FIFO) или единый лот по средней
+        # цене. Каждый лот добавляется и удаляется один раз - O(1)
+        # амортизированно. Возвращает реализованный PnL сделки
+        unpriced = self.unpriced_amount
+        self.withdraw(amount)
+        remaining = float(amount) - min(float(amount), unpriced)
+        if method == AVERAGE:
+            self._collapse_lots()
+
+        realized = 0.0
+        lots = self._lots
+        while remaining > _LOT_EPSILON and lots:
+            lot = lots[0]
+            take = min(remaining, lot[0])
+            if price is not None:
+                realized += take * (float(price) - lot[1])
+            lot[0] -= take
+            self._lot_amount -= take
+            self._cost -= take * lot[1]
+            remaining -= take
+            if lot[0] <= _LOT_EPSILON:
+                lots.popleft()
+        if not lots:
+            # Сброс накопленной погрешности сумм
+            self._lot_amount = self._cost = 0.0
+        self.realized_pnl += realized
+        return realized
+
     def get_balance_info(self) -> str:
         return f"{self.currency_code}: {self.balance:.4f}"
 
     def to_dict(self) -> dict:
-        return {
+        data: Dict[str, Any] = {
             "currency_code": self.currency_code,
             "balance": self.balance,
         }
+        # Лоты - списки [количество, цена] без имён полей
+        if self._lots:
+            data["lots"] = [list(lot) for lot in self._lots]
+        if self.realized_pnl:
+            data["realized_pnl"] = self.realized_pnl
+        return data
 
 
 class Portfolio:
-    def __init__(self, user_id: int, wallets: Optional[Dict[str, Any]] = None):
+    def __init__(
+            self,
+            user_id: int,
+            wallets: Optional[Dict[str, Any]] = None,
+            version: int = 0,
+    ):
         self._user_id = user_id
         self._wallets: Dict[str, Wallet] = {}
+        # Растёт при каждом сохранении (ключ кеша оценок)
+        self._version = int(version)
 
         # Инициализация кошельков из словаря или объектов
         if wallets:
             for code, data in wallets.items():
                 if isinstance(data, dict):
-                    self._wallets[code] = Wallet(code, data.get('balance', 0.0))
+                    self._wallets[code] = Wallet(
+                        code,
+                        data.get('balance', 0.0),
+                        data.get('lots'),
+                        data.get('realized_pnl', 0.0),
+                    )
                 elif isinstance(data, Wallet):
                     self._wallets[code] = data
 
@@ -142,6 +255,16 @@ class Portfolio:
     def user_id(self) -> int:
         return self._user_id
 
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump_version(self, stored: int = 0) -> int:
+        # stored - версия уже сохранённого портфеля: после записи из другого
+        # процесса новая версия всё равно больше всех прежних
+        self._version = max(self._version, stored) + 1
+        return self._version
+
     @property
     def wallets(self) -> Dict[str, Wallet]:
         # Возврат копии словаря кошельков
@@ -168,8 +291,8 @@ class Portfolio:
                 total += wallet.balance
                 continue
 
-            pair = f"{code}_{base}"
-            rate_info = exchange_rates.get(pair)
+            # Ключи снапшота - Pair, ищутся кортежем (код, база)
+            rate_info = exchange_rates.get((code, base))
 
             rate = 0.0
             if rate_info:
@@ -189,4 +312,5 @@ class Portfolio:
         return {
             "user_id": self._user_id,
             "wallets": wallets_data,
+            "version": self._version,
         }
\ No newline at end of file
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from valutatrade_hub.core.rates import Pair
+from valutatrade_hub.core.utils import load_json, save_json
+
+BUY = "buy"
+SELL = "sell"
+
+OPEN = "open"
+EXECUTED = "executed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# (лимитная цена, id заявки): id разводит заявки с одинаковой ценой
+# и сохраняет порядок поступления
+_IndexEntry = Tuple[float, int]
+
+
+class LimitOrder:
+    def __init__(
+            self,
+            order_id: int,
+            user_id: int,
+            username: str,
+            side: str,
+            currency_code: str,
+            amount: float,
+            limit_price: float,
+            quote: str = "USD",
+            status: str = OPEN,
+            created_at: Optional[str] = None,
+            closed_at: Optional[str] = None,
+            executed_price: Optional[float] = None,
+            reason: Optional[str] = None,
+    ) -> None:
+        if side not in (BUY, SELL):
+            raise ValueError("side должен быть buy или sell")
+        if amount <= 0:
+            raise ValueError("'amount' должен быть положительным числом")
+        if limit_price <= 0:
+            raise ValueError("'price' должен быть положительным числом")
+
+        self.order_id = int(order_id)
+        self.user_id = int(user_id)
+        self.username = username
+        self.side = side
+        self.currency_code = currency_code.upper()
+        self.amount = float(amount)
+        self.limit_price = float(limit_price)
+        self.quote = quote.upper()
+        self.status = status
+        self.created_at = created_at or datetime.now().isoformat()
+        self.closed_at = closed_at
+        self.executed_price = executed_price
+        self.reason = reason
+
+    @property
+    def pair(self) -> Pair:
+        return Pair(self.currency_code, self.quote)
+
+    def close(self, status: str, price: Optional[float] = None,
+              reason: Optional[str] = None) -> None:
+        self.status = status
+        self.closed_at = datetime.now().isoformat()
+        self.executed_price = price
+        self.reason = reason
+
+    def describe(self) -> str:
+        line = (
+            f"#{self.order_id} {self.side.upper()} {self.amount:.4f} "
+            f"{self.currency_code} @ {self.limit_price:.8g} {self.quote} "
+            f"[{self.status}]"
+        )
+        if self.status == EXECUTED and self.executed_price is not None:
+            line += f" исполнена по {self.executed_price:.8g}"
+        if self.reason:
+            line += f" ({self.reason})"
+        return line
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "user_id": self.user_id,
+            "username": self.username,
+            "side": self.side,
+            "currency_code": self.currency_code,
+            "amount": self.amount,
+            "limit_price": self.limit_price,
+            "quote": self.quote,
+            "status": self.status,
+            "created_at": self.created_at,
+            "closed_at": self.closed_at,
+            "executed_price": self.executed_price,
+            "reason": self.reason,
+        }
+
+
+class _PairIndex:
+    # Открытые заявки одной пары, отсортированные по цене.
+    # buy срабатывает при курсе <= limit, sell - при курсе >= limit,
+    # поэтому сработавшие заявки всегда лежат на одном краю списка
+    def __init__(self) -> None:
+        self.buys: List[_IndexEntry] = []
+        self.sells: List[_IndexEntry] = []
+
+    def _side(self, side: str) -> List[_IndexEntry]:
+        return self.buys if side == BUY else self.sells
+
+    def add(self, order: LimitOrder) -> None:
+        bisect.insort(self._side(order.side), (order.limit_price, order.order_id))
+
+    def remove(self, order: LimitOrder) -> bool:
+        entries = self._side(order.side)
+        entry = (order.limit_price, order.order_id)
+        idx = bisect.bisect_left(entries, entry)
+        if idx < len(entries) and entries[idx] == entry:
+            del entries[idx]
+            return True
+        return False
+
+    def pop_crossed(self, price: float) -> List[int]:
+        # O(log n + k): два бинарных поиска и срез сработавших заявок
+        start = bisect.bisect_left(self.buys, (price,))
+        crossed = [order_id for _, order_id in self.buys[start:]]
+        del self.buys[start:]
+
+        end = bisect.bisect_right(self.sells, (price, float("inf")))
+        crossed.extend(order_id for _, order_id in self.sells[:end])
+        del self.sells[:end]
+        return crossed
+
+    def __len__(self) -> int:
+        return len(self.buys) + len(self.sells)
+
+
+class OrderBook:
+    def __init__(self, orders: Iterable[LimitOrder] = (), next_id: int = 1) -> None:
+        self.orders: Dict[int, LimitOrder] = {}
+        self._index: Dict[Pair, _PairIndex] = {}
+        self.next_id = next_id
+        for order in orders:
+            self.orders[order.order_id] = order
+            self.next_id = max(self.next_id, order.order_id + 1)
+            if order.status == OPEN:
+                self._index.setdefault(order.pair, _PairIndex()).add(order)
+
+    def open_count(self) -> int:
+        return sum(len(idx) for idx in self._index.values())
+
+    def place(self, order: LimitOrder) -> LimitOrder:
+        self.orders[order.order_id] = order
+        self.next_id = max(self.next_id, order.order_id + 1)
+        self._index.setdefault(order.pair, _PairIndex()).add(order)
+        return order
+
+    def cancel(self, order_id: int, user_id: int) -> LimitOrder:
+        order = self.orders.get(order_id)
+        if order is None or order.user_id != user_id:
+            raise LookupError(f"Заявка #{order_id} не найдена")
+        if order.status != OPEN:
+            raise ValueError(f"Заявка #{order_id} уже закрыта ({order.status})")
+        index = self._index.get(order.pair)
+        if index is not None:
+            index.remove(order)
+        order.close(CANCELLED)
+        return order
+
+    def pop_crossed(self, pair: Pair, price: float) -> List[LimitOrder]:
+        # Сработавшие заявки удаляются из индекса, статус меняет вызывающий код
+        index = self._index.get(pair)
+        if not index:
+            return []
+        return [self.orders[order_id] for order_id in index.pop_crossed(price)]
+
+    def restore(self, orders: Iterable[LimitOrder]) -> None:
+        # Возвращает в индекс снятые pop_crossed, но не закрытые заявки
+        for order in orders:
+            if order.status == OPEN:
+                self._index.setdefault(order.pair, _PairIndex()).add(order)
+
+    def for_user(self, user_id: int, include_closed: bool = False) -> List[LimitOrder]:
+        return [
+            o for o in self.orders.values()
+            if o.user_id == user_id and (include_closed or o.status == OPEN)
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "next_id": self.next_id,
+            "orders": [o.to_dict() for o in self.orders.values()],
+        }
+
+
+class OrderStore:
+    # data/orders.json + индекс в памяти. Книга перестраивается только если
+    # файл изменил другой процесс, поэтому тик планировщика не платит O(n log n)
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.lock = threading.RLock()
+        self._book: Optional[OrderBook] = None
+        self._sig: Optional[tuple] = None
+
+    def _file_sig(self) -> Optional[tuple]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def book(self) -> OrderBook:
+        with self.lock:
+            sig = self._file_sig()
+            if self._book is None or sig != self._sig:
+                raw = load_json(self.path, {"next_id": 1, "orders": []})
+                self._book = OrderBook(
+                    (LimitOrder(**item) for item in raw.get("orders", [])),
+                    next_id=int(raw.get("next_id", 1)),
+                )
+                self._sig = sig
+            return self._book
+
+    def save(self) -> None:
+        with self.lock:
+            if self._book is None:
+                return
+            save_json(self.path, self._book.to_dict())
+            self._sig = self._file_sig()
+
+
+_STORE: Optional[OrderStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_order_store() -> OrderStore:
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                from valutatrade_hub.infra.settings import get_settings
+
+                _STORE = OrderStore(Path(get_settings().get("ORDERS_FILE")))
+    return _STORE
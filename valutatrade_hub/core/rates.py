@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import heapq
+import sys
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Версия раскладки rates.json: 2 - {"rates": {"BTC": {"USD": {...}}}},
+# 1 (без поля format) - плоский {"pairs": {"BTC_USD": {...}}}
+SNAPSHOT_FORMAT = 2
+# Разобранные строки кешируются; строки из внешних источников (фид,
+# старые файлы) не должны раздувать кеш бесконечно
+_PARSE_CACHE_LIMIT = 4096
+
+
+class Pair(tuple):
+    # Ключ курса (base, quote). Экземпляры интернированы: Pair("BTC", "USD")
+    # всегда один и тот же объект. Pair - кортеж, поэтому словарь курсов
+    # ищется и обычным кортежем: pairs.get((code, base)) без сборки строк
+    __slots__ = ()
+    _interned: Dict[Tuple[str, str], "Pair"] = {}
+    _parsed: Dict[str, "Pair"] = {}
+
+    def __new__(cls, base: str, quote: str) -> "Pair":
+        pair = cls._interned.get((base, quote))
+        if pair is None:
+            code = (sys.intern(base.upper()), sys.intern(quote.upper()))
+            pair = cls._interned.get(code)
+            if pair is None:
+                pair = cls._interned.setdefault(code, tuple.__new__(cls, code))
+            cls._interned.setdefault((base, quote), pair)
+        return pair
+
+    base = property(itemgetter(0))
+    quote = property(itemgetter(1))
+
+    @classmethod
+    def parse(cls, text: str) -> "Pair":
+        # "BTC_USD" -> Pair("BTC", "USD")
+        pair = cls._parsed.get(text)
+        if pair is None:
+            if not isinstance(text, str):
+                raise ValueError(f"Некорректная пара: {text!r}")
+            base, sep, quote = text.partition("_")
+            if not (sep and base and quote):
+                raise ValueError(f"Некорректная пара: {text!r}")
+            pair = cls(base, quote)
+            if len(cls._parsed) < _PARSE_CACHE_LIMIT:
+                cls._parsed[text] = pair
+        return pair
+
+    @property
+    def inverse(self) -> "Pair":
+        return Pair(self[1], self[0])
+
+    def __str__(self) -> str:
+        return f"{self[0]}_{self[1]}"
+
+    def __repr__(self) -> str:
+        return f"Pair({self[0]!r}, {self[1]!r})"
+
+    def __getnewargs__(self) -> Tuple[str, str]:
+        return self[0], self[1]
+
+
+PairLike = Union[Pair, Tuple[str, str], str]
+RateItem = Tuple[Pair, dict]
+
+
+def as_pair(value: PairLike) -> Pair:
+    # Ключи старого формата ("BTC_USD") и кортежи приводятся к Pair
+    if isinstance(value, Pair):
+        return value
+    if isinstance(value, str):
+        return Pair.parse(value)
+    return Pair(*value)
+
+
+def split_pair(pair: PairLike) -> Tuple[str, str]:
+    # "BTC_USD" -> ("BTC", "USD"); для Pair - без разбора строки
+    if isinstance(pair, tuple):
+        return pair[0], pair[1]
+    base, _, quote = pair.partition("_")
+    return base, quote
+
+
+def decode_snapshot(raw: dict) -> dict:
+    # rates.json любого формата -> {"pairs": {Pair: info}, ...}
+    pairs: Dict[Pair, dict] = {}
+    interned = Pair._interned
+    nested = raw.get("rates")
+    if isinstance(nested, dict):
+        for base, quotes in nested.items():
+            for quote, info in (quotes or {}).items():
+                key = (base, quote)
+                pairs[interned.get(key) or Pair(base, quote)] = info
+    for key, info in (raw.get("pairs") or {}).items():
+        try:
+            pairs.setdefault(Pair.parse(key), info)
+        except ValueError:
+            continue
+    snapshot = {"pairs": pairs, "last_refresh": raw.get("last_refresh")}
+    if raw.get("version") is not None:
+        snapshot["version"] = raw["version"]
+    return snapshot
+
+
+def encode_snapshot(snapshot: dict) -> dict:
+    # Обратное к decode_snapshot: вложенная раскладка база -> котировка
+    rates: Dict[str, Dict[str, dict]] = {}
+    for key, info in snapshot.get("pairs", {}).items():
+        base, quote = as_pair(key)
+        rates.setdefault(base, {})[quote] = info
+    raw = {"format": SNAPSHOT_FORMAT, "last_refresh": snapshot.get("last_refresh")}
+    if snapshot.get("version") is not None:
+        raw["version"] = snapshot["version"]
+    raw["rates"] = rates
+    return raw
+
+
+def _rate_of(item: RateItem) -> float:
+    return float(item[1].get("rate", 0))
+
+
+# Индекс снапшота курсов по кодам валют (база и котировка)
+class RatesIndex:
+    def __init__(self, snapshot: dict) -> None:
+        self.pairs: Dict[Pair, dict] = snapshot.get("pairs", {})
+        self.last_refresh: Optional[str] = snapshot.get("last_refresh")
+        self.version: Optional[int] = snapshot.get("version")
+        self._by_base: Dict[str, List[Pair]] = {}
+        self._by_quote: Dict[str, List[Pair]] = {}
+
+        for pair in self.pairs:
+            self._by_base.setdefault(pair.base, []).append(pair)
+            self._by_quote.setdefault(pair.quote, []).append(pair)
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def get(self, base: str, quote: str) -> Optional[dict]:
+        return self.pairs.get((base, quote))
+
+    def pairs_with_base(self, code: str) -> List[Pair]:
+        return self._by_base.get(code.upper(), [])
+
+    def pairs_with_quote(self, code: str) -> List[Pair]:
+        return self._by_quote.get(code.upper(), [])
+
+    def iter_items(self, currency: Optional[str] = None) -> Iterator[RateItem]:
+        # Без фильтра - все пары в порядке снапшота,
+        # с фильтром - только пары, где код точно совпадает с базой или котировкой
+        if not currency:
+            yield from self.pairs.items()
+            return
+
+        code = currency.upper()
+        for pair in self.pairs_with_base(code):
+            yield pair, self.pairs[pair]
+        for pair in self.pairs_with_quote(code):
+            # Пара вида "USD_USD" уже отдана выше
+            if pair.base != code:
+                yield pair, self.pairs[pair]
+
+    def top(self, n: int, currency: Optional[str] = None) -> List[RateItem]:
+        # Куча на n элементов: O(m log n) вместо полной сортировки
+        return heapq.nlargest(n, self.iter_items(currency), key=_rate_of)
+
+
+def select_rates(
+        index: RatesIndex,
+        currency: Optional[str] = None,
+        top: Optional[int] = None,
+) -> Iterable[RateItem]:
+    if top:
+        return index.top(top, currency)
+    return index.iter_items(currency)
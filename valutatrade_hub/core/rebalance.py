@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, List, Optional, Sequence
+
+from .currencies import get_currency
+from .models import Portfolio
+from .orders import BUY, SELL
+
+# NumPy - необязательная зависимость (как для risk): балансы всех портфелей
+# складываются в одну матрицу и пересчитываются одним проходом
+
+# Ордера дешевле этой доли стоимости портфеля - погрешность округления
+_DUST_SHARE = 1e-9
+
+
+def require_numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError(
+            "Для ребалансировки нужен NumPy: poetry install -E analytics "
+            "(или pip install numpy)"
+        ) from exc
+    return numpy
+
+
+def parse_targets(text: str) -> Dict[str, float]:
+    # "USD=50,BTC=30,ETH=20" (проценты) или "USD:0.5,BTC:0.3,ETH:0.2" -> доли.
+    # Коды проверяются по реестру валют, сумма долей - 100% или 1
+    targets: Dict[str, float] = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        code, sep, value = item.replace(":", "=").partition("=")
+        if not sep:
+            raise ValueError(f"Цель задаётся как CODE=доля, получено '{item}'")
+        code = get_currency(code.strip()).code
+        if code in targets:
+            raise ValueError(f"Валюта {code} указана дважды")
+        try:
+            weight = float(value.strip().rstrip("%"))
+        except ValueError:
+            raise ValueError(f"Некорректная доля '{value}' для {code}") from None
+        if not math.isfinite(weight) or weight < 0:
+            raise ValueError(f"Доля {code} должна быть неотрицательной")
+        targets[code] = weight
+
+    if not targets:
+        raise ValueError("Укажите цели, например USD=50,BTC=30,ETH=20")
+    total = sum(targets.values())
+    if math.isclose(total, 100.0, abs_tol=1e-6):
+        scale = 100.0
+    elif math.isclose(total, 1.0, abs_tol=1e-9):
+        scale = 1.0
+    else:
+        raise ValueError(f"Сумма долей должна быть 100% (или 1), получено {total:g}")
+    return {code: weight / scale for code, weight in targets.items()}
+
+
+class RebalanceOrder:
+    __slots__ = ("user_id", "side", "currency_code", "amount", "value")
+
+    def __init__(
+            self,
+            user_id: int,
+            side: str,
+            currency_code: str,
+            amount: float,
+            value: float,
+    ) -> None:
+        self.user_id = user_id
+        self.side = side
+        self.currency_code = currency_code
+        self.amount = amount
+        # Стоимость ордера в базовой валюте ребалансировки
+        self.value = value
+
+    def describe(self, base: str) -> str:
+        return (
+            f"{self.side.upper()} {self.amount:.8f} {self.currency_code} "
+            f"(~{self.value:,.2f} {base})"
+        )
+
+
+def plan_rebalance(
+        portfolios: Sequence[Portfolio],
+        targets: Dict[str, float],
+        prices: Dict[str, Optional[float]],
+        min_value: float = 0.0,
+) -> List[RebalanceOrder]:
+    # prices - курс к базе каждой валюты портфелей и целей (None - курса нет).
+    # Валюты без курса не входят в стоимость и не торгуются, валюты вне
+    # целей продаются полностью. Матрица портфели x валюты: стоимость,
+    # итог, целевые количества и разница за один проход. Ордер - не больше
+    # одного на валюту портфеля и только дороже min_value
+    np = require_numpy()
+    codes = sorted(prices)
+    index = {code: i for i, code in enumerate(codes)}
+
+    rows: List[int] = []
+    cols: List[int] = []
+    amounts: List[float] = []
+    for row, portfolio in enumerate(portfolios):
+        for code, wallet in portfolio.wallets.items():
+            rows.append(row)
+            cols.append(index[code])
+            amounts.append(wallet.balance)
+    balances = np.zeros((len(portfolios), len(codes)))
+    balances[rows, cols] = amounts
+
+    price = np.array(
+        [np.nan if prices[code] is None else prices[code] for code in codes],
+        dtype=float,
+    )
+    priced = ~np.isnan(price)
+    price = np.where(priced, price, 1.0)
+    weights = np.array([targets.get(code, 0.0) for code in codes])
+
+    values = balances * price
+    totals = (values * priced).sum(axis=1)
+    # Разница с нулевой целью - ровно -баланс: продажа не превышает баланс
+    delta = np.where(priced, totals[:, None] * weights / price - balances, 0.0)
+    delta_value = delta * price
+    threshold = np.maximum(min_value, totals * _DUST_SHARE)[:, None]
+    delta[np.abs(delta_value) <= threshold] = 0.0
+
+    orders: List[RebalanceOrder] = []
+    for row, col in zip(*np.nonzero(delta)):
+        amount = float(delta[row, col])
+        orders.append(RebalanceOrder(
+            portfolios[row].user_id,
+            BUY if amount > 0 else SELL,
+            codes[col],
+            abs(amount),
+            abs(float(delta_value[row, col])),
+        ))
+    return orders
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import NormalDist
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from ..metrics import get_metrics
+from .rates import Pair
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# NumPy - необязательная зависимость (extra analytics),
+# импортируется только при расчёте риска
+
+_WINDOW_UNITS = {"d": 86400, "h": 3600, "m": 60}
+_DAY = 86400
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as exc:
+        raise ImportError(
+            "Для расчёта риска нужен NumPy: poetry install -E analytics "
+            "(или pip install numpy)"
+        ) from exc
+    return numpy
+
+
+def parse_window(text: str) -> int:
+    # "30d" / "12h" / "90m" -> секунды
+    text = text.strip().lower()
+    unit = _WINDOW_UNITS.get(text[-1:]) if text else None
+    if unit is None or not text[:-1].isdigit() or int(text[:-1]) <= 0:
+        raise ValueError("Окно задаётся как 30d, 12h или 90m")
+    return int(text[:-1]) * unit
+
+
+class RiskModel:
+    # Выровненные ряды логарифмических доходностей пар X_<quote> на общей
+    # сетке и их ковариация. Строится один раз на окно и переиспользуется
+    # для любого числа портфелей
+    def __init__(self, pairs: List[Pair], prices: "np.ndarray", step: int) -> None:
+        np = _numpy()
+        self.pairs = pairs
+        self.codes = [pair.base for pair in pairs]
+        self.step = step
+        self.returns = np.diff(np.log(prices), axis=0)  # (T-1, N)
+        self.observations = self.returns.shape[0]
+        if self.observations >= 2:
+            self.mean = self.returns.mean(axis=0)
+            self.cov = np.atleast_2d(np.cov(self.returns, rowvar=False))
+        else:
+            self.mean = np.zeros(len(pairs))
+            self.cov = np.zeros((len(pairs), len(pairs)))
+        std = np.sqrt(np.diag(self.cov))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = self.cov / np.outer(std, std)
+        self.corr = np.nan_to_num(corr)
+        # Дневная волатильность по правилу корня из времени
+        self.scale = math.sqrt(_DAY / step)
+        self.volatility = std * self.scale
+
+    def exposures(self, values: Dict[str, float]) -> "np.ndarray":
+        np = _numpy()
+        return np.array([values.get(code, 0.0) for code in self.codes])
+
+    def evaluate(
+            self,
+            exposures: "np.ndarray",
+            confidence: float = 0.95,
+    ) -> Dict[str, "np.ndarray"]:
+        # exposures: (P, N) стоимости позиций в валюте котировки.
+        # P&L на шаге сетки линеаризуется как exposures @ returns
+        np = _numpy()
+        exposures = np.atleast_2d(exposures)
+        z = NormalDist().inv_cdf(confidence)
+
+        variance = np.einsum("pi,ij,pj->p", exposures, self.cov, exposures)
+        sigma = np.sqrt(np.maximum(variance, 0.0))
+        drift = exposures @ self.mean
+        # Горизонт - сутки: sigma растёт как корень из времени, снос линейно
+        parametric = np.maximum(
+            z * sigma * self.scale - drift * self.scale ** 2, 0.0
+        )
+
+        if self.observations:
+            # Квантиль P&L за шаг сетки, переведённый в сутки тем же корнем
+            pnl = self.returns @ exposures.T  # (T-1, P)
+            historical = np.maximum(
+                -np.percentile(pnl, (1 - confidence) * 100, axis=0), 0.0
+            ) * self.scale
+        else:
+            historical = np.zeros(exposures.shape[0])
+
+        return {
+            "volatility": sigma * self.scale,
+            "var_historical": historical,
+            "var_parametric": parametric,
+        }
+
+
+def build_risk_model(
+        rows: Iterable[dict],
+        quote: str,
+        since: datetime,
+        until: datetime,
+        step: int,
+) -> Optional[RiskModel]:
+    # Последняя цена каждой пары X_<quote> в каждом интервале сетки,
+    # пропуски заполняются предыдущей ценой
+    np = _numpy()
+    start = since.timestamp()
+    buckets = int((until.timestamp() - start) // step) + 1
+    closes: Dict[Pair, Dict[int, float]] = {}
+    for row in rows:
+        # В сегментах истории пара хранится строкой "BTC_USD"
+        pair = Pair.parse(row["pair"])
+        if pair.quote != quote or row["close"] <= 0:
+            continue
+        stamp = row["start"]
+        if stamp.endswith("Z"):
+            stamp = stamp[:-1] + "+00:00"
+        ts = datetime.fromisoformat(stamp)
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        idx = int((ts.timestamp() - start) // step)
+        if 0 <= idx < buckets:
+            closes.setdefault(pair, {})[idx] = float(row["close"])
+
+    pairs = sorted(closes)
+    if not pairs:
+        return None
+    prices = np.full((buckets, len(pairs)), np.nan)
+    for col, pair in enumerate(pairs):
+        for idx, close in closes[pair].items():
+            prices[idx, col] = close
+
+    # forward fill по времени
+    for row_idx in range(1, buckets):
+        missing = np.isnan(prices[row_idx])
+        prices[row_idx, missing] = prices[row_idx - 1, missing]
+    # Ряды начинаются с первого интервала, где известны все пары
+    complete = ~np.isnan(prices).any(axis=1)
+    if not complete.any():
+        return None
+    prices = prices[int(np.argmax(complete)):]
+    return RiskModel(pairs, prices, step)
+
+
+_CACHE: Dict[Tuple[int, int, str], Tuple[tuple, Optional[RiskModel]]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def get_risk_model(window: int, quote: str, step: int) -> Optional[RiskModel]:
+    # Модель кешируется, пока история на диске не изменилась
+    from ..parser_service.history import get_history_store
+
+    store = get_history_store()
+    signature = store.signature()
+    key = (window, step, quote)
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    until = datetime.now(timezone.utc)
+    since = until - timedelta(seconds=window)
+    started = time.perf_counter()
+    model = build_risk_model(
+        store.iter_history(since=since), quote, since, until, step
+    )
+    get_metrics().histogram(
+        "valutatrade_risk_model_build_seconds", "Risk model (covariance) build time"
+    ).observe(time.perf_counter() - started)
+    with _CACHE_LOCK:
+        _CACHE[key] = (signature, model)
+    return model
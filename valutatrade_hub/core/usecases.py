@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from datetime import datetime, timezone, timedelta
-from typing import Optional
-
-from prettytable import PrettyTable
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from ..decorators import log_action
 from ..infra.database import DatabaseManager
@@ -13,9 +13,24 @@ from .exceptions import (
     CurrencyNotFoundError,
     InsufficientFundsError,
 )
-from .models import User, Portfolio
+from .models import COST_METHODS, FIFO, User, Portfolio
+from .orders import (
+    BUY,
+    EXECUTED,
+    FAILED,
+    OPEN,
+    SELL,
+    LimitOrder,
+    get_order_store,
+)
+from .rates import Pair, RateItem, select_rates
+from .rebalance import RebalanceOrder, parse_targets, plan_rebalance
+from .utils import generate_salt, hash_password
+from .valuation import get_valuation_cache
 from ..core.currencies import get_currency
 
+logger = logging.getLogger(__name__)
+
 _current_username: Optional[str] = None
 
 
@@ -28,33 +43,144 @@ def set_current_username(username: Optional[str]) -> None:
     _current_username = username
 
 
-def _get_db() -> DatabaseManager:
-    return DatabaseManager()
+def _get_db(db: Optional[DatabaseManager] = None) -> DatabaseManager:
+    # db передаётся явно сервером (общий кеш), CLI использует синглтон
+    return db if db is not None else DatabaseManager()
+
 
+def _settings(db: Optional[DatabaseManager] = None) -> SettingsLoader:
+    # Настройки хранилища (у Hub - свои), иначе глобальные
+    return getattr(db, "settings", None) or SettingsLoader()
+
+
+def _cost_basis(db: Optional[DatabaseManager] = None) -> Tuple[str, str]:
+    # Валюта цен лотов и метод сопоставления продаж (fifo / average)
+    settings = _settings(db)
+    method = str(settings.get("COST_BASIS_METHOD", FIFO)).lower()
+    if method not in COST_METHODS:
+        raise ValueError(
+            f"COST_BASIS_METHOD должен быть одним из {', '.join(COST_METHODS)}"
+        )
+    return settings.get("DEFAULT_BASE_CURRENCY", "USD"), method
 
-def _require_login() -> User:
-    username = get_current_username()
+
+def _require_login(
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> User:
+    from_session = username is None
+    username = username or get_current_username()
     if not username:
         raise PermissionError("Сначала выполните login")
 
-    db = _get_db()
-    user = db.get_user_by_username(username)
+    user = _get_db(db).get_user_by_username(username)
     if not user:
-        set_current_username(None)
+        if from_session:
+            set_current_username(None)
         raise PermissionError("Пользователь не найден, выполните login заново")
     return user
 
 
+def _lookup_rate(pairs: dict, base: str, quote: str) -> Optional[float]:
+    # Прямой курс, затем обратный
+    if base == quote:
+        return 1.0
+    info = pairs.get((base, quote))
+    if info:
+        return float(info["rate"])
+    rev_info = pairs.get((quote, base))
+    if rev_info:
+        rev_rate = float(rev_info["rate"])
+        return 1 / rev_rate if rev_rate else None
+    return None
+
+
+def _age_seconds(raw: Optional[str], now: datetime) -> float:
+    # Возраст метки времени снапшота; без метки курс считается устаревшим
+    if not raw:
+        return float("inf")
+    if raw.endswith("Z"):
+        raw = raw[:-1] + "+00:00"
+    stamp = datetime.fromisoformat(raw)
+    if stamp.tzinfo is None:
+        stamp = stamp.replace(tzinfo=timezone.utc)
+    return (now - stamp).total_seconds()
+
+
+def _revalidates(db: Optional[DatabaseManager] = None) -> bool:
+    # Ревалидатор процесса пишет в глобальное хранилище: для хранилища
+    # со своими настройками (Hub) курсы только помечаются устаревшими
+    settings = _settings(db)
+    return bool(settings.get("RATES_REVALIDATE", True)) and (
+        settings is SettingsLoader()
+    )
+
+
+def _revalidated_pairs(
+        db: DatabaseManager,
+        wanted: Iterable[Tuple[str, str]],
+) -> Tuple[dict, bool]:
+    # Снапшот курсов и флаг "часть нужных курсов устарела".
+    # Старше RATES_TTL_SECONDS - курс отдаётся сразу, а группа источников
+    # обновляется в фоне; старше RATES_HARD_STALE_SECONDS - ждём обновления
+    settings = _settings(db)
+    ttl = int(settings.get("RATES_TTL_SECONDS", 300))
+    hard_ttl = int(settings.get("RATES_HARD_STALE_SECONDS", 3600))
+
+    snapshot = db.get_rates_snapshot()
+    pairs = snapshot.get("pairs", {})
+    now = datetime.now(timezone.utc)
+
+    stale: Dict[Pair, float] = {}
+    for base, quote in wanted:
+        key = Pair(base, quote)
+        if key not in pairs:
+            key = key.inverse
+        info = pairs.get(key)
+        if info is None:
+            continue
+        age = _age_seconds(info.get("updated_at") or snapshot.get("last_refresh"), now)
+        if age > ttl:
+            stale[key] = age
+
+    if not stale or not _revalidates(db):
+        return snapshot, bool(stale)
+
+    from ..parser_service.revalidate import get_revalidator
+
+    revalidator = get_revalidator()
+    hard_groups = {
+        revalidator.group_for(key) for key, age in stale.items() if age > hard_ttl
+    }
+    for group in {revalidator.group_for(k) for k in stale} - hard_groups:
+        revalidator.refresh_async(group)
+    if not hard_groups:
+        return snapshot, True
+
+    for group in hard_groups:
+        revalidator.refresh_sync(group)
+    snapshot = db.get_rates_snapshot()
+    pairs = snapshot.get("pairs", {})
+    now = datetime.now(timezone.utc)
+    still_stale = any(
+        _age_seconds(pairs.get(k, {}).get("updated_at"), now) > ttl for k in stale
+    )
+    return snapshot, still_stale
+
+
 @log_action("REGISTER")
-def register_user(username: str, password: str) -> str:
-    db = _get_db()
+def register_user(
+        username: str,
+        password: str,
+        db: Optional[DatabaseManager] = None,
+) -> str:
+    db = _get_db(db)
 
     if db.get_user_by_username(username):
         return f"Имя пользователя '{username}' уже занято"
 
-    # Генерация ID
-    users = db.load_users()
-    new_id = max((u.user_id for u in users), default=0) + 1
+    # ID из последовательности (без сканирования всех пользователей)
+    new_id = db.allocate_user_ids(1)[0]
 
     try:
         # Создание пользователя (пароль хешируется внутри __init__)
@@ -75,68 +201,333 @@ def register_user(username: str, password: str) -> str:
     )
 
 
-@log_action("LOGIN")
-def login_user(username: str, password: str) -> str:
-    db = _get_db()
-    user = db.get_user_by_username(username)
+# Меньше этого числа пользователей пул процессов не окупает запуск
+_PARALLEL_HASH_MIN = 2000
+
+
+@log_action("IMPORT_USERS")
+def import_users(
+        rows: Iterable[Tuple[str, str]],
+        workers: Optional[int] = None,
+        db: Optional[DatabaseManager] = None,
+) -> dict:
+    # Массовая регистрация из потока (username, password): пароли хешируются
+    # в пуле процессов, id берутся из последовательности одним блоком,
+    # пользователи и пустые портфели записываются одной операцией
+    db = _get_db(db)
+    taken = {u.username for u in db.load_users()}
+
+    names: List[str] = []
+    passwords: List[str] = []
+    duplicates: List[str] = []
+    invalid: List[Tuple[str, str]] = []
+    for username, password in rows:
+        username = (username or "").strip()
+        if not username:
+            invalid.append((username, "пустое имя"))
+        elif len(password or "") < 4:
+            invalid.append((username, "пароль короче 4 символов"))
+        elif username in taken:
+            duplicates.append(username)
+        else:
+            taken.add(username)
+            names.append(username)
+            passwords.append(password)
+
+    salts = [generate_salt() for _ in names]
+    workers = (
+        workers
+        or _settings(db).get("IMPORT_HASH_WORKERS")
+        or os.cpu_count()
+        or 1
+    )
+    if workers > 1 and len(names) >= _PARALLEL_HASH_MIN:
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(names) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            hashes = list(
+                pool.map(hash_password, passwords, salts, chunksize=chunksize)
+            )
+    else:
+        hashes = list(map(hash_password, passwords, salts))
+
+    if names:
+        ids = db.allocate_user_ids(len(names))
+        now = datetime.now()
+        db.import_users(
+            (
+                User(user_id=user_id, username=name, hashed_password=hashed,
+                     salt=salt, registration_date=now)
+                for user_id, name, hashed, salt in zip(ids, names, hashes, salts)
+            ),
+            (Portfolio(user_id=user_id) for user_id in ids),
+        )
+
+    return {"imported": len(names), "duplicates": duplicates, "invalid": invalid}
+
+
+def authenticate_user(
+        username: str,
+        password: str,
+        db: Optional[DatabaseManager] = None,
+) -> Tuple[Optional[User], str]:
+    # Проверка учётных данных без изменения текущей сессии CLI
+    user = _get_db(db).get_user_by_username(username)
 
     if not user:
-        return f"Пользователь '{username}' не найден"
+        return None, f"Пользователь '{username}' не найден"
 
     if not user.verify_password(password):
-        return "Неверный пароль"
+        return None, "Неверный пароль"
 
-    set_current_username(username)
-    return f"Вы вошли как '{username}'"
+    return user, f"Вы вошли как '{username}'"
 
 
-def show_portfolio(base_currency: str = "USD") -> str:
-    user = _require_login()
-    db = _get_db()
+@log_action("LOGIN")
+def login_user(username: str, password: str) -> str:
+    user, msg = authenticate_user(username, password)
+    if user:
+        set_current_username(username)
+    return msg
+
+
+def get_portfolio_valuation(
+        base_currency: str = "USD",
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> Optional[dict]:
+    # Стоимость кошельков и итог в базовой валюте; None, если портфеля нет
+    user = _require_login(username, db)
+    db = _get_db(db)
 
     portfolio = db.get_portfolio_by_user_id(user.user_id)
     if not portfolio:
-        return "Портфель не найден"
+        return None
 
     # Получаем словарь курсов
-    rates_data = db.get_rates_snapshot().get("pairs", {})
     base = base_currency.upper()
+    snapshot, stale = _revalidated_pairs(
+        db, ((code, base) for code in portfolio.wallets if code != base)
+    )
 
-    if not portfolio.wallets:
-        return "У вас пока нет ни одного кошелька"
+    # Строки и итог за один проход, с кешем по версиям портфеля и курсов.
+    # У Hub кеш свой: user_id в разных каталогах данных совпадают
+    cache = getattr(db, "valuation_cache", None)
+    if cache is None:
+        cache = get_valuation_cache()
+    cost_currency = _settings(db).get("DEFAULT_BASE_CURRENCY", "USD")
+    rows, total = cache.valuate(
+        portfolio,
+        snapshot.get("pairs", {}),
+        snapshot.get("version"),
+        base,
+        cost_currency,
+    )
 
-    table = PrettyTable()
-    table.field_names = ["Валюта", "Баланс", f"Стоимость в {base}"]
-    table.align = "l"
+    result = {
+        "username": user.username,
+        "base": base,
+        "wallets": rows,
+        "total": total,
+        "stale": stale,
+    }
+    if base == cost_currency:
+        # Нереализованный PnL - только по кошелькам с известным курсом
+        result["pnl"] = {
+            "unrealized": sum(r["unrealized_pnl"] or 0.0 for r in rows),
+            "realized": sum(r["realized_pnl"] for r in rows),
+        }
+    return result
+
+
+def get_portfolio_risk(
+        window: str = "30d",
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+        target: Optional[str] = None,
+) -> Optional[dict]:
+    # Волатильность, корреляции и однодневный VaR портфеля по истории курсов.
+    # target - чужой портфель, только для пользователя из ADMIN_USERS
+    from .risk import get_risk_model, parse_window
+
+    db = _get_db(db)
+    user = _require_login(username, db)
+    if target and target != user.username:
+        _require_admin(user, db)
+        other = db.get_user_by_username(target)
+        if other is None:
+            raise ValueError(f"Пользователь '{target}' не найден")
+        user = other
+    portfolio = db.get_portfolio_by_user_id(user.user_id)
+    if not portfolio:
+        return None
 
-    total = portfolio.get_total_value(rates_data, base)
+    settings = _settings(db)
+    base = settings.get("DEFAULT_BASE_CURRENCY", "USD")
+    confidence = float(settings.get("RISK_CONFIDENCE", 0.95))
+    model = get_risk_model(
+        parse_window(window), base, int(settings.get("RISK_GRID_SECONDS", 3600))
+    )
 
-    # Формирование строк таблицы
+    pairs = db.get_rates_snapshot().get("pairs", {})
+    values: Dict[str, float] = {}
     for code, wallet in portfolio.wallets.items():
-        # Расчет стоимости конкретного кошелька для отображения
-        val_in_base = 0.0
-        if code == base:
-            val_in_base = wallet.balance
-        else:
-            pair = f"{code}_{base}"
-            info = rates_data.get(pair)
-            if info:
-                rate = float(info["rate"])
-                val_in_base = wallet.balance * rate
+        rate = _lookup_rate(pairs, code, base)
+        if rate is not None and wallet.balance:
+            values[code] = wallet.balance * rate
+
+    modeled = set(model.codes) if model is not None else set()
+    report = {
+        "username": user.username,
+        "base": base,
+        "window": window,
+        "confidence": confidence,
+        "observations": model.observations if model is not None else 0,
+        "total": sum(values.values()),
+        # Позиции без истории курса (кроме базовой валюты) в риск не входят
+        "uncovered": sorted(c for c in values if c != base and c not in modeled),
+        "positions": [],
+        "volatility": 0.0,
+        "var_historical": 0.0,
+        "var_parametric": 0.0,
+        "correlation": {"codes": [], "matrix": []},
+    }
+    if model is None or not modeled & set(values):
+        return report
+
+    risk = model.evaluate(model.exposures(values), confidence)
+    held = [i for i, code in enumerate(model.codes) if code in values]
+    report.update({
+        "positions": [
+            {
+                "currency": model.codes[i],
+                "value": values[model.codes[i]],
+                "volatility": float(model.volatility[i]),
+            }
+            for i in held
+        ],
+        "volatility": float(risk["volatility"][0]),
+        "var_historical": float(risk["var_historical"][0]),
+        "var_parametric": float(risk["var_parametric"][0]),
+        "correlation": {
+            "codes": [model.codes[i] for i in held],
+            "matrix": model.corr[held][:, held].round(4).tolist(),
+        },
+    })
+    return report
+
+
+def show_risk(
+        window: str = "30d",
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+        target: Optional[str] = None,
+) -> str:
+    report = get_portfolio_risk(window, username, db, target)
+    if report is None:
+        return "Портфель не найден"
+    base = report["base"]
+    lines = [
+        f"Риск портфеля '{report['username']}' за {report['window']} "
+        f"({report['observations']} наблюдений, горизонт 1 день):",
+        f"Стоимость: {report['total']:,.2f} {base}",
+    ]
+    if not report["positions"]:
+        lines.append("Недостаточно истории курсов для расчёта риска.")
+        return "\n".join(lines)
+
+    pct = int(report["confidence"] * 100)
+    lines.extend([
+        f"Волатильность: {report['volatility']:,.2f} {base}",
+        f"VaR {pct}% исторический: {report['var_historical']:,.2f} {base}",
+        f"VaR {pct}% параметрический: {report['var_parametric']:,.2f} {base}",
+        "Позиции (дневная волатильность):",
+    ])
+    for row in report["positions"]:
+        lines.append(
+            f"- {row['currency']}: {row['value']:,.2f} {base}, "
+            f"σ {row['volatility'] * 100:.2f}%"
+        )
+    codes = report["correlation"]["codes"]
+    if len(codes) > 1:
+        lines.append("Корреляции: " + " ".join(f"{c:>7}" for c in codes))
+        for code, row in zip(codes, report["correlation"]["matrix"]):
+            lines.append(f"{code:>12} " + " ".join(f"{v:>7.2f}" for v in row))
+    if report["uncovered"]:
+        lines.append("Без истории курса: " + ", ".join(report["uncovered"]))
+    return "\n".join(lines)
+
+
+def _format_pnl(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:+,.2f}"
+
+
+def show_portfolio(
+        base_currency: str = "USD",
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+        pnl: bool = False,
+) -> str:
+    valuation = get_portfolio_valuation(base_currency, username, db)
+    if valuation is None:
+        return "Портфель не найден"
 
-        table.add_row([
-            code,
-            f"{wallet.balance:.4f}",
-            f"{val_in_base:.2f} {base}"
-        ])
+    if not valuation["wallets"]:
+        return "У вас пока нет ни одного кошелька"
+
+    from prettytable import PrettyTable
+
+    base = valuation["base"]
+    totals = valuation.get("pnl")
+    with_pnl = pnl and totals is not None
+    columns = ["Валюта", "Баланс", f"Стоимость в {base}"]
+    if with_pnl:
+        columns += ["Стоимость покупки", "Нереализ. PnL", "Реализ. PnL", "Без цены"]
+    table = PrettyTable()
+    table.field_names = columns
+    table.align = "l"
 
-    header = f"Портфель пользователя '{user.username}' (база: {base}):\n"
-    footer = f"ИТОГО: {total:,.2f} {base}"
+    # Формирование строк таблицы
+    for row in valuation["wallets"]:
+        cells = [
+            row["currency"],
+            f"{row['balance']:.4f}",
+            f"{row['value']:.2f} {base}"
+        ]
+        if with_pnl:
+            cells += [
+                f"{row['cost_basis']:,.2f}",
+                _format_pnl(row["unrealized_pnl"]),
+                _format_pnl(row["realized_pnl"]),
+                f"{row['unpriced']:.4f}" if row["unpriced"] else "-",
+            ]
+        table.add_row(cells)
+
+    header = (
+        f"Портфель пользователя '{valuation['username']}' (база: {base}):\n"
+    )
+    footer = f"ИТОГО: {valuation['total']:,.2f} {base}"
+    if valuation["stale"]:
+        footer += " (курсы устарели, обновление запущено)"
+    if with_pnl:
+        footer += (
+            f"\nPnL: нереализованный {_format_pnl(totals['unrealized'])} {base}, "
+            f"реализованный {_format_pnl(totals['realized'])} {base}"
+        )
+    elif pnl:
+        currency = _settings(db).get("DEFAULT_BASE_CURRENCY", "USD")
+        footer += f"\nPnL считается в {currency}: show-portfolio --base {currency}"
     return header + str(table) + "\n---------------------------------\n" + footer
 
 
 @log_action("BUY", verbose=True)
-def buy_currency(currency_code: str, amount: float) -> str:
+def buy_currency(
+        currency_code: str,
+        amount: float,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> str:
     # Валидация
     if amount <= 0:
         return "'amount' должен быть положительным числом"
@@ -145,8 +536,8 @@ def buy_currency(currency_code: str, amount: float) -> str:
     currency = get_currency(currency_code)
     code = currency.code
 
-    user = _require_login()
-    db = _get_db()
+    user = _require_login(username, db)
+    db = _get_db(db)
 
     # Получение портфеля
     portfolio = db.get_portfolio_by_user_id(user.user_id)
@@ -158,17 +549,19 @@ def buy_currency(currency_code: str, amount: float) -> str:
     if not wallet:
         wallet = portfolio.add_currency(code)
 
+    # Лот покупки по текущему курсу к базовой валюте
+    rates_data = db.get_rates_snapshot().get("pairs", {})
+    cost_currency, method = _cost_basis(db)
+
     before = wallet.balance
-    wallet.deposit(amount)
+    wallet.record_buy(amount, _lookup_rate(rates_data, code, cost_currency), method)
     after = wallet.balance
 
     # Сохраняем изменения
     db.save_portfolio(portfolio)
 
     # Оценочная стоимость
-    rates_data = db.get_rates_snapshot().get("pairs", {})
-    pair = f"{code}_USD"
-    info = rates_data.get(pair)
+    info = rates_data.get((code, "USD"))
 
     est_msg = ""
     if info:
@@ -185,7 +578,12 @@ def buy_currency(currency_code: str, amount: float) -> str:
 
 
 @log_action("SELL", verbose=True)
-def sell_currency(currency_code: str, amount: float) -> str:
+def sell_currency(
+        currency_code: str,
+        amount: float,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> str:
     # Валидация
     if amount <= 0:
         return "'amount' должен быть положительным числом"
@@ -193,8 +591,8 @@ def sell_currency(currency_code: str, amount: float) -> str:
     currency = get_currency(currency_code)
     code = currency.code
 
-    user = _require_login()
-    db = _get_db()
+    user = _require_login(username, db)
+    db = _get_db(db)
 
     portfolio = db.get_portfolio_by_user_id(user.user_id)
     if not portfolio:
@@ -204,24 +602,29 @@ def sell_currency(currency_code: str, amount: float) -> str:
     if not wallet:
         return f"У вас нет кошелька '{code}'. Сначала купите валюту."
 
+    rates_data = db.get_rates_snapshot().get("pairs", {})
+    cost_currency, method = _cost_basis(db)
+    price = _lookup_rate(rates_data, code, cost_currency)
+
     before = wallet.balance
+    lots_before = wallet.lot_amount
 
-    # Снятие
-    wallet.withdraw(amount)
+    # Снятие с сопоставлением лотов покупок
+    realized = wallet.record_sell(amount, price, method)
     after = wallet.balance
 
     db.save_portfolio(portfolio)
 
     # Оценочная выручка
-    rates_data = db.get_rates_snapshot().get("pairs", {})
-    pair = f"{code}_USD"
-    info = rates_data.get(pair)
+    info = rates_data.get((code, "USD"))
 
     est_msg = ""
     if info:
         rate = float(info["rate"])
         revenue = amount * rate
         est_msg = f"\nОценочная выручка: {revenue:,.2f} USD"
+    if price is not None and wallet.lot_amount < lots_before:
+        est_msg += f"\nРеализованный PnL: {realized:+,.2f} {cost_currency}"
 
     return (
         f"Продажа выполнена: {amount:.4f} {code}\n"
@@ -231,35 +634,219 @@ def sell_currency(currency_code: str, amount: float) -> str:
     )
 
 
-def get_rate(from_code: str, to_code: str) -> str:
+def _require_admin(user: User, db: Optional[DatabaseManager] = None) -> None:
+    # Операции над чужими портфелями - только для ADMIN_USERS
+    if user.username not in (_settings(db).get("ADMIN_USERS") or ()):
+        raise PermissionError(
+            f"Пользователь '{user.username}' не администратор (ADMIN_USERS)"
+        )
+
+
+def _rebalance_totals(orders: List[RebalanceOrder]) -> Tuple[float, float]:
+    # -> (сумма покупок, сумма продаж) в базовой валюте
+    bought = sum(o.value for o in orders if o.side == BUY)
+    sold = sum(o.value for o in orders if o.side == SELL)
+    return bought, sold
+
+
+@log_action("REBALANCE")
+def rebalance_portfolios(
+        targets: Dict[str, float],
+        all_users: bool = False,
+        dry_run: bool = False,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> dict:
+    # Ребалансировка своего портфеля; all_users - всех портфелей, только
+    # для пользователя из ADMIN_USERS
+    db = _get_db(db)
+    user = _require_login(username, db)
+    if all_users:
+        _require_admin(user, db)
+        portfolios = db.load_portfolios()
+    else:
+        portfolio = db.get_portfolio_by_user_id(user.user_id)
+        portfolios = [portfolio] if portfolio else []
+    return _rebalance(targets, portfolios, dry_run, db)
+
+
+def _rebalance(
+        targets: Dict[str, float],
+        portfolios: List[Portfolio],
+        dry_run: bool,
+        db: DatabaseManager,
+) -> dict:
+    # Ордера к целевым долям (parse_targets) для переданных портфелей.
+    # Стоимость - по снапшоту в DEFAULT_BASE_CURRENCY, ордера проводятся
+    # как buy/sell (лоты и реализованный PnL) и все изменённые портфели
+    # сохраняются одной записью. Проверка прав - у вызывающего
+    base, method = _cost_basis(db)
+    pairs = db.get_rates_snapshot().get("pairs", {})
+    codes = set(targets)
+    for portfolio in portfolios:
+        codes.update(portfolio.wallets)
+    prices = {code: _lookup_rate(pairs, code, base) for code in codes}
+    for code in targets:
+        if prices[code] is None:
+            raise CurrencyNotFoundError(f"Пара {code}/{base}")
+
+    min_value = float(_settings(db).get("REBALANCE_MIN_ORDER_VALUE", 0.0))
+    orders: List[RebalanceOrder] = plan_rebalance(
+        portfolios, targets, prices, min_value
+    )
+
+    if orders and not dry_run:
+        by_user = {p.user_id: p for p in portfolios}
+        changed: Dict[int, Portfolio] = {}
+        for order in orders:
+            portfolio = by_user[order.user_id]
+            price = prices[order.currency_code]
+            wallet = portfolio.add_currency(order.currency_code)
+            if order.side == SELL:
+                wallet.record_sell(order.amount, price, method)
+            else:
+                wallet.record_buy(order.amount, price, method)
+            changed[order.user_id] = portfolio
+        db.update_portfolios(changed.values())
+
+    # В журнал - только итоги: список ордеров по всем портфелям может
+    # быть большим
+    bought, sold = _rebalance_totals(orders)
+    logger.info(
+        "Rebalance users=%d orders=%d buy=%.2f sell=%.2f %s applied=%s",
+        len(portfolios), len(orders), bought, sold, base,
+        bool(orders) and not dry_run,
+    )
+    return {
+        "base": base,
+        "users": len(portfolios),
+        "orders": orders,
+        "applied": bool(orders) and not dry_run,
+    }
+
+
+def show_rebalance(
+        targets_text: str,
+        all_users: bool = False,
+        dry_run: bool = False,
+        limit: int = 20,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> str:
+    targets = parse_targets(targets_text)
+    report = rebalance_portfolios(
+        targets, all_users=all_users, dry_run=dry_run, username=username, db=db
+    )
+    base, orders = report["base"], report["orders"]
+    shares = ", ".join(f"{code} {weight * 100:g}%" for code, weight in targets.items())
+    prefix = "[dry-run] " if dry_run else ""
+    lines = [
+        f"{prefix}Ребалансировка к {shares} (цены в {base})",
+        f"Портфелей: {report['users']}, ордеров: {len(orders)}",
+    ]
+    if not orders:
+        lines.append("Портфели уже соответствуют целям")
+        return "\n".join(lines)
+
+    names = {u.user_id: u.username for u in _get_db(db).load_users()}
+    for order in orders[:limit]:
+        name = names.get(order.user_id, f"#{order.user_id}")
+        lines.append(f"  {name}: {order.describe(base)}")
+    if len(orders) > limit:
+        lines.append(f"  ... и ещё {len(orders) - limit}")
+    bought, sold = _rebalance_totals(orders)
+    lines.append(f"Покупки: {bought:,.2f} {base}, продажи: {sold:,.2f} {base}")
+    return "\n".join(lines)
+
+
+def rebalance_on_rates(
+        pairs: Dict[Pair, float],
+        db: Optional[DatabaseManager] = None,
+) -> Optional[dict]:
+    # Слушатель RatesUpdater: после обновления курсов приводит все портфели
+    # к REBALANCE_TARGETS (если цели заданы). Внутренний вызов процесса
+    # run-scheduler: сессии нет, проверка прав не выполняется
+    text = _settings(db).get("REBALANCE_TARGETS")
+    if not text:
+        return None
+    db = _get_db(db)
+    return _rebalance(parse_targets(text), db.load_portfolios(), False, db)
+
+
+def convert_currency(
+        from_code: str,
+        to_code: str,
+        amount: float,
+        db: Optional[DatabaseManager] = None,
+) -> str:
+    if amount <= 0:
+        return "'amount' должен быть положительным числом"
+
+    base = get_currency(from_code).code
+    quote = get_currency(to_code).code
+    pairs = _get_db(db).get_rates_snapshot().get("pairs", {})
+
+    rate = _lookup_rate(pairs, base, quote)
+    if rate is None:
+        # Кросс-курс через базовую валюту, например EUR→BTC через USD
+        cross = _settings(db).get("DEFAULT_BASE_CURRENCY", "USD")
+        to_cross = _lookup_rate(pairs, base, cross)
+        from_cross = _lookup_rate(pairs, cross, quote)
+        if to_cross is None or from_cross is None:
+            raise CurrencyNotFoundError(f"Пара {base}/{quote}")
+        rate = to_cross * from_cross
+
+    return (
+        f"{amount:.4f} {base} = {amount * rate:.8f} {quote} "
+        f"(курс {rate:.8f})"
+    )
+
+
+def _volatility_line(stats: Optional[dict], inverse: bool = False) -> str:
+    # Онлайн-статистика RatesUpdater из снапшота: сигма лог-доходности
+    # за тик одинакова для пары и обратной, EWMA курса - обращается
+    if not stats:
+        return ""
+    from ..parser_service.rate_stats import rate_volatility
+
+    volatility = rate_volatility(stats)
+    if volatility is None:
+        return ""
+    ewm_sigma, sigma, n = volatility
+    ewma = stats.get("ewma")
+    if inverse and ewma:
+        ewma = 1 / ewma
+    line = (
+        f"\nВолатильность за обновление: {ewm_sigma:.4%} (EWMA), "
+        f"{sigma:.4%} по {n} обновлениям"
+    )
+    if ewma:
+        line += f", EWMA курса: {ewma:.8f}"
+    return line
+
+
+def get_rate(
+        from_code: str,
+        to_code: str,
+        db: Optional[DatabaseManager] = None,
+) -> str:
     # Валидация кодов через get_currency
     base_curr = get_currency(from_code)
     quote_curr = get_currency(to_code)
     base = base_curr.code
     quote = quote_curr.code
 
-    # Загрузка настроек для проверки TTL
-    settings = SettingsLoader()
-    ttl = int(settings.get("RATES_TTL_SECONDS", 300))
-
-    db = _get_db()
-    snapshot = db.get_rates_snapshot()
+    snapshot, is_outdated = _revalidated_pairs(_get_db(db), [(base, quote)])
     pairs = snapshot.get("pairs", {})
-    last_refresh_raw = snapshot.get("last_refresh")
-
-    # Проверка актуальности кэша
-    is_outdated = False
-    if last_refresh_raw:
-        last_refresh = datetime.fromisoformat(last_refresh_raw)
-        if datetime.now(timezone.utc) - last_refresh > timedelta(seconds=ttl):
-            is_outdated = True
-    else:
-        is_outdated = True
 
-    pair = f"{base}_{quote}"
-    info = pairs.get(pair)
+    info = pairs.get((base, quote))
 
-    warning = " (Данные устарели, пожалуйста, выполните update-rates)" if is_outdated else ""
+    if not is_outdated:
+        warning = ""
+    elif _revalidates(db):
+        warning = " (Данные устарели, обновление запущено в фоне)"
+    else:
+        warning = " (Данные устарели, пожалуйста, выполните update-rates)"
 
     if info:
         rate = float(info["rate"])
@@ -267,48 +854,46 @@ def get_rate(from_code: str, to_code: str) -> str:
         return (
             f"Курс {base}→{quote}: {rate:.8f} (обновлено: {updated}){warning}\n"
             f"Обратный курс {quote}→{base}: {(1 / rate):.8f}"
+            + _volatility_line(info.get("stats"))
         )
 
     # Обратный курс
-    rev_pair = f"{quote}_{base}"
-    rev_info = pairs.get(rev_pair)
+    rev_info = pairs.get((quote, base))
     if rev_info:
         rev_rate = float(rev_info["rate"])
         rate = 1 / rev_rate if rev_rate else 0.0
         updated = rev_info.get("updated_at", "N/A")
         return (
             f"Курс {base}→{quote}: {rate:.8f} (вычислено через обратный, обновлено: {updated}){warning}"
+            + _volatility_line(rev_info.get("stats"), inverse=True)
         )
 
     raise CurrencyNotFoundError(f"Пара {base}/{quote}")
 
 
-def show_rates(currency: str | None = None, top: int | None = None) -> str:
-    db = _get_db()
-    snapshot = db.get_rates_snapshot()
-    pairs = snapshot.get("pairs", {})
-    last_refresh = snapshot.get("last_refresh", "Never")
+def iter_rates(
+        currency: str | None = None,
+        top: int | None = None,
+) -> Iterable[RateItem]:
+    # Пары из кеша с точным фильтром по коду через индекс
+    index = _get_db().get_rates_index()
+    return select_rates(index, currency=currency, top=top)
 
-    if not pairs:
-        return "Локальный кеш курсов пуст. Выполните 'update-rates'."
 
-    # Фильтрация и сортировка
-    items = []
-    for pair, data in pairs.items():
-        if currency:
-            target = currency.upper()
-            if target not in pair:
-                continue
-        items.append((pair, data))
+def show_rates(currency: str | None = None, top: int | None = None) -> str:
+    index = _get_db().get_rates_index()
+    last_refresh = index.last_refresh or "Never"
 
-    items.sort(key=lambda x: float(x[1].get('rate', 0)), reverse=True)
+    if not len(index):
+        return "Локальный кеш курсов пуст. Выполните 'update-rates'."
 
-    if top:
-        items = items[:top]
+    items = list(select_rates(index, currency=currency, top=top))
 
     if not items:
         return "Курсы не найдены по заданным критериям."
 
+    from prettytable import PrettyTable
+
     table = PrettyTable()
     table.field_names = ["Пара", "Курс", "Обновлено", "Источник"]
     table.align = "l"
@@ -321,4 +906,146 @@ def show_rates(currency: str | None = None, top: int | None = None) -> str:
             data.get('source', '-')
         ])
 
-    return f"Rates from cache (updated at {last_refresh}):\n" + str(table)
\ No newline at end of file
+    return f"Rates from cache (updated at {last_refresh}):\n" + str(table)
+
+
+@log_action("PLACE_ORDER", verbose=True)
+def place_order(
+        side: str,
+        currency_code: str,
+        amount: float,
+        price: float,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> str:
+    side = side.lower()
+    if side not in (BUY, SELL):
+        return "Укажите --side buy или --side sell"
+    code = get_currency(currency_code).code
+    user = _require_login(username, db)
+    quote = _settings(db).get("DEFAULT_BASE_CURRENCY", "USD")
+    if code == quote:
+        return f"Нельзя выставить заявку на {quote} за {quote}"
+
+    store = get_order_store()
+    with store.lock:
+        book = store.book()
+        try:
+            order = LimitOrder(
+                order_id=book.next_id,
+                user_id=user.user_id,
+                username=user.username,
+                side=side,
+                currency_code=code,
+                amount=amount,
+                limit_price=price,
+                quote=quote,
+            )
+        except ValueError as exc:
+            return str(exc)
+        book.place(order)
+        store.save()
+
+    return f"Заявка выставлена: {order.describe()}"
+
+
+@log_action("CANCEL_ORDER")
+def cancel_order(
+        order_id: int,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> str:
+    user = _require_login(username, db)
+    store = get_order_store()
+    with store.lock:
+        try:
+            order = store.book().cancel(order_id, user.user_id)
+        except (LookupError, ValueError) as exc:
+            return str(exc)
+        store.save()
+    return f"Заявка отменена: {order.describe()}"
+
+
+def list_orders(
+        include_closed: bool = False,
+        username: Optional[str] = None,
+        db: Optional[DatabaseManager] = None,
+) -> str:
+    user = _require_login(username, db)
+    orders = get_order_store().book().for_user(user.user_id, include_closed)
+    if not orders:
+        return "Заявок нет"
+    orders.sort(key=lambda o: o.order_id)
+    return "\n".join(o.describe() for o in orders)
+
+
+def execute_triggered_orders(
+        pairs: Dict[Pair, float],
+        db: Optional[DatabaseManager] = None,
+) -> List[LimitOrder]:
+    # Вызывается после RatesUpdater.run_update: по каждой обновлённой паре
+    # берёт из индекса только пересечённые заявки и проводит их как buy/sell
+    store = get_order_store()
+    executed: List[LimitOrder] = []
+    with store.lock:
+        book = store.book()
+        popped: List[LimitOrder] = []
+        try:
+            for pair, price in pairs.items():
+                crossed = book.pop_crossed(pair, price)
+                popped.extend(crossed)
+                for order in crossed:
+                    if _execute_order(order, price, db):
+                        executed.append(order)
+        finally:
+            # Непредвиденная ошибка (OSError при записи и т.п.): заявки, до
+            # которых не дошла очередь, возвращаются в индекс открытыми, а
+            # уже закрытые сохраняются
+            book.restore(popped)
+            if any(order.status != OPEN for order in popped):
+                store.save()
+    return executed
+
+
+def _execute_order(
+        order: LimitOrder,
+        price: float,
+        db: Optional[DatabaseManager] = None,
+) -> bool:
+    # Проводит сработавшую заявку как buy/sell и закрывает её.
+    # Ожидаемые ошибки закрывают заявку как FAILED, остальные - пробрасываются
+    try:
+        if order.side == BUY:
+            buy_currency(
+                currency_code=order.currency_code,
+                amount=order.amount,
+                username=order.username,
+                db=db,
+            )
+        else:
+            user = _require_login(order.username, db)
+            portfolio = _get_db(db).get_portfolio_by_user_id(user.user_id)
+            wallet = portfolio.get_wallet(order.currency_code) if portfolio else None
+            available = wallet.balance if wallet else 0.0
+            if available < order.amount:
+                raise InsufficientFundsError(
+                    available, order.amount, order.currency_code
+                )
+            sell_currency(
+                currency_code=order.currency_code,
+                amount=order.amount,
+                username=order.username,
+                db=db,
+            )
+    except (PermissionError, ValueError, InsufficientFundsError,
+            CurrencyNotFoundError) as exc:
+        order.close(FAILED, price=price, reason=str(exc))
+        logger.warning("Limit order #%d failed: %s", order.order_id, exc)
+        return False
+    order.close(EXECUTED, price=price)
+    logger.info(
+        "Limit order #%d executed: %s %s %.8f @ %.8g",
+        order.order_id, order.side, order.currency_code,
+        order.amount, price,
+    )
+    return True
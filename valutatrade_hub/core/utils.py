@@ -1,9 +1,13 @@
 import json
 import hashlib
 import secrets
+import time
 from pathlib import Path
 from typing import Any
 
+from valutatrade_hub.core.durability import replace_durably
+from valutatrade_hub.metrics import get_metrics
+
 def generate_salt() -> str:
     # Генерация случайной соли
     return secrets.token_hex(8)
@@ -23,10 +27,22 @@ def load_json(path: Path, default: Any) -> Any:
         except json.JSONDecodeError:
             return default
 
-def save_json(path: Path, data: Any) -> None:
-    # Безопасное сохранение JSON
+def save_json(path: Path, data: Any) -> int:
+    # Безопасное сохранение JSON, возвращает число записанных байт
+    started = time.perf_counter()
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp_path = path.with_suffix(path.suffix + ".tmp")
-    with tmp_path.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    tmp_path.replace(path)
\ No newline at end of file
+    payload = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    with tmp_path.open("wb") as f:
+        f.write(payload)
+        # rename и fsync по настройке DURABILITY
+        replace_durably(tmp_path, path, f)
+
+    metrics = get_metrics()
+    metrics.histogram(
+        "valutatrade_storage_write_seconds", "save_json duration"
+    ).observe(time.perf_counter() - started, file=path.name)
+    metrics.counter(
+        "valutatrade_storage_written_bytes_total", "Bytes written by save_json"
+    ).inc(len(payload), file=path.name)
+    return len(payload)
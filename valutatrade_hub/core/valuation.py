@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from ..metrics import get_metrics
+from .models import Portfolio
+
+# (user_id, версия портфеля, версия курсов, база)
+ValuationKey = Tuple[int, int, int, str]
+
+
+class _Valuation:
+    __slots__ = ("rows", "pair_versions", "total")
+
+    def __init__(
+            self,
+            rows: List[dict],
+            pair_versions: Dict[str, Optional[int]],
+            total: float,
+    ) -> None:
+        self.rows = rows
+        self.pair_versions = pair_versions
+        self.total = total
+
+
+class ValuationCache:
+    # LRU оценок портфелей. При новой версии курсов строки кошельков,
+    # чья пара не менялась, берутся из прошлой оценки того же портфеля,
+    # пересчитываются только кошельки с обновлённым курсом
+    def __init__(self, maxsize: int = 1024) -> None:
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[ValuationKey, _Valuation]" = OrderedDict()
+        # Последняя оценка портфеля в каждой базе - основа частичного пересчёта
+        self._latest: Dict[Tuple[int, str], ValuationKey] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._latest.clear()
+
+    def _put(self, key: ValuationKey, valuation: _Valuation) -> None:
+        self._entries[key] = valuation
+        self._entries.move_to_end(key)
+        self._latest[(key[0], key[3])] = key
+        while len(self._entries) > self.maxsize:
+            old_key, _ = self._entries.popitem(last=False)
+            if self._latest.get((old_key[0], old_key[3])) == old_key:
+                del self._latest[(old_key[0], old_key[3])]
+
+    def valuate(
+            self,
+            portfolio: Portfolio,
+            pairs: dict,
+            rates_version: Optional[int],
+            base: str,
+            cost_currency: Optional[str] = None,
+    ) -> Tuple[List[dict], float]:
+        # Строки {"currency", "balance", "value"} и итог в базовой валюте.
+        # Если база совпадает с валютой цен лотов (cost_currency), в строках
+        # ещё cost_basis, unrealized_pnl, realized_pnl и unpriced - в том же
+        # проходе. Снапшот без версии (записан не write_snapshot) не кешируется
+        counter = get_metrics().counter(
+            "valutatrade_valuation_cache_total", "Portfolio valuations by cache result"
+        )
+        if rates_version is None:
+            counter.inc(result="bypass")
+            return self._compute(portfolio, pairs, base, None, cost_currency)[:2]
+
+        key = (portfolio.user_id, portfolio.version, int(rates_version), base)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+            else:
+                latest = self._latest.get((portfolio.user_id, base))
+                previous = self._entries.get(latest) if latest else None
+                # Строки можно переиспользовать только при той же версии портфеля
+                if previous is not None and latest[1] != portfolio.version:
+                    previous = None
+        if cached is not None:
+            counter.inc(result="hit")
+            return [dict(row) for row in cached.rows], cached.total
+
+        rows, total, valuation = self._compute(
+            portfolio, pairs, base, previous, cost_currency
+        )
+        counter.inc(result="partial" if previous is not None else "miss")
+        with self._lock:
+            self._put(key, valuation)
+        return [dict(row) for row in rows], total
+
+    @staticmethod
+    def _compute(
+            portfolio: Portfolio,
+            pairs: dict,
+            base: str,
+            previous: Optional[_Valuation],
+            cost_currency: Optional[str] = None,
+    ) -> Tuple[List[dict], float, _Valuation]:
+        pnl = base == cost_currency
+        reused = {}
+        if previous is not None:
+            reused = {row["currency"]: row for row in previous.rows}
+
+        rows: List[dict] = []
+        pair_versions: Dict[str, Optional[int]] = {}
+        total = 0.0
+        for code, wallet in portfolio.wallets.items():
+            info = None
+            if code == base:
+                pair_version: Optional[int] = -1
+            else:
+                info = pairs.get((code, base))
+                pair_version = int(info.get("version", 0)) if info else None
+            pair_versions[code] = pair_version
+
+            row = reused.get(code)
+            if row is None or previous.pair_versions.get(code) != pair_version:
+                rate: Optional[float] = None
+                if code == base:
+                    rate = 1.0
+                elif info:
+                    rate = float(info["rate"])
+                value = wallet.balance * rate if rate is not None else 0.0
+                row = {"currency": code, "balance": wallet.balance, "value": value}
+                if pnl:
+                    # Лоты уже хранят количество и стоимость - O(1) на кошелёк
+                    row["cost_basis"] = wallet.cost_basis
+                    row["unrealized_pnl"] = (
+                        wallet.lot_amount * rate - wallet.cost_basis
+                        if rate is not None else None
+                    )
+                    row["realized_pnl"] = wallet.realized_pnl
+                    row["unpriced"] = wallet.unpriced_amount
+            rows.append(row)
+            total += row["value"]
+        return rows, total, _Valuation(rows, pair_versions, total)
+
+
+_CACHE: Optional[ValuationCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_valuation_cache() -> ValuationCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                from ..infra.settings import get_settings
+
+                size = int(get_settings().get("VALUATION_CACHE_SIZE", 1024))
+                _CACHE = ValuationCache(size)
+    return _CACHE
@@ -1,48 +1,87 @@
 import functools
 import logging
-from datetime import datetime, timezone
+import time
 from typing import Any, Callable, TypeVar
 
+from .metrics import get_metrics
+
 # Настройка логгера
 logger = logging.getLogger(__name__)
 
 F = TypeVar("F", bound=Callable[..., Any])
 
 
+class _Details:
+    # Результат для verbose-логов. Строка собирается только при форматировании
+    # записи, то есть в потоке QueueListener и только если запись не отброшена
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __str__(self) -> str:
+        if isinstance(self.value, str):
+            # Если результат строка, то убираем переносы
+            return "'" + self.value.replace("\n", " | ") + "'"
+        return str(self.value)
+
+
+def _record(metrics: Any, action: str, outcome: str, started: float) -> None:
+    metrics.histogram(
+        "valutatrade_action_duration_seconds", "Duration of use case calls"
+    ).observe(time.perf_counter() - started, action=action)
+    metrics.counter(
+        "valutatrade_actions_total", "Use case calls by outcome"
+    ).inc(action=action, outcome=outcome)
+
+
 def log_action(action: str, verbose: bool = False) -> Callable[[F], F]:
     def decorator(func: F) -> F:
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
-            # Используем timezone-aware datetime
-            timestamp = datetime.now(timezone.utc).isoformat()
-
+            # Время берётся из record.created, отдельная метка не нужна.
             # Пытаемся найти пользователя в аргументах (для register/login)
             username = kwargs.get("username") or kwargs.get("current_username")
+            user = username if username else "-"
 
-            msg_prefix = (
-                f"{action} ts={timestamp} user={username if username else '-'}"
-            )
+            metrics = get_metrics()
+            started = time.perf_counter()
 
-            logger.info(f"{msg_prefix} started")
+            enabled = logger.isEnabledFor(logging.INFO)
+            if enabled:
+                logger.info(
+                    "%s user=%s started", action, user,
+                    extra={"action": action, "user": user, "event": "started"},
+                )
             try:
                 result = func(*args, **kwargs)
-
-                if verbose and isinstance(result, str):
-                    # Если результат строка, то убираем переносы
-                    clean_res = result.replace('\n', ' | ')
-                    logger.info(f"{msg_prefix} OK details='{clean_res}'")
-                elif verbose and isinstance(result, dict):
-                    logger.info(f"{msg_prefix} OK details={result}")
-                else:
-                    logger.info(f"{msg_prefix} OK")
-
-                return result
             except Exception as exc:
+                _record(metrics, action, "error", started)
                 logger.error(
-                    f"{msg_prefix} ERROR type={type(exc).__name__} msg='{str(exc)}'"
+                    "%s user=%s ERROR type=%s msg='%s'",
+                    action, user, type(exc).__name__, exc,
+                    extra={
+                        "action": action,
+                        "user": user,
+                        "event": "error",
+                        "error_type": type(exc).__name__,
+                    },
                 )
                 raise
 
+            _record(metrics, action, "ok", started)
+            if enabled:
+                extra = {"action": action, "user": user, "event": "ok"}
+                if verbose and isinstance(result, (str, dict)):
+                    logger.info(
+                        "%s user=%s OK details=%s", action, user, _Details(result),
+                        extra=extra,
+                    )
+                else:
+                    logger.info("%s user=%s OK", action, user, extra=extra)
+
+            return result
+
         return wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from .infra.database import DatabaseManager
+from .infra.settings import SettingsLoader
+from .server.service import CachedStore, TradingService
+
+
+class Session:
+    # Результат Hub.login; токен действует SESSION_TTL_SECONDS
+    __slots__ = ("username", "token")
+
+    def __init__(self, username: str, token: str) -> None:
+        self.username = username
+        self.token = token
+
+    def __repr__(self) -> str:
+        return f"Session(username={self.username!r})"
+
+
+class Hub:
+    # Встраиваемый API без глобального состояния CLI: у каждого Hub свои
+    # настройки, хранилище, кеш оценок и сессии вместо _current_username.
+    # Методы потокобезопасны: сделки одного пользователя идут по очереди,
+    # разных - параллельно. Общими на процесс остаются реестр валют,
+    # книга заявок, метрики и уровень DURABILITY. Устаревшие курсы Hub
+    # не обновляет (RATES_REVALIDATE всегда False): RatesUpdater пишет
+    # через глобальное хранилище, то есть в чужой каталог данных. Курсы
+    # в base_dir обновляет run-scheduler с VALUTA_BASE_DIR=base_dir; его
+    # исполнения ордеров и ребалансировку CachedStore перечитывает с диска
+    #
+    #   hub = Hub("/srv/valuta")
+    #   session = hub.login("alice", "secret")
+    #   hub.buy(session, "BTC", 0.1)
+    def __init__(
+            self,
+            base_dir: Union[str, Path, None] = None,
+            **settings: Any,
+    ) -> None:
+        if settings.get("RATES_REVALIDATE"):
+            raise ValueError(
+                "RATES_REVALIDATE недоступен для Hub: курсы обновляет "
+                "run-scheduler с VALUTA_BASE_DIR на каталог Hub"
+            )
+        settings["RATES_REVALIDATE"] = False
+        self.settings = SettingsLoader.isolated(base_dir, **settings)
+        self.store = CachedStore(DatabaseManager.isolated(self.settings))
+        self._service = TradingService(
+            self.store,
+            session_ttl=int(self.settings.get("SESSION_TTL_SECONDS", 3600)),
+        )
+
+    def register(self, username: str, password: str) -> str:
+        result = self._service.register(username, password)
+        if not result["ok"]:
+            raise ValueError(result["message"])
+        return result["message"]
+
+    def login(self, username: str, password: str) -> Session:
+        # PermissionError при неверных учётных данных
+        result = self._service.login(username, password)
+        return Session(username, result["token"])
+
+    def logout(self, session: Session) -> None:
+        self._service.logout(session.token)
+
+    def buy(self, session: Session, currency: str, amount: float) -> str:
+        return self._service.buy(session.token, currency, amount)["message"]
+
+    def sell(self, session: Session, currency: str, amount: float) -> str:
+        return self._service.sell(session.token, currency, amount)["message"]
+
+    def valuation(self, session: Session, base: str = "USD") -> Optional[dict]:
+        # {"wallets": [...], "total": ..., "stale": ...}; None без портфеля
+        return self._service.show_portfolio(session.token, base).get("portfolio")
@@ -1,44 +1,90 @@
 from __future__ import annotations
 
+import functools
 import json
+import threading
+import time
 from pathlib import Path
-from typing import Any, List, Optional
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
 
 from valutatrade_hub.core.models import User, Portfolio
+from valutatrade_hub.core.rates import RatesIndex, decode_snapshot, encode_snapshot
 from valutatrade_hub.core.utils import load_json, save_json
-from valutatrade_hub.infra.settings import get_settings
+from valutatrade_hub.infra.settings import SettingsLoader, get_settings
+from valutatrade_hub.metrics import get_metrics
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _timed(func: F) -> F:
+    # Латентность операций хранилища по имени метода
+    histogram = get_metrics().histogram(
+        "valutatrade_db_operation_seconds", "DatabaseManager call duration"
+    )
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.observe(
+                time.perf_counter() - started, operation=func.__name__
+            )
+
+    return wrapper  # type: ignore[return-value]
 
 
 class DatabaseManager:
     _instance: Optional["DatabaseManager"] = None
+    _instance_lock = threading.Lock()
 
     def __new__(cls) -> "DatabaseManager":
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_paths()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_paths(get_settings())
+                    cls._instance = instance
         return cls._instance
 
-    def _init_paths(self) -> None:
-        settings = get_settings()
+    @classmethod
+    def isolated(cls, settings: SettingsLoader) -> "DatabaseManager":
+        # Хранилище с собственными настройками, не синглтон (Hub)
+        instance = super().__new__(cls)
+        instance._init_paths(settings)
+        return instance
+
+    def _init_paths(self, settings: SettingsLoader) -> None:
+        # usecases читают настройки через db.settings
+        self.settings = settings
         self.users_file = Path(settings.get("USERS_FILE"))
         self.portfolios_file = Path(settings.get("PORTFOLIOS_FILE"))
         self.rates_file = Path(settings.get("RATES_FILE"))
         self.exchange_history_file = Path(
             settings.get("EXCHANGE_HISTORY_FILE")
         )
+        self.sequences_file = Path(settings.get("SEQUENCES_FILE"))
+        self._sequence_lock = threading.Lock()
+        # (сигнатура файла, индекс) - одним кортежем, чтобы потоки
+        # сервера не увидели индекс от одной версии файла и сигнатуру от другой
+        self._rates_cache: Optional[tuple] = None
 
+    @_timed
     def load_users(self) -> List[User]:
         # Безопасная загрузка из utils
         raw_data = load_json(self.users_file, [])
         # Распаковываем словарь в конструктор __init__ для создания объектов
         return [User(**item) for item in raw_data]
 
+    @_timed
     def save_users(self, users: List[User]) -> None:
         # Метод to_dict() моделей и безопасное сохранение
         data = [u.to_dict() for u in users]
         save_json(self.users_file, data)
 
     # Получение конкретного пользователя (в usecases)
+    @_timed
     def get_user_by_username(self, username: str) -> Optional[User]:
         users = self.load_users()
         for user in users:
@@ -46,6 +92,7 @@ class DatabaseManager:
                 return user
         return None
 
+    @_timed
     def save_user(self, user: User) -> None:
         users = self.load_users()
         for i, u in enumerate(users):
@@ -56,15 +103,43 @@ class DatabaseManager:
             users.append(user)
         self.save_users(users)
 
+    @_timed
+    def allocate_user_ids(self, count: int = 1) -> range:
+        # Выдаёт count новых id из последовательности в sequences.json.
+        # При первом вызове последовательность начинается после max(user_id)
+        with self._sequence_lock:
+            sequences = load_json(self.sequences_file, {})
+            last = sequences.get("user_id")
+            if last is None:
+                last = max((u.user_id for u in self.load_users()), default=0)
+            sequences["user_id"] = last + count
+            save_json(self.sequences_file, sequences)
+        return range(last + 1, last + count + 1)
+
+    @_timed
+    def import_users(
+            self,
+            users: Iterable[User],
+            portfolios: Iterable[Portfolio],
+    ) -> None:
+        # Массовая запись: каждый файл перезаписывается один раз.
+        # Сначала портфели: сбой между записями оставит лишние пустые
+        # портфели, но не пользователя без портфеля
+        self.save_portfolios(self.load_portfolios() + list(portfolios))
+        self.save_users(self.load_users() + list(users))
+
+    @_timed
     def load_portfolios(self) -> List[Portfolio]:
         raw_data = load_json(self.portfolios_file, [])
         # Создаем объекты через конструктор
         return [Portfolio(**item) for item in raw_data]
 
+    @_timed
     def save_portfolios(self, portfolios: List[Portfolio]) -> None:
         data = [p.to_dict() for p in portfolios]
         save_json(self.portfolios_file, data)
 
+    @_timed
     def get_portfolio_by_user_id(self, user_id: int) -> Optional[Portfolio]:
         portfolios = self.load_portfolios()
         for p in portfolios:
@@ -72,28 +147,63 @@ class DatabaseManager:
                 return p
         return None
 
+    @_timed
     def save_portfolio(self, portfolio: Portfolio) -> None:
         portfolios = self.load_portfolios()
         found = False
         for i, p in enumerate(portfolios):
             if p.user_id == portfolio.user_id:
+                portfolio.bump_version(p.version)
                 portfolios[i] = portfolio
                 found = True
                 break
         if not found:
+            portfolio.bump_version()
+            portfolios.append(portfolio)
+        self.save_portfolios(portfolios)
+
+    @_timed
+    def update_portfolios(self, changed: Iterable[Portfolio]) -> None:
+        # Пакетный save_portfolio: один проход по файлу и одна запись
+        by_id = {p.user_id: p for p in changed}
+        portfolios = self.load_portfolios()
+        for i, p in enumerate(portfolios):
+            portfolio = by_id.pop(p.user_id, None)
+            if portfolio is not None:
+                portfolio.bump_version(p.version)
+                portfolios[i] = portfolio
+        for portfolio in by_id.values():
+            portfolio.bump_version()
             portfolios.append(portfolio)
         self.save_portfolios(portfolios)
 
+    @_timed
     def load_rates_snapshot(self) -> dict:
-        return load_json(self.rates_file, {"pairs": {}, "last_refresh": None})
+        # Читает и старый плоский формат {"pairs": {"BTC_USD": ...}}
+        return decode_snapshot(load_json(self.rates_file, {}))
 
+    @_timed
     def save_rates_snapshot(self, data: dict) -> None:
-        save_json(self.rates_file, data)
+        save_json(self.rates_file, encode_snapshot(data))
+
+    def get_rates_index(self) -> RatesIndex:
+        # Индекс перестраивается только если rates.json изменился на диске
+        try:
+            stat = self.rates_file.stat()
+            sig = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            sig = None
+        cached = self._rates_cache
+        if cached is None or cached[0] != sig:
+            cached = (sig, RatesIndex(self.load_rates_snapshot()))
+            self._rates_cache = cached
+        return cached[1]
 
     # Алиас для совместимости с usecases
     def get_rates_snapshot(self) -> dict:
         return self.load_rates_snapshot()
 
+    @_timed
     def append_exchange_record(self, record: dict) -> None:
         history = load_json(self.exchange_history_file, [])
         history.append(record)
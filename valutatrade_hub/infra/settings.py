@@ -1,27 +1,47 @@
 from __future__ import annotations
 
 import os
+import threading
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Optional, Union
 
 
 class SettingsLoader:
     _instance: Optional["SettingsLoader"] = None
+    _instance_lock = threading.Lock()
     _settings: dict[str, Any] = {}
 
     def __new__(cls) -> "SettingsLoader":
+        # Двойная проверка: потоки не создадут два экземпляра с разными
+        # словарями настроек
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._init_defaults()
+            with cls._instance_lock:
+                if cls._instance is None:
+                    instance = super().__new__(cls)
+                    instance._init_defaults()
+                    cls._instance = instance
         return cls._instance
 
-    def _init_defaults(self) -> None:
+    @classmethod
+    def isolated(
+            cls,
+            base_dir: Union[str, Path, None] = None,
+            **overrides: Any,
+    ) -> "SettingsLoader":
+        # Отдельный экземпляр вне синглтона (Hub): свои пути и значения,
+        # глобальные настройки процесса не меняются
+        instance = super().__new__(cls)
+        instance._init_defaults(base_dir)
+        instance._settings.update(overrides)
+        return instance
+
+    def _init_defaults(self, base_dir: Union[str, Path, None] = None) -> None:
         # Определяем корневую директорию проекта
         # Если запускаем из корня, то data будет в ./data
-        base_dir = Path(os.getenv("VALUTA_BASE_DIR", ".")).resolve()
+        # Каталоги не создаются здесь: save_json и configure_logging
+        # создают их сами при первой записи
+        base_dir = Path(base_dir or os.getenv("VALUTA_BASE_DIR", ".")).resolve()
         data_dir = base_dir / "data"
-        data_dir.mkdir(exist_ok=True, parents=True)
-
         logs_dir = base_dir / "logs"
 
         self._settings = {
@@ -32,9 +52,87 @@ class SettingsLoader:
             "EXCHANGE_HISTORY_FILE": str(
                 data_dir / "exchange_rates.json"
             ),
+            "CURRENCIES_FILE": str(data_dir / "currencies.json"),
+            "ORDERS_FILE": str(data_dir / "orders.json"),
+            # Последовательности id (user_id)
+            "SEQUENCES_FILE": str(data_dir / "sequences.json"),
+            # Процессов для хеширования паролей в import-users (None - по числу
+            # CPU). Для текущего sha256 с солью пул не окупается, поэтому 1;
+            # имеет смысл при переходе на медленную KDF
+            "IMPORT_HASH_WORKERS": 1,
+            # Состояние circuit breaker источников курсов
+            "CIRCUIT_STATE_FILE": str(data_dir / "circuit_breakers.json"),
+            # Несколько run-scheduler на общем томе: обновляет только держатель
+            # аренды; остальные перехватывают её в течение ttl после его смерти
+            "SCHEDULER_LEADER_ELECTION": True,
+            "SCHEDULER_LEASE_FILE": str(data_dir / "scheduler_lease.json"),
+            "SCHEDULER_LEASE_TTL_SECONDS": 30,
+            # История курсов: сырые тики хранятся HISTORY_RAW_RETENTION_DAYS
+            # дней, минутные бары - HISTORY_MINUTE_RETENTION_DAYS, дальше
+            # только часовые. Сжатие сегментов: gzip или lzma
+            "HISTORY_SEGMENTS_DIR": str(data_dir / "history"),
+            "HISTORY_RAW_RETENTION_DAYS": 7,
+            "HISTORY_MINUTE_RETENTION_DAYS": 90,
+            "HISTORY_COMPRESSION": "gzip",
+            # backfill-history: строк выгрузки в одном отсортированном батче
+            "HISTORY_BACKFILL_BATCH_ROWS": 50000,
+            # Надёжность записи на диск: none, fsync или group (общий fsync
+            # для параллельных записей; GROUP_COMMIT_WINDOW_MS - доп. ожидание)
+            "DURABILITY": "none",
+            "GROUP_COMMIT_WINDOW_MS": 0,
             "RATES_TTL_SECONDS": 300,
+            # Оценок портфелей в LRU (user, версия портфеля, версия курсов, база)
+            "VALUATION_CACHE_SIZE": 1024,
+            # Устаревший курс отдаётся сразу и обновляется в фоне;
+            # старше RATES_HARD_STALE_SECONDS - обновляется синхронно
+            "RATES_REVALIDATE": True,
+            "RATES_HARD_STALE_SECONDS": 3600,
+            # Онлайн-статистика пар в RatesUpdater: тик дальше
+            # RATES_OUTLIER_ZSCORE сигм (EWMA лог-доходностей, не меньше
+            # MIN_SIGMA) уходит в карантин, когда у пары набралось
+            # MIN_SAMPLES доходностей; 0 - проверка выключена. После
+            # MAX_STREAK выбросов подряд курс принимается как новый уровень
+            "RATES_OUTLIER_ZSCORE": 10.0,
+            "RATES_OUTLIER_MIN_SAMPLES": 20,
+            "RATES_OUTLIER_MIN_SIGMA": 0.002,
+            "RATES_STATS_EWMA_ALPHA": 0.06,
+            "RATES_QUARANTINE_MAX_STREAK": 3,
+            "RATES_QUARANTINE_FILE": str(data_dir / "rates_quarantine.json"),
+            "RATES_QUARANTINE_KEEP": 1000,
             "DEFAULT_BASE_CURRENCY": "USD",
+            # Сопоставление продаж с лотами покупок для PnL: fifo или average
+            # (средняя цена). Цены лотов - в DEFAULT_BASE_CURRENCY
+            "COST_BASIS_METHOD": "fifo",
+            # Целевые доли для run-scheduler ("USD=50,BTC=30,ETH=20"): после
+            # каждого обновления курсов все портфели приводятся к ним.
+            # None - без автоматической ребалансировки
+            "REBALANCE_TARGETS": None,
+            # Ордера ребалансировки дешевле (в DEFAULT_BASE_CURRENCY) не создаются
+            "REBALANCE_MIN_ORDER_VALUE": 1.0,
+            # Пользователи, которым доступны операции над всеми портфелями
+            # (rebalance --all-users)
+            "ADMIN_USERS": [],
             "LOG_DIR": str(logs_dir),
+            # Запись логов в фоновом потоке (QueueListener)
+            "LOG_ASYNC": True,
+            # Доля сохраняемых записей log_action и лимит записей/с на action
+            # (0 - без ограничения); ошибки пишутся всегда
+            "LOG_SAMPLE_RATE": 1.0,
+            "LOG_RATE_LIMIT_PER_ACTION": 0,
+            # Команда risk: шаг сетки доходностей и доверительный уровень VaR
+            "RISK_GRID_SECONDS": 3600,
+            "RISK_CONFIDENCE": 0.95,
+            # Сколько строк попадает в отчёты --profile / --trace-mem
+            "PROFILE_TOP_N": 20,
+            # Запись команд CLI для воспроизведения (benchmarks/replay.py)
+            "WORKLOAD_RECORD_FILE": os.getenv("VALUTA_RECORD_WORKLOAD"),
+            # Файл метрик Prometheus, который пишет run-scheduler (None - не писать)
+            "METRICS_TEXTFILE": None,
+            # Локальный JSON API (команда serve)
+            "SERVER_HOST": "127.0.0.1",
+            "SERVER_PORT": 8765,
+            "SERVER_WORKERS": 8,
+            "SESSION_TTL_SECONDS": 3600,
         }
 
     def get(self, key: str, default: Any | None = None) -> Any:
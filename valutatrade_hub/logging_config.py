@@ -1,40 +1,151 @@
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Dict, List, Optional
 
 _LOGGING_CONFIGURED = False
+_LISTENER: Optional[QueueListener] = None
 
+# Поля, которые log_action кладёт в record через extra
+_STRUCTURED_FIELDS = ("action", "user", "event", "error_type")
 
-def configure_logging() -> None:
-    global _LOGGING_CONFIGURED
-    if _LOGGING_CONFIGURED:
-        return
 
-    logs_dir = Path("logs")
-    logs_dir.mkdir(exist_ok=True)
+class JsonLinesFormatter(logging.Formatter):
+    # Одна запись - одна JSON-строка; сообщение собирается только здесь,
+    # то есть в потоке QueueListener, а не в потоке сделки
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in _STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    # Стандартный QueueHandler.prepare() форматирует запись в вызывающем
+    # потоке. Здесь запись уходит в очередь как есть
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # traceback нельзя безопасно передать в другой поток
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
 
-    logfile = logs_dir / "app.log"
+class ActionSampler(logging.Filter):
+    # Сэмплирование и ограничение частоты записей log_action по action.
+    # Предупреждения, ошибки и записи без action не отбрасываются
+    def __init__(self, sample_rate: float = 1.0, rate_limit: float = 0.0) -> None:
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self._buckets: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _take_token(self, action: str) -> bool:
+        # Token bucket: до rate_limit записей в секунду на action
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(action)
+            if bucket is None:
+                bucket = self._buckets[action] = [self.rate_limit, now]
+            tokens = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1.0
+            return True
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        action = getattr(record, "action", None)
+        if action is None or record.levelno >= logging.WARNING:
+            return True
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return False
+        if self.rate_limit > 0 and not self._take_token(action):
+            self.dropped += 1
+            return False
+        return True
+
+
+def build_handlers(logs_dir: Path) -> List[logging.Handler]:
+    # Конечные обработчики: JSON Lines в файл и читаемый формат в консоль
+    logs_dir.mkdir(parents=True, exist_ok=True)
 
     handler = RotatingFileHandler(
-        logfile,
+        logs_dir / "app.log",
         maxBytes=1_000_000,
         backupCount=3,
         encoding="utf-8",
     )
+    handler.setFormatter(JsonLinesFormatter())
 
     fmt = (
         "%(levelname)s %(asctime)s "
         "%(name)s %(funcName)s: %(message)s"
     )
-    formatter = logging.Formatter(fmt=fmt, datefmt="%Y-%m-%dT%H:%M:%S")
-    handler.setFormatter(formatter)
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(fmt=fmt, datefmt="%Y-%m-%dT%H:%M:%S"))
+    return [handler, console]
+
+
+def _stop_listener() -> None:
+    global _LISTENER
+    if _LISTENER is not None:
+        _LISTENER.stop()
+        _LISTENER = None
+
+
+def configure_logging() -> None:
+    global _LOGGING_CONFIGURED, _LISTENER
+    if _LOGGING_CONFIGURED:
+        return
+
+    from valutatrade_hub.infra.settings import get_settings
+
+    settings = get_settings()
+    handlers = build_handlers(Path(settings.get("LOG_DIR", "logs")))
+    sampler = ActionSampler(
+        sample_rate=float(settings.get("LOG_SAMPLE_RATE", 1.0)),
+        rate_limit=float(settings.get("LOG_RATE_LIMIT_PER_ACTION", 0)),
+    )
 
     root_logger = logging.getLogger()
     root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(handler)
 
-    console = logging.StreamHandler()
-    console.setFormatter(formatter)
-    root_logger.addHandler(console)
+    if settings.get("LOG_ASYNC", True):
+        # Запись на диск и в консоль идёт в фоновом потоке QueueListener
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = DeferredQueueHandler(log_queue)
+        queue_handler.addFilter(sampler)
+        root_logger.addHandler(queue_handler)
+        _LISTENER = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _LISTENER.start()
+        # Дописываем очередь при выходе из процесса
+        atexit.register(_stop_listener)
+    else:
+        for handler in handlers:
+            handler.addFilter(sampler)
+            root_logger.addHandler(handler)
 
-    _LOGGING_CONFIGURED = True
\ No newline at end of file
+    _LOGGING_CONFIGURED = True
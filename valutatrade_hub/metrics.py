@@ -0,0 +1,275 @@
+from __future__ import annotations
+
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_SAMPLE_RE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$")
+_LABEL_RE = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), value)
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str = "") -> None:
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[LabelKey, float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in self.samples():
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    # Гистограмма с фиксированными границами корзин, как в Prometheus
+    def __init__(
+            self,
+            name: str,
+            help_text: str = "",
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> [счётчики корзин..., +Inf], сумма, количество
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = _label_key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0, 0])
+            entry[0][idx] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[Tuple[LabelKey, List[int], float, int]]:
+        with self._lock:
+            return [
+                (key, list(counts), total[0], int(total[1]))
+                for key, (counts, total) in self._values.items()
+            ]
+
+    def quantile(self, counts: List[int], q: float) -> float:
+        # Оценка квантиля по верхней границе корзины
+        total = sum(counts)
+        if not total:
+            return 0.0
+        rank = q * total
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            if running >= rank:
+                return bound
+        return float("inf")
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, counts, total, count in self.samples():
+            running = 0
+            for bound, c in zip(self.buckets, counts):
+                running += c
+                labels = _format_labels(key, ("le", repr(bound)))
+                lines.append(f"{self.name}_bucket{labels} {running}")
+            labels = _format_labels(key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, Counter(name, help_text))
+        return metric  # type: ignore[return-value]
+
+    def histogram(
+            self,
+            name: str,
+            help_text: str = "",
+            buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(
+                    name, Histogram(name, help_text, buckets)
+                )
+        return metric  # type: ignore[return-value]
+
+    def all(self) -> List[object]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+
+    def merge(self, other: "MetricsRegistry") -> None:
+        # Метрики other поверх своих: сэмпл с теми же метками заменяется, а не
+        # складывается - в интерактивной оболочке run-scheduler пишет файл
+        # из того же реестра. Семейство остаётся одно, без дублей # TYPE
+        for metric in other.all():
+            name, help_text = metric.name, metric.help  # type: ignore[attr-defined]
+            with self._lock:
+                mine = self._metrics.get(name)
+                if isinstance(metric, Histogram):
+                    if not (
+                        isinstance(mine, Histogram) and mine.buckets == metric.buckets
+                    ):
+                        mine = Histogram(name, help_text, metric.buckets)
+                elif not isinstance(mine, Counter):
+                    mine = Counter(name, help_text)
+                self._metrics[name] = mine
+            mine.help = help_text or mine.help
+            if isinstance(metric, Histogram):
+                for key, counts, total, count in metric.samples():
+                    with mine._lock:
+                        mine._values[key] = (counts, [total, count])
+            elif isinstance(metric, Counter):
+                for key, value in metric.samples():
+                    with mine._lock:
+                        mine._values[key] = value
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for metric in self.all():
+            lines.extend(metric.render())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Path) -> None:
+        # Атомарная запись для textfile collector node_exporter
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(self.render_prometheus(), encoding="utf-8")
+        tmp.replace(path)
+
+    def format_summary(self) -> str:
+        lines: List[str] = []
+        for metric in self.all():
+            if isinstance(metric, Counter):
+                for key, value in sorted(metric.samples()):
+                    lines.append(f"{metric.name}{_format_labels(key)} = {value:g}")
+            elif isinstance(metric, Histogram):
+                for key, counts, total, count in sorted(metric.samples()):
+                    avg_ms = total / count * 1000 if count else 0.0
+                    p95_ms = metric.quantile(counts, 0.95) * 1000
+                    lines.append(
+                        f"{metric.name}{_format_labels(key)} "
+                        f"count={count} avg={avg_ms:.2f}ms p95<={p95_ms:g}ms"
+                    )
+        return "\n".join(lines)
+
+
+def read_textfile(path: Path) -> MetricsRegistry:
+    # Обратное к write_textfile: реестр из файла Prometheus (его пишет
+    # run-scheduler), чтобы stats показывал метрики другого процесса
+    registry = MetricsRegistry()
+    types: Dict[str, str] = {}
+    helps: Dict[str, str] = {}
+    # гистограмма -> ключ меток -> {граница: накопленный счётчик}, сумма
+    bounds: Dict[str, Dict[LabelKey, Dict[float, int]]] = {}
+    sums: Dict[str, Dict[LabelKey, float]] = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.startswith("# HELP "):
+            _, _, name, *text = line.split(maxsplit=3)
+            helps[name] = text[0] if text else ""
+            continue
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(maxsplit=3)
+            types[name] = kind
+            continue
+        match = _SAMPLE_RE.match(line)
+        if line.startswith("#") or not match:
+            continue
+        name, raw_labels, value = match.groups()
+        labels = {k: _unescape(v) for k, v in _LABEL_RE.findall(raw_labels or "")}
+        if types.get(name) == "counter":
+            registry.counter(name, helps.get(name, "")).inc(float(value), **labels)
+            continue
+        base, _, suffix = name.rpartition("_")
+        if types.get(base) != "histogram":
+            continue
+        if suffix == "bucket":
+            le = labels.pop("le")
+            bound = float("inf") if le == "+Inf" else float(le)
+            per_key = bounds.setdefault(base, {}).setdefault(_label_key(labels), {})
+            per_key[bound] = int(float(value))
+        elif suffix == "sum":
+            sums.setdefault(base, {})[_label_key(labels)] = float(value)
+
+    for name, per_key in bounds.items():
+        finite = sorted({b for cum in per_key.values() for b in cum} - {float("inf")})
+        histogram = registry.histogram(name, helps.get(name, ""), tuple(finite))
+        for key, cumulative in per_key.items():
+            counts: List[int] = []
+            previous = 0
+            for bound in finite + [float("inf")]:
+                running = cumulative.get(bound, previous)
+                counts.append(running - previous)
+                previous = running
+            total = sums.get(name, {}).get(key, 0.0)
+            histogram._values[key] = (counts, [total, previous])
+    return registry
+
+
+_REGISTRY = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    return _REGISTRY
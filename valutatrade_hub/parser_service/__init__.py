@@ -1,6 +1,10 @@
 __all__ = [
     "config",
     "api_clients",
+    "hedging",
+    "streaming",
+    "leader",
+    "simulator",
     "storage",
     "updater",
     "scheduler",
@@ -1,28 +1,69 @@
 from __future__ import annotations
 
+import functools
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Callable, Dict, Any
 
 import requests
 
 from valutatrade_hub.core.exceptions import ApiRequestError
+from valutatrade_hub.core.rates import Pair
+from valutatrade_hub.metrics import get_metrics
+from valutatrade_hub.parser_service.circuit import with_circuit_breaker
 from valutatrade_hub.parser_service.config import ParserConfig
 
 logger = logging.getLogger(__name__)
 
 
+def observed_fetch(
+        fetch: Callable[["BaseApiClient"], Dict[Pair, float]],
+) -> Callable[["BaseApiClient"], Dict[Pair, float]]:
+    # Метрики для fetch_rates: время запроса, исход и число полученных курсов
+    @functools.wraps(fetch)
+    def wrapper(self: "BaseApiClient") -> Dict[Pair, float]:
+        metrics = get_metrics()
+        client = self.__class__.__name__
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = fetch(self)
+            outcome = "ok"
+            metrics.counter(
+                "valutatrade_api_rates_total", "Rates received from providers"
+            ).inc(len(result), client=client)
+            return result
+        finally:
+            metrics.histogram(
+                "valutatrade_api_request_seconds", "Provider fetch duration"
+            ).observe(time.perf_counter() - started, client=client)
+            metrics.counter(
+                "valutatrade_api_requests_total", "Provider fetches by outcome"
+            ).inc(client=client, outcome=outcome)
+
+    return wrapper
+
+
 class BaseApiClient(ABC):
     def __init__(self, config: ParserConfig) -> None:
         self.config = config
 
+    @property
+    def source(self) -> str:
+        # Имя источника для истории и снапшота
+        return self.__class__.__name__
+
+    # Реализации оборачивают fetch_rates в @with_circuit_breaker и @observed_fetch
     @abstractmethod
-    def fetch_rates(self) -> Dict[str, float]:
+    def fetch_rates(self) -> Dict[Pair, float]:
         raise NotImplementedError
 
 
 class CoinGeckoClient(BaseApiClient):
-    def fetch_rates(self) -> Dict[str, float]:
+    @with_circuit_breaker
+    @observed_fetch
+    def fetch_rates(self) -> Dict[Pair, float]:
         # Формируем строку ID для запроса: "bitcoin,ethereum,solana"
         ids = ",".join(
             self.config.CRYPTO_ID_MAP[code]
@@ -44,7 +85,7 @@ class CoinGeckoClient(BaseApiClient):
             raise ApiRequestError(f"CoinGecko error: {exc}")
 
         data = resp.json()
-        result: Dict[str, float] = {}
+        result: Dict[Pair, float] = {}
 
         for code in self.config.CRYPTO_CURRENCIES:
             coin_id = self.config.CRYPTO_ID_MAP.get(code)
@@ -55,15 +96,52 @@ class CoinGeckoClient(BaseApiClient):
             value = price_info.get(self.config.BASE_CURRENCY.lower())
 
             if value is not None:
-                pair = f"{code}_{self.config.BASE_CURRENCY}"
+                pair = Pair(code, self.config.BASE_CURRENCY)
                 result[pair] = float(value)
 
         logger.info(f"CoinGecko fetched {len(result)} rates")
         return result
 
 
+class CryptoCompareClient(BaseApiClient):
+    # Резервный источник криптокурсов (тот же набор пар, что у CoinGecko)
+    @with_circuit_breaker
+    @observed_fetch
+    def fetch_rates(self) -> Dict[Pair, float]:
+        params = {
+            "fsyms": ",".join(self.config.CRYPTO_CURRENCIES),
+            "tsyms": self.config.BASE_CURRENCY,
+        }
+
+        try:
+            resp = requests.get(
+                self.config.CRYPTOCOMPARE_URL,
+                params=params,
+                timeout=self.config.REQUEST_TIMEOUT,
+            )
+            resp.raise_for_status()
+        except requests.RequestException as exc:
+            raise ApiRequestError(f"CryptoCompare error: {exc}")
+
+        data = resp.json()
+        if data.get("Response") == "Error":
+            raise ApiRequestError(f"CryptoCompare error: {data.get('Message')}")
+
+        result: Dict[Pair, float] = {}
+        for code in self.config.CRYPTO_CURRENCIES:
+            value = data.get(code, {}).get(self.config.BASE_CURRENCY)
+            if value is not None:
+                pair = Pair(code, self.config.BASE_CURRENCY)
+                result[pair] = float(value)
+
+        logger.info(f"CryptoCompare fetched {len(result)} rates")
+        return result
+
+
 class ExchangeRateApiClient(BaseApiClient):
-    def fetch_rates(self) -> Dict[str, float]:
+    @with_circuit_breaker
+    @observed_fetch
+    def fetch_rates(self) -> Dict[Pair, float]:
         if not self.config.EXCHANGERATE_API_KEY:
             # Если ключ не задан, то выводим ошибку
             raise ApiRequestError("EXCHANGERATE_API_KEY не задан.")
@@ -86,7 +164,7 @@ class ExchangeRateApiClient(BaseApiClient):
             raise ApiRequestError(f"ExchangeRate-API error: {data.get('error-type')}")
 
         rates = data.get("rates", {})
-        result: Dict[str, float] = {}
+        result: Dict[Pair, float] = {}
 
         for code in self.config.FIAT_CURRENCIES:
             if code == self.config.BASE_CURRENCY:
@@ -96,7 +174,7 @@ class ExchangeRateApiClient(BaseApiClient):
             rate_to_base = rates.get(code)
 
             if rate_to_base:
-                pair = f"{code}_{self.config.BASE_CURRENCY}"
+                pair = Pair(code, self.config.BASE_CURRENCY)
                 try:
                     val = 1.0 / float(rate_to_base)
                     result[pair] = val
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from ..core.exceptions import CircuitOpenError
+from ..core.rates import Pair
+from ..core.utils import load_json, save_json
+from ..infra.settings import get_settings
+from ..metrics import get_metrics
+
+if TYPE_CHECKING:
+    from .api_clients import BaseApiClient
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreakers:
+    # Состояние автоматов всех источников в одном JSON-файле.
+    # Файл перечитывается, только если его изменил другой процесс
+    # (CLI и run-scheduler видят одно и то же состояние)
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.RLock()
+        self._states: Dict[str, dict] = {}
+        self._sig: Optional[tuple] = None
+
+    def _file_sig(self) -> Optional[tuple]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _reload_if_changed(self) -> None:
+        sig = self._file_sig()
+        if sig != self._sig:
+            self._states = load_json(self.path, {})
+            self._sig = sig
+
+    def _save(self) -> None:
+        save_json(self.path, self._states)
+        self._sig = self._file_sig()
+
+    def _entry(self, name: str) -> dict:
+        return self._states.setdefault(
+            name, {"state": CLOSED, "failures": 0, "opened_at": None}
+        )
+
+    def states(self) -> Dict[str, dict]:
+        with self._lock:
+            self._reload_if_changed()
+            return {name: dict(entry) for name, entry in self._states.items()}
+
+    def before_call(self, name: str, cooldown: float, probe_timeout: float) -> None:
+        # Бросает CircuitOpenError, если вызов нужно пропустить
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entry(name)
+            now = time.time()
+            if entry["state"] == CLOSED:
+                return
+            if entry["state"] == HALF_OPEN:
+                # Пробный вызов уже идёт; зависший зонд не блокирует навсегда
+                if now - entry.get("probe_started_at", 0) < probe_timeout:
+                    raise CircuitOpenError(name, probe_timeout)
+            else:
+                retry_in = entry["opened_at"] + cooldown - now
+                if retry_in > 0:
+                    raise CircuitOpenError(name, retry_in)
+            entry["state"] = HALF_OPEN
+            entry["probe_started_at"] = now
+            self._save()
+            logger.info("Circuit %s half-open, probing", name)
+
+    def record_success(self, name: str) -> None:
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entry(name)
+            if entry["state"] == CLOSED and not entry["failures"]:
+                return
+            if entry["state"] != CLOSED:
+                logger.info("Circuit %s closed", name)
+            self._states[name] = {"state": CLOSED, "failures": 0, "opened_at": None}
+            self._save()
+
+    def record_failure(self, name: str, threshold: int) -> None:
+        with self._lock:
+            self._reload_if_changed()
+            entry = self._entry(name)
+            entry["failures"] += 1
+            if entry["state"] == HALF_OPEN or entry["failures"] >= threshold:
+                if entry["state"] != OPEN:
+                    logger.warning(
+                        "Circuit %s opened after %d failures", name, entry["failures"]
+                    )
+                entry["state"] = OPEN
+                entry["opened_at"] = time.time()
+                entry.pop("probe_started_at", None)
+            self._save()
+
+
+_BREAKERS: Optional[CircuitBreakers] = None
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakers:
+    global _BREAKERS
+    if _BREAKERS is None:
+        with _BREAKERS_LOCK:
+            if _BREAKERS is None:
+                path = Path(get_settings().get("CIRCUIT_STATE_FILE"))
+                _BREAKERS = CircuitBreakers(path)
+    return _BREAKERS
+
+
+def with_circuit_breaker(
+        fetch: Callable[["BaseApiClient"], Dict[Pair, float]],
+) -> Callable[["BaseApiClient"], Dict[Pair, float]]:
+    # Открытый автомат отвечает CircuitOpenError сразу, без сетевого запроса
+    @functools.wraps(fetch)
+    def wrapper(self: "BaseApiClient") -> Dict[Pair, float]:
+        breakers = get_circuit_breakers()
+        name = self.source
+        config = self.config
+        try:
+            breakers.before_call(
+                name,
+                cooldown=config.CIRCUIT_COOLDOWN_SECONDS,
+                probe_timeout=2 * config.REQUEST_TIMEOUT,
+            )
+        except CircuitOpenError:
+            get_metrics().counter(
+                "valutatrade_circuit_skipped_total",
+                "Provider calls skipped by an open circuit breaker",
+            ).inc(client=name)
+            raise
+
+        try:
+            result = fetch(self)
+        except Exception:
+            breakers.record_failure(name, config.CIRCUIT_FAILURE_THRESHOLD)
+            raise
+        breakers.record_success(name)
+        return result
+
+    return wrapper
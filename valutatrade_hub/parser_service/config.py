@@ -8,6 +8,7 @@ class ParserConfig:
 
     COINGECKO_URL: str = "https://api.coingecko.com/api/v3/simple/price"
     EXCHANGERATE_API_URL: str = "https://v6.exchangerate-api.com/v6"
+    CRYPTOCOMPARE_URL: str = "https://min-api.cryptocompare.com/data/pricemulti"
 
     BASE_CURRENCY: str = "USD"
     FIAT_CURRENCIES: tuple[str, ...] = ("EUR", "GBP", "RUB")
@@ -19,6 +20,28 @@ class ParserConfig:
 
     REQUEST_TIMEOUT: int = 10
 
+    # Хеджирование: запасной запрос уходит, когда основной дольше p95
+    # своих последних ответов (до накопления статистики - HEDGE_DEFAULT_DELAY)
+    HEDGE_DEFAULT_DELAY: float = 1.0
+    HEDGE_MIN_DELAY: float = 0.05
+    HEDGE_HISTORY_SIZE: int = 50
+
+    # Circuit breaker: после CIRCUIT_FAILURE_THRESHOLD ошибок подряд источник
+    # пропускается CIRCUIT_COOLDOWN_SECONDS, затем один пробный запрос
+    CIRCUIT_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_COOLDOWN_SECONDS: float = 60.0
+
+    # Потоковый фид (NDJSON по TCP): тики копятся в микробатч до
+    # STREAM_BATCH_MAX_TICKS штук или STREAM_BATCH_MAX_DELAY секунд.
+    # Без сообщений (включая heartbeat) дольше STREAM_IDLE_TIMEOUT -
+    # переподключение с паузой до STREAM_RECONNECT_MAX_DELAY
+    STREAM_HOST: str = "127.0.0.1"
+    STREAM_PORT: int = 9100
+    STREAM_BATCH_MAX_TICKS: int = 500
+    STREAM_BATCH_MAX_DELAY: float = 0.2
+    STREAM_IDLE_TIMEOUT: float = 15.0
+    STREAM_RECONNECT_MAX_DELAY: float = 30.0
+
     def __post_init__(self) -> None:
         if self.CRYPTO_ID_MAP is None:
             self.CRYPTO_ID_MAP = {
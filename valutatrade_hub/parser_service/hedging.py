@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional
+
+from ..core.exceptions import ApiRequestError, CircuitOpenError
+from ..core.rates import Pair
+from ..metrics import get_metrics
+from .api_clients import BaseApiClient, CoinGeckoClient, CryptoCompareClient
+from .config import ParserConfig
+
+logger = logging.getLogger(__name__)
+
+
+def _is_valid(pairs: Dict[Pair, float]) -> bool:
+    return bool(pairs) and all(
+        isinstance(rate, float) and math.isfinite(rate) and rate > 0
+        for rate in pairs.values()
+    )
+
+
+class HedgedClient(BaseApiClient):
+    # Несколько взаимозаменяемых источников одного класса активов.
+    # Первым опрашивается источник с наименьшим p95 задержки; если он не
+    # ответил за своё p95, параллельно уходит запрос к следующему.
+    # Берётся первый корректный ответ, остальные запросы отменяются
+    def __init__(self, clients: List[BaseApiClient], name: str = "hedged") -> None:
+        if not clients:
+            raise ValueError("HedgedClient требует хотя бы один источник")
+        super().__init__(clients[0].config)
+        self.clients = list(clients)
+        self.name = name
+        self.last_winner: Optional[str] = None
+        self._latencies: Dict[str, Deque[float]] = {
+            client.source: deque(maxlen=self.config.HEDGE_HISTORY_SIZE)
+            for client in self.clients
+        }
+        self._lock = threading.Lock()
+
+    @property
+    def source(self) -> str:
+        return self.last_winner or self.name
+
+    def _record_latency(self, client: BaseApiClient, seconds: float) -> None:
+        with self._lock:
+            self._latencies[client.source].append(seconds)
+
+    def p95(self, client: BaseApiClient) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies[client.source])
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def _hedge_delay(self, client: BaseApiClient) -> float:
+        p95 = self.p95(client)
+        if p95 is None:
+            return self.config.HEDGE_DEFAULT_DELAY
+        return min(
+            max(p95, self.config.HEDGE_MIN_DELAY),
+            float(self.config.REQUEST_TIMEOUT),
+        )
+
+    def _ordered(self) -> List[BaseApiClient]:
+        # Источники без статистики сохраняют порядок из конфигурации
+        def key(client: BaseApiClient) -> float:
+            p95 = self.p95(client)
+            return p95 if p95 is not None else math.inf
+
+        return sorted(self.clients, key=key)
+
+    def _timed_fetch(self, client: BaseApiClient) -> Dict[Pair, float]:
+        started = time.perf_counter()
+        try:
+            pairs = client.fetch_rates()
+        except Exception:
+            # Ошибка считается как ответ за полный таймаут: источник
+            # уходит в конец очереди, пока снова не начнёт отвечать
+            self._record_latency(client, float(self.config.REQUEST_TIMEOUT))
+            raise
+        self._record_latency(client, time.perf_counter() - started)
+        if not _is_valid(pairs):
+            raise ApiRequestError(f"{client.source}: некорректный ответ")
+        return pairs
+
+    def fetch_rates(self) -> Dict[Pair, float]:
+        metrics = get_metrics()
+        ordered = self._ordered()
+        pool = ThreadPoolExecutor(
+            max_workers=len(ordered),
+            thread_name_prefix=f"hedge-{self.name}",
+        )
+        pending: Dict[Future, BaseApiClient] = {}
+        errors: List[str] = []
+        open_circuits: List[CircuitOpenError] = []
+        launched = 0
+
+        def launch() -> BaseApiClient:
+            nonlocal launched
+            client = ordered[launched]
+            launched += 1
+            pending[pool.submit(self._timed_fetch, client)] = client
+            return client
+
+        try:
+            current = launch()
+            while pending:
+                delay = self._hedge_delay(current) if launched < len(ordered) else None
+                done, _ = wait(list(pending), timeout=delay, return_when=FIRST_COMPLETED)
+                if not done:
+                    logger.info(
+                        "%s: %s slower than %.3fs, hedging with %s",
+                        self.name, current.source, delay, ordered[launched].source,
+                    )
+                    metrics.counter(
+                        "valutatrade_hedge_requests_total",
+                        "Hedged (second) provider requests issued",
+                    ).inc(group=self.name)
+                    current = launch()
+                    continue
+
+                for future in done:
+                    client = pending.pop(future)
+                    try:
+                        pairs = future.result()
+                    except CircuitOpenError as exc:
+                        open_circuits.append(exc)
+                        continue
+                    except Exception as exc:
+                        errors.append(f"{client.source}: {exc}")
+                        continue
+                    self.last_winner = client.source
+                    metrics.counter(
+                        "valutatrade_hedge_wins_total",
+                        "Provider whose response was used",
+                    ).inc(group=self.name, client=client.source)
+                    logger.info("%s: using %s", self.name, client.source)
+                    return pairs
+
+                # Все завершившиеся запросы упали: ждать p95 незачем
+                if launched < len(ordered):
+                    current = launch()
+        finally:
+            # Запросы, уже ушедшие в сеть, прервать нельзя: их ответ
+            # отбрасывается, но задержка всё равно попадает в статистику
+            for future in pending:
+                future.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        self.last_winner = None
+        if not errors:
+            # Все источники отключены автоматами: группу тоже пропускаем
+            raise CircuitOpenError(
+                self.name, min(exc.retry_in for exc in open_circuits)
+            )
+        errors.extend(exc.reason for exc in open_circuits)
+        raise ApiRequestError(
+            f"{self.name}: все источники недоступны ({'; '.join(errors)})"
+        )
+
+
+def crypto_client(config: ParserConfig) -> HedgedClient:
+    # Криптокурсы из CoinGecko и CryptoCompare с хеджированием
+    return HedgedClient(
+        [CoinGeckoClient(config), CryptoCompareClient(config)],
+        name="crypto",
+    )
@@ -0,0 +1,706 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import logging
+import lzma
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import IO, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from ..core.durability import commit_file, replace_durably
+from ..core.locks import FileLock
+from ..core.utils import load_json, save_json
+from ..infra.database import get_db
+from ..infra.settings import get_settings
+from .storage import HISTORY_LOCK_WAIT_SECONDS, history_lock
+
+logger = logging.getLogger(__name__)
+
+# Уровни хранения истории: сырые тики в exchange_rates.json,
+# затем минутные бары по дням и часовые бары по месяцам в сжатых сегментах
+MINUTE = "1m"
+HOUR = "1h"
+
+_OPENERS = {".gz": gzip.open, ".xz": lzma.open}
+_SUFFIX = {"gzip": ".gz", "lzma": ".xz"}
+# Сжатие поверх открытого временного файла (перезапись сегмента)
+_COMPRESSORS = {
+    ".gz": lambda raw: gzip.GzipFile(fileobj=raw, mode="wb"),
+    ".xz": lambda raw: lzma.LZMAFile(raw, "wb"),
+}
+
+# backfill: месяцев индекса покрытия в памяти и примеров отклонённых строк
+_BACKFILL_MONTHS_CACHED = 2
+_BACKFILL_REJECT_SAMPLES = 10
+
+# Сегменты пишут compact-history и backfill-history: одновременно - только
+# один процесс. Блокировка продлевается после каждого записанного сегмента
+_SEGMENTS_LOCK_STALE_SECONDS = 600.0
+_SEGMENTS_LOCK_WAIT_SECONDS = 5.0
+
+_Point = Tuple[str, datetime, float, str]
+
+
+def parse_ts(value: str) -> datetime:
+    # "2026-02-01T15:42:36.688771Z" -> aware datetime (Python 3.10 не знает "Z")
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def format_ts(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+def _floor(dt: datetime, interval: str) -> datetime:
+    if interval == HOUR:
+        return dt.replace(minute=0, second=0, microsecond=0)
+    return dt.replace(second=0, microsecond=0)
+
+
+def _open_segment(path: Path, mode: str) -> IO[str]:
+    opener = _OPENERS[path.suffix]
+    return opener(path, mode + "t", encoding="utf-8")  # type: ignore[operator]
+
+
+def _segment_name(interval: str, period: str, compression: str) -> str:
+    return f"bars-{interval}-{period}.jsonl{_SUFFIX[compression]}"
+
+
+def _parse_segment_name(path: Path) -> Optional[Tuple[str, str]]:
+    # "bars-1m-2026-02-01.jsonl.gz" -> ("1m", "2026-02-01")
+    name = path.name
+    if not name.startswith("bars-") or ".jsonl" not in name:
+        return None
+    interval, _, period = name[len("bars-"):name.index(".jsonl")].partition("-")
+    return interval, period
+
+
+class OhlcBar:
+    __slots__ = ("pair", "start", "open", "high", "low", "close", "count", "source")
+
+    def __init__(self, pair: str, start: datetime, open_: float, high: float,
+                 low: float, close: float, count: int, source: str) -> None:
+        self.pair = pair
+        self.start = start
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.count = count
+        self.source = source
+
+    def add(self, high: float, low: float, close: float, count: int) -> None:
+        # Точки поступают в хронологическом порядке
+        self.high = max(self.high, high)
+        self.low = min(self.low, low)
+        self.close = close
+        self.count += count
+
+    def to_dict(self, interval: str) -> dict:
+        base, _, quote = self.pair.partition("_")
+        return {
+            "pair": self.pair,
+            "from_currency": base,
+            "to_currency": quote,
+            "interval": interval,
+            "start": format_ts(self.start),
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "count": self.count,
+            "source": self.source,
+        }
+
+
+def _aggregate(
+        points: Iterable[Tuple[str, datetime, float, float, float, float, int, str]],
+        interval: str,
+) -> List[OhlcBar]:
+    # points: (pair, ts, open, high, low, close, count, source), по времени
+    bars: Dict[Tuple[str, datetime], OhlcBar] = {}
+    for pair, ts, open_, high, low, close, count, source in points:
+        key = (pair, _floor(ts, interval))
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = OhlcBar(
+                pair, key[1], open_, high, low, close, count, source
+            )
+        else:
+            bar.add(high, low, close, count)
+    return sorted(bars.values(), key=lambda b: (b.start, b.pair))
+
+
+def read_rate_dump(path: Path) -> Iterator[Optional[dict]]:
+    # Потоковое чтение выгрузки курсов для backfill: CSV с заголовком или
+    # JSONL, можно сжатые (.gz/.xz). Поля: pair ("BTC_USD") или
+    # from_currency/to_currency, timestamp, rate и необязательный source.
+    # Нечитаемая строка JSONL - None, backfill засчитает её как отклонённую
+    opener = _OPENERS.get(path.suffix)
+    name = path.stem if opener else path.name
+    if opener:
+        f = opener(path, "rt", encoding="utf-8", newline="")  # type: ignore[operator]
+    else:
+        f = path.open("r", encoding="utf-8", newline="")
+    with f:
+        if name.endswith(".csv"):
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            yield row if isinstance(row, dict) else None
+
+
+def _registry_checker() -> Callable[[str], bool]:
+    # Проверка кода по реестру валют с кешем ответов на время загрузки
+    from ..core.currencies import get_registry
+    from ..core.exceptions import CurrencyNotFoundError
+
+    registry = get_registry()
+    known: Dict[str, bool] = {}
+
+    def is_known(code: str) -> bool:
+        found = known.get(code)
+        if found is None:
+            try:
+                registry.get(code)
+                found = True
+            except CurrencyNotFoundError:
+                found = False
+            if len(known) < 10_000:
+                known[code] = found
+        return found
+
+    return is_known
+
+
+def _parse_dump_row(row: Optional[dict], is_known: Callable[[str], bool]) -> _Point:
+    # Строка выгрузки -> (pair, ts в UTC, rate, source); ValueError с причиной
+    if row is None:
+        raise ValueError("некорректная строка")
+    text = row.get("pair")
+    if text:
+        base, _, quote = str(text).partition("_")
+    else:
+        base, quote = row.get("from_currency"), row.get("to_currency")
+    base = str(base or "").strip().upper()
+    quote = str(quote or "").strip().upper()
+    if not base or not quote or base == quote:
+        raise ValueError("некорректная пара")
+    for code in (base, quote):
+        if not is_known(code):
+            raise ValueError(f"неизвестная валюта {code}")
+    try:
+        ts = parse_ts(str(row.get("timestamp") or "")).astimezone(timezone.utc)
+    except ValueError:
+        raise ValueError("некорректный timestamp") from None
+    try:
+        rate = float(row.get("rate"))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        raise ValueError("некорректный курс") from None
+    if not math.isfinite(rate) or rate <= 0:
+        raise ValueError("курс должен быть положительным")
+    return f"{base}_{quote}", ts, rate, str(row.get("source") or "backfill")
+
+
+class _Coverage:
+    # Что уже есть в истории за месяц: номера минут и часов epoch по паре
+    # (множества int - месяц минутных баров занимает единицы МБ на пару)
+    # и начало последнего бара каждого сегмента: дописывать в конец можно,
+    # только если новые бары не раньше
+    __slots__ = ("minutes", "hours", "hour_bars", "ends")
+
+    def __init__(self) -> None:
+        self.minutes: Dict[str, Set[int]] = {}
+        self.hours: Dict[str, Set[int]] = {}
+        self.hour_bars: Dict[str, Set[int]] = {}
+        self.ends: Dict[str, int] = {}
+
+    def add(self, segment: str, interval: str, pair: str, start: int) -> None:
+        self.hours.setdefault(pair, set()).add(start // 3600)
+        if interval == HOUR:
+            self.hour_bars.setdefault(pair, set()).add(start // 3600)
+        else:
+            self.minutes.setdefault(pair, set()).add(start // 60)
+        if start > self.ends.get(segment, start - 1):
+            self.ends[segment] = start
+
+    def covers(self, pair: str, epoch: int, interval: str) -> bool:
+        if interval == HOUR:
+            return epoch // 3600 in self.hours.get(pair, ())
+        return (
+            epoch // 60 in self.minutes.get(pair, ())
+            or epoch // 3600 in self.hour_bars.get(pair, ())
+        )
+
+
+class HistoryStore:
+    def __init__(
+            self,
+            raw_file: Path,
+            segments_dir: Path,
+            raw_retention_days: int = 7,
+            minute_retention_days: int = 90,
+            compression: str = "gzip",
+            backfill_batch_rows: int = 50_000,
+    ) -> None:
+        if compression not in _SUFFIX:
+            raise ValueError(f"Неизвестное сжатие: {compression}")
+        self.raw_file = raw_file
+        self.segments_dir = segments_dir
+        self.raw_retention_days = raw_retention_days
+        self.minute_retention_days = minute_retention_days
+        self.compression = compression
+        self.backfill_batch_rows = backfill_batch_rows
+        self.manifest_file = segments_dir / "manifest.json"
+        self._segments_lock = FileLock(
+            segments_dir.with_name(segments_dir.name + ".lock"),
+            _SEGMENTS_LOCK_STALE_SECONDS,
+        )
+
+    # --- чтение ---
+
+    def segments(self, interval: str) -> List[Path]:
+        if not self.segments_dir.exists():
+            return []
+        found = []
+        for path in self.segments_dir.iterdir():
+            parsed = _parse_segment_name(path)
+            if parsed and parsed[0] == interval and path.suffix in _OPENERS:
+                found.append((parsed[1], path))
+        # Имена периодов сортируются как даты
+        return [path for _, path in sorted(found)]
+
+    def signature(self) -> tuple:
+        # Меняется при любой записи в историю: для кешей поверх неё
+        paths = [self.raw_file]
+        if self.segments_dir.exists():
+            paths.extend(sorted(self.segments_dir.iterdir()))
+        sig = []
+        for path in paths:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            sig.append((path.name, stat.st_mtime_ns, stat.st_size))
+        return tuple(sig)
+
+    def _iter_segment(self, path: Path) -> Iterator[dict]:
+        with _open_segment(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_history(
+            self,
+            pair: Optional[str] = None,
+            since: Optional[datetime] = None,
+    ) -> Iterator[dict]:
+        # Потоковое чтение всех уровней в хронологическом порядке.
+        # Каждая строка: pair, interval (tick/1m/1h), start, open/high/low/close,
+        # count. Сегменты, целиком лежащие до since, не открываются
+        for interval, period_end in ((HOUR, _month_end), (MINUTE, _day_end)):
+            for path in self.segments(interval):
+                period = _parse_segment_name(path)[1]  # type: ignore[index]
+                if since is not None and period_end(period) <= since:
+                    continue
+                for bar in self._iter_segment(path):
+                    if pair and bar["pair"] != pair:
+                        continue
+                    if since is not None and parse_ts(bar["start"]) < since:
+                        continue
+                    yield bar
+
+        for record in self._load_raw():
+            rec_pair = f"{record['from_currency']}_{record['to_currency']}"
+            if pair and rec_pair != pair:
+                continue
+            if since is not None and parse_ts(record["timestamp"]) < since:
+                continue
+            rate = float(record["rate"])
+            yield {
+                "pair": rec_pair,
+                "from_currency": record["from_currency"],
+                "to_currency": record["to_currency"],
+                "interval": "tick",
+                "start": record["timestamp"],
+                "open": rate,
+                "high": rate,
+                "low": rate,
+                "close": rate,
+                "count": 1,
+                "source": record.get("source", ""),
+            }
+
+    # --- уплотнение ---
+
+    def _load_raw(self) -> List[dict]:
+        return load_json(self.raw_file, [])
+
+    def _load_manifest(self) -> dict:
+        return load_json(self.manifest_file, {})
+
+    def _append_bars(self, interval: str, period: str, bars: List[OhlcBar]) -> int:
+        # Дописывает новый член gzip/xz-потока: такие файлы читаются целиком
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        path = self.segments_dir / _segment_name(interval, period, self.compression)
+        with _open_segment(path, "a") as f:
+            for bar in bars:
+                f.write(json.dumps(bar.to_dict(interval), ensure_ascii=False) + "\n")
+        commit_file(path)
+        self._segments_lock.refresh()
+        return len(bars)
+
+    def _begin_append(self, manifest: dict, segments: Iterable[Tuple[str, str]]) -> None:
+        # Журнал перед дозаписью: размеры сегментов до неё. Сбой между
+        # _append_bars и сохранением манифеста откатывает _rollback_append,
+        # иначе повторный запуск дописал бы те же бары второй раз
+        sizes = {}
+        for interval, period in segments:
+            name = _segment_name(interval, period, self.compression)
+            path = self.segments_dir / name
+            sizes[name] = path.stat().st_size if path.exists() else 0
+        manifest["pending_append"] = sizes
+        self.segments_dir.mkdir(parents=True, exist_ok=True)
+        save_json(self.manifest_file, manifest)
+
+    def _rollback_append(self, manifest: dict) -> None:
+        # Член gzip/xz-потока дописывается в конец, поэтому обрезка до
+        # прежнего размера возвращает сегмент к состоянию до дозаписи
+        pending = manifest.pop("pending_append", None)
+        if pending is None:
+            return
+        for name, size in pending.items():
+            path = self.segments_dir / name
+            if not path.exists() or path.stat().st_size == size:
+                continue
+            logger.warning("Rolling back interrupted append to %s", name)
+            if size == 0:
+                path.unlink()
+                continue
+            with path.open("r+b") as f:
+                f.truncate(size)
+            commit_file(path)
+        save_json(self.manifest_file, manifest)
+
+    def _rewrite_segment(self, path: Path, interval: str, bars: List[OhlcBar]) -> None:
+        # Вставка баров в середину сегмента: слияние по времени и атомарная
+        # замена файла. Сегмент - день или месяц, целиком в памяти умещается
+        merged = list(self._iter_segment(path))
+        merged.extend(bar.to_dict(interval) for bar in bars)
+        merged.sort(key=lambda b: (parse_ts(b["start"]), b["pair"]))
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as raw:
+            with _COMPRESSORS[path.suffix](raw) as f:
+                for bar in merged:
+                    line = json.dumps(bar, ensure_ascii=False) + "\n"
+                    f.write(line.encode("utf-8"))
+            replace_durably(tmp_path, path, raw)
+        self._segments_lock.refresh()
+
+    def _coverage(self, month: str, cache: "OrderedDict[str, _Coverage]") -> _Coverage:
+        coverage = cache.get(month)
+        if coverage is not None:
+            cache.move_to_end(month)
+            return coverage
+        coverage = _Coverage()
+        for interval in (HOUR, MINUTE):
+            for path in self.segments(interval):
+                period = _parse_segment_name(path)[1]  # type: ignore[index]
+                if period[:7] != month:
+                    continue
+                for bar in self._iter_segment(path):
+                    start = int(parse_ts(bar["start"]).timestamp())
+                    coverage.add(path.name, interval, bar["pair"], start)
+        cache[month] = coverage
+        if len(cache) > _BACKFILL_MONTHS_CACHED:
+            cache.popitem(last=False)
+        return coverage
+
+    def backfill(
+            self,
+            rows: Iterable[Optional[dict]],
+            batch_size: Optional[int] = None,
+            now: Optional[datetime] = None,
+            is_known_code: Optional[Callable[[str], bool]] = None,
+    ) -> dict:
+        # TimeoutError, если сегменты пишет другой процесс
+        with self._segments_lock.hold(_SEGMENTS_LOCK_WAIT_SECONDS):
+            return self._backfill(rows, batch_size, now, is_known_code)
+
+    def _backfill(
+            self,
+            rows: Iterable[Optional[dict]],
+            batch_size: Optional[int],
+            now: Optional[datetime],
+            is_known_code: Optional[Callable[[str], bool]],
+    ) -> dict:
+        # Загрузка исторической выгрузки сразу в сегменты, как после compact:
+        # дни старше minute_retention_days - часовыми барами, новее - минутными.
+        # Строки идут потоком и пишутся отсортированными батчами по batch_size;
+        # в памяти только батч и индекс покрытия за пару месяцев.
+        # Дубликат - строка, чья минута (на часовом уровне - час) по паре уже
+        # есть в истории, повтор (pair, timestamp) в батче и строка не раньше
+        # первого сырого тика пары (это время покрывает живой сбор)
+        now = now or datetime.now(timezone.utc)
+        batch_size = batch_size or self.backfill_batch_rows
+        is_known = is_known_code or _registry_checker()
+        minute_cutoff = _floor(
+            now - timedelta(days=self.minute_retention_days), HOUR
+        ).replace(hour=0).timestamp()
+
+        live_from: Dict[str, float] = {}
+        for record in self._load_raw():
+            pair = f"{record['from_currency']}_{record['to_currency']}"
+            ts = parse_ts(record["timestamp"]).timestamp()
+            live_from[pair] = min(live_from.get(pair, ts), ts)
+
+        result = {
+            "rows": 0,
+            "imported": 0,
+            "duplicates": 0,
+            "rejected": 0,
+            "bars": 0,
+            "segments": 0,
+            "errors": [],
+        }
+        coverage: "OrderedDict[str, _Coverage]" = OrderedDict()
+        touched: Set[str] = set()
+        pending: Dict[Tuple[str, float], _Point] = {}
+        flush_at = batch_size
+
+        def flush(final: bool) -> None:
+            points = sorted(pending.values(), key=lambda p: p[1])
+            pending.clear()
+            if not points:
+                return
+            split = len(points)
+            if not final:
+                # Последняя минута (час) батча может продолжиться в следующем:
+                # её строки переносятся, чтобы бар не разделился на два.
+                # Батч целиком из одного бара копится дальше
+                last = points[-1][1]
+                interval = HOUR if last.timestamp() < minute_cutoff else MINUTE
+                start = _floor(last, interval)
+                while split and points[split - 1][1] >= start:
+                    split -= 1
+                for point in points[split:]:
+                    pending[(point[0], point[1].timestamp())] = point
+
+            by_segment: Dict[Tuple[str, str], list] = {}
+            for pair, ts, rate, source in points[:split]:
+                epoch = ts.timestamp()
+                interval = HOUR if epoch < minute_cutoff else MINUTE
+                month = f"{ts.year:04d}-{ts.month:02d}"
+                if self._coverage(month, coverage).covers(pair, int(epoch), interval):
+                    result["duplicates"] += 1
+                    continue
+                period = month if interval == HOUR else ts.date().isoformat()
+                by_segment.setdefault((interval, period), []).append(
+                    (pair, ts, rate, rate, rate, rate, 1, source)
+                )
+                result["imported"] += 1
+
+            for (interval, period), seg_points in sorted(by_segment.items()):
+                bars = _aggregate(seg_points, interval)
+                path = self.segments_dir / _segment_name(
+                    interval, period, self.compression
+                )
+                month_coverage = self._coverage(period[:7], coverage)
+                first = int(bars[0].start.timestamp())
+                if path.exists() and first < month_coverage.ends.get(path.name, first):
+                    self._rewrite_segment(path, interval, bars)
+                else:
+                    self._append_bars(interval, period, bars)
+                for bar in bars:
+                    month_coverage.add(
+                        path.name, interval, bar.pair, int(bar.start.timestamp())
+                    )
+                touched.add(path.name)
+                result["bars"] += len(bars)
+
+        for number, row in enumerate(rows, 1):
+            result["rows"] += 1
+            try:
+                point = _parse_dump_row(row, is_known)
+                if point[1] > now:
+                    raise ValueError("время в будущем")
+            except ValueError as exc:
+                result["rejected"] += 1
+                if len(result["errors"]) < _BACKFILL_REJECT_SAMPLES:
+                    result["errors"].append((number, str(exc)))
+                continue
+            pair, ts = point[0], point[1].timestamp()
+            if (pair, ts) in pending or ts >= live_from.get(pair, math.inf):
+                result["duplicates"] += 1
+                continue
+            pending[(pair, ts)] = point
+            if len(pending) >= flush_at:
+                flush(final=False)
+                flush_at = len(pending) + batch_size
+        flush(final=True)
+
+        result["segments"] = len(touched)
+        logger.info(
+            "History backfill: rows=%d imported=%d duplicates=%d rejected=%d "
+            "bars=%d segments=%d",
+            result["rows"], result["imported"], result["duplicates"],
+            result["rejected"], result["bars"], result["segments"],
+        )
+        return result
+
+    def compact(self, now: Optional[datetime] = None, dry_run: bool = False) -> dict:
+        # TimeoutError, если сегменты пишет другой процесс; dry-run только читает
+        if dry_run:
+            return self._compact(now, dry_run)
+        with self._segments_lock.hold(_SEGMENTS_LOCK_WAIT_SECONDS):
+            return self._compact(now, dry_run)
+
+    def _compact(self, now: Optional[datetime], dry_run: bool) -> dict:
+        now = now or datetime.now(timezone.utc)
+        manifest = self._load_manifest()
+        if not dry_run:
+            self._rollback_append(manifest)
+        result = {
+            "raw_archived": 0,
+            "minute_bars": 0,
+            "minute_segments_rolled": 0,
+            "hour_bars": 0,
+            "raw_remaining": 0,
+        }
+
+        # 1. Сырые тики старше raw_retention_days -> минутные бары.
+        # Граница выровнена по минуте, чтобы минута не делилась между запусками
+        raw_cutoff = _floor(now - timedelta(days=self.raw_retention_days), MINUTE)
+        already = manifest.get("raw_compacted_until")
+        already_dt = parse_ts(already) if already else None
+
+        raw = self._load_raw()
+        keep: List[dict] = []
+        archived: Set[Tuple[str, str, str]] = set()
+        old_points = []
+        for record in raw:
+            ts = parse_ts(record["timestamp"])
+            if ts >= raw_cutoff:
+                keep.append(record)
+                continue
+            archived.add(_raw_key(record))
+            if already_dt is not None and ts < already_dt:
+                # Уже в сегментах (прошлый запуск прервался до перезаписи файла)
+                continue
+            rate = float(record["rate"])
+            pair = f"{record['from_currency']}_{record['to_currency']}"
+            old_points.append(
+                (pair, ts, rate, rate, rate, rate, 1, record.get("source", ""))
+            )
+        old_points.sort(key=lambda p: p[1])
+        result["raw_archived"] = len(old_points)
+        result["raw_remaining"] = len(keep)
+
+        by_day: Dict[str, List[OhlcBar]] = {}
+        for bar in _aggregate(old_points, MINUTE):
+            by_day.setdefault(bar.start.date().isoformat(), []).append(bar)
+        result["minute_bars"] = sum(len(b) for b in by_day.values())
+
+        if not dry_run and archived:
+            self._begin_append(manifest, ((MINUTE, day) for day in by_day))
+            for day, bars in sorted(by_day.items()):
+                self._append_bars(MINUTE, day, bars)
+            manifest["raw_compacted_until"] = format_ts(raw_cutoff)
+            del manifest["pending_append"]
+            save_json(self.manifest_file, manifest)
+            # run-scheduler мог дописать тики после чтения: файл перечитывается
+            # под общей с append_history блокировкой, убираются только
+            # заархивированные записи
+            with history_lock(self.raw_file).hold(HISTORY_LOCK_WAIT_SECONDS):
+                keep = [r for r in self._load_raw() if _raw_key(r) not in archived]
+                save_json(self.raw_file, keep)
+            result["raw_remaining"] = len(keep)
+
+        # 2. Минутные сегменты за дни старше minute_retention_days -> часовые
+        minute_cutoff = (now - timedelta(days=self.minute_retention_days)).date()
+        rolled_until = manifest.get("minute_compacted_until")
+        paths = {
+            _parse_segment_name(path)[1]: path  # type: ignore[index]
+            for path in self.segments(MINUTE)
+        }
+        # dry-run ничего не записал на шаге 1: его минутные бары добавляются
+        # к сегментам здесь, чтобы отчёт совпал с настоящим запуском
+        pending = by_day if dry_run else {}
+        for day in sorted(set(paths) | set(pending)):
+            if day >= minute_cutoff.isoformat():
+                break
+            path = paths.get(day)
+            result["minute_segments_rolled"] += 1
+            if rolled_until is not None and day <= rolled_until:
+                # Часовые бары уже записаны, осталось удалить минутный сегмент
+                if not dry_run:
+                    path.unlink()  # type: ignore[union-attr]
+                continue
+            points = [
+                (b["pair"], parse_ts(b["start"]), b["open"], b["high"],
+                 b["low"], b["close"], b["count"], b.get("source", ""))
+                for b in (self._iter_segment(path) if path else ())
+            ]
+            points.extend(
+                (b.pair, b.start, b.open, b.high, b.low, b.close, b.count, b.source)
+                for b in pending.get(day, ())
+            )
+            hour_bars = _aggregate(sorted(points, key=lambda p: p[1]), HOUR)
+            result["hour_bars"] += len(hour_bars)
+            if dry_run:
+                continue
+            self._begin_append(manifest, [(HOUR, day[:7])])
+            self._append_bars(HOUR, day[:7], hour_bars)
+            manifest["minute_compacted_until"] = day
+            del manifest["pending_append"]
+            save_json(self.manifest_file, manifest)
+            path.unlink()  # type: ignore[union-attr]
+
+        logger.info(
+            "History compaction%s: raw_archived=%d minute_bars=%d "
+            "minute_segments_rolled=%d hour_bars=%d",
+            " (dry run)" if dry_run else "",
+            result["raw_archived"], result["minute_bars"],
+            result["minute_segments_rolled"], result["hour_bars"],
+        )
+        return result
+
+
+def _raw_key(record: dict) -> Tuple[str, str, str]:
+    return record["from_currency"], record["to_currency"], record["timestamp"]
+
+
+def _day_end(period: str) -> datetime:
+    start = datetime.fromisoformat(period).replace(tzinfo=timezone.utc)
+    return start + timedelta(days=1)
+
+
+def _month_end(period: str) -> datetime:
+    year, month = (int(part) for part in period.split("-"))
+    if month == 12:
+        return datetime(year + 1, 1, 1, tzinfo=timezone.utc)
+    return datetime(year, month + 1, 1, tzinfo=timezone.utc)
+
+
+def get_history_store() -> HistoryStore:
+    settings = get_settings()
+    return HistoryStore(
+        raw_file=Path(get_db().exchange_history_file),
+        segments_dir=Path(settings.get("HISTORY_SEGMENTS_DIR")),
+        raw_retention_days=int(settings.get("HISTORY_RAW_RETENTION_DAYS", 7)),
+        minute_retention_days=int(settings.get("HISTORY_MINUTE_RETENTION_DAYS", 90)),
+        compression=settings.get("HISTORY_COMPRESSION", "gzip"),
+        backfill_batch_rows=int(settings.get("HISTORY_BACKFILL_BATCH_ROWS", 50000)),
+    )
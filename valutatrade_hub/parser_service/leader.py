@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from ..core.locks import FileLock
+from ..core.utils import load_json, save_json
+from ..infra.settings import get_settings
+from ..metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Сколько держится блокировка чтения-изменения lease-файла; дольше -
+# процесс умер посреди операции, блокировку можно снять
+_MUTEX_STALE_SECONDS = 10.0
+_MUTEX_WAIT_SECONDS = 2.0
+
+
+class LeaseElection:
+    # Выбор лидера через lease-файл на общем томе: лидер продлевает аренду
+    # (heartbeat) каждые ttl/3, остальные ждут её истечения. term растёт
+    # при каждой смене лидера. Часы узлов должны расходиться меньше ttl
+    def __init__(self, path: Path, ttl: float, holder: Optional[str] = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.holder = holder or (
+            f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        )
+        self.term: Optional[int] = None
+        self.expires_at = 0.0
+        self.lease: Optional[dict] = None
+
+    @property
+    def _mutex_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".lock")
+
+    @contextmanager
+    def _mutex(self) -> Iterator[bool]:
+        lock = FileLock(self._mutex_path, _MUTEX_STALE_SECONDS, owner=self.holder)
+        if not lock.acquire(_MUTEX_WAIT_SECONDS):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            lock.release()
+
+    def read(self) -> Optional[dict]:
+        lease = load_json(self.path, None)
+        return lease if isinstance(lease, dict) and lease.get("holder") else None
+
+    def is_leader(self) -> bool:
+        return self.term is not None and time.time() < self.expires_at
+
+    def _lost(self, lease: Optional[dict]) -> None:
+        if self.term is not None:
+            logger.warning(
+                "Lost scheduler leadership (term %s) to %s",
+                self.term, lease.get("holder") if lease else None,
+            )
+            get_metrics().counter(
+                "valutatrade_scheduler_leadership_total",
+                "Scheduler leadership changes of this process",
+            ).inc(event="lost")
+        self.term = None
+        self.expires_at = 0.0
+
+    def try_acquire(self, ran_at: Optional[float] = None) -> bool:
+        # Захват свободной/истёкшей аренды или продление своей.
+        # ran_at - время запуска обновления, которое видят следующие лидеры
+        with self._mutex() as locked:
+            if not locked:
+                # Том недоступен: лидер остаётся лидером до конца своей аренды
+                return self.is_leader()
+            lease = self.read()
+            now = time.time()
+            mine = (
+                lease is not None
+                and lease["holder"] == self.holder
+                and lease.get("term") == self.term
+            )
+            if lease is not None and not mine and lease.get("expires_at", 0) > now:
+                self.lease = lease
+                self._lost(lease)
+                return False
+
+            if mine:
+                new = dict(lease)
+            else:
+                new = {
+                    "holder": self.holder,
+                    "term": int(lease.get("term", 0)) + 1 if lease else 1,
+                    "acquired_at": now,
+                    "last_run_at": lease.get("last_run_at") if lease else None,
+                }
+            new["ttl"] = self.ttl
+            new["renewed_at"] = now
+            new["expires_at"] = now + self.ttl
+            if ran_at is not None:
+                new["last_run_at"] = ran_at
+            save_json(self.path, new)
+
+        self.lease = new
+        self.expires_at = new["expires_at"]
+        if not mine:
+            self.term = new["term"]
+            logger.info("Acquired scheduler leadership (term %d)", self.term)
+            get_metrics().counter(
+                "valutatrade_scheduler_leadership_total",
+                "Scheduler leadership changes of this process",
+            ).inc(event="acquired")
+        return True
+
+    def release(self) -> None:
+        # Досрочное освобождение: резервный процесс не ждёт истечения ttl
+        with self._mutex() as locked:
+            lease = self.read() if locked else None
+            if lease and lease["holder"] == self.holder:
+                lease["expires_at"] = time.time()
+                save_json(self.path, lease)
+        self.term = None
+        self.expires_at = 0.0
+
+
+class LeaderElector:
+    # Фоновый heartbeat для LeaseElection: лидер продлевает аренду,
+    # резервный процесс пытается захватить её сразу после истечения
+    def __init__(self, election: LeaseElection) -> None:
+        self.election = election
+        self._leader = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def _tick(self, ran_at: Optional[float] = None) -> float:
+        # Возвращает паузу до следующей попытки
+        election = self.election
+        with self._lock:
+            try:
+                leader = election.try_acquire(ran_at)
+            except OSError as exc:
+                logger.error("Lease file %s unavailable: %s", election.path, exc)
+                leader = election.is_leader()
+        if leader:
+            self._leader.set()
+            return election.ttl / 3
+        self._leader.clear()
+        lease = election.lease or {}
+        until_expiry = lease.get("expires_at", 0) - time.time()
+        return min(max(until_expiry, 0.0) + 0.05, election.ttl / 3)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._stop.wait(self._tick())
+
+    def start(self) -> None:
+        self._tick()
+        self._thread = threading.Thread(
+            target=self._run, name="scheduler-lease", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            try:
+                self.election.release()
+            except OSError as exc:
+                logger.error("Failed to release lease: %s", exc)
+
+    def is_leader(self) -> bool:
+        return self._leader.is_set() and self.election.is_leader()
+
+    def mark_run(self) -> None:
+        self._tick(ran_at=time.time())
+
+    def wait_turn(self, interval: float) -> None:
+        # Ждёт лидерства и очередного запуска по общему расписанию:
+        # новый лидер продолжает с last_run_at предыдущего, а не с нуля
+        while True:
+            self._leader.wait()
+            lease = self.election.lease or {}
+            last_run = lease.get("last_run_at") or 0.0
+            delay = last_run + interval - time.time()
+            if delay <= 0 and self.is_leader():
+                return
+            self._stop.wait(min(max(delay, 0.05), self.election.ttl / 3))
+
+
+def get_lease_election() -> LeaseElection:
+    settings = get_settings()
+    return LeaseElection(
+        Path(settings.get("SCHEDULER_LEASE_FILE")),
+        float(settings.get("SCHEDULER_LEASE_TTL_SECONDS", 30)),
+    )
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import logging
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from ..core.rates import Pair, PairLike, as_pair
+from ..core.utils import load_json, save_json
+from ..infra.database import get_db
+from ..infra.settings import get_settings
+from ..metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PairStats:
+    # Онлайн-статистика курса пары, O(1) на тик: Welford (n, mean, m2) по
+    # лог-доходностям между принятыми тиками, EWMA курса и EWMA дисперсии
+    # доходностей (RiskMetrics, среднее считается нулевым). Хранится в
+    # rates.json рядом с курсом, поэтому get_rate показывает волатильность
+    # без чтения истории
+    __slots__ = ("last", "n", "mean", "m2", "ewma", "ewm_var", "streak")
+
+    def __init__(
+            self,
+            last: Optional[float] = None,
+            n: int = 0,
+            mean: float = 0.0,
+            m2: float = 0.0,
+            ewma: Optional[float] = None,
+            ewm_var: float = 0.0,
+            streak: int = 0,
+    ) -> None:
+        self.last = last
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.ewm_var = ewm_var
+        # Отсеянных подряд тиков: пишется в снапшот и для отсеянной пары,
+        # поэтому серия не обнуляется между запусками update-rates
+        self.streak = streak
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "PairStats":
+        return cls(
+            last=data.get("last"),
+            n=int(data.get("n", 0)),
+            mean=float(data.get("mean", 0.0)),
+            m2=float(data.get("m2", 0.0)),
+            ewma=data.get("ewma"),
+            ewm_var=float(data.get("ewm_var", 0.0)),
+            streak=int(data.get("streak", 0)),
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "n": self.n,
+            "mean": self.mean,
+            "m2": self.m2,
+            "ewma": self.ewma,
+            "ewm_var": self.ewm_var,
+            "last": self.last,
+            "streak": self.streak,
+        }
+
+    def zscore(self, rate: float, min_sigma: float) -> float:
+        # Лог-доходность от последнего принятого курса в сигмах EWMA
+        sigma = max(math.sqrt(self.ewm_var), min_sigma)
+        return abs(math.log(rate / self.last)) / sigma  # type: ignore[operator]
+
+    def add(self, rate: float, alpha: float) -> None:
+        if self.last is not None:
+            r = math.log(rate / self.last)
+            self.n += 1
+            delta = r - self.mean
+            self.mean += delta / self.n
+            self.m2 += delta * (r - self.mean)
+            if self.n == 1:
+                self.ewm_var = r * r
+            else:
+                self.ewm_var += alpha * (r * r - self.ewm_var)
+        if self.ewma is None:
+            self.ewma = rate
+        else:
+            self.ewma += alpha * (rate - self.ewma)
+        self.last = rate
+        self.streak = 0
+
+    def restart(self, rate: float) -> None:
+        # Новый уровень после серии отсеянных тиков: сам скачок
+        # в статистику доходностей не попадает
+        self.last = self.ewma = rate
+        self.streak = 0
+
+
+def rate_volatility(
+        stats: Optional[Mapping[str, Any]],
+) -> Optional[Tuple[float, float, int]]:
+    # stats пары из снапшота -> (сигма EWMA, сигма по Welford, число доходностей)
+    n = int((stats or {}).get("n", 0))
+    if not n:
+        return None
+    total = math.sqrt(stats["m2"] / (n - 1)) if n > 1 else 0.0  # type: ignore[index]
+    return math.sqrt(stats.get("ewm_var", 0.0)), total, n  # type: ignore[union-attr]
+
+
+class RateFilter:
+    # Стадия статистики RatesUpdater. Курс, который не положителен или чья
+    # лог-доходность дальше RATES_OUTLIER_ZSCORE сигм (EWMA, не меньше
+    # RATES_OUTLIER_MIN_SIGMA), уходит в карантин вместо rates.json.
+    # z-score проверяется, когда у пары набралось RATES_OUTLIER_MIN_SAMPLES
+    # доходностей. После RATES_QUARANTINE_MAX_STREAK отсеянных подряд тиков
+    # курс принимается как новый уровень: настоящий скачок не блокирует пару
+    def __init__(self) -> None:
+        settings = get_settings()
+        self.zscore = float(settings.get("RATES_OUTLIER_ZSCORE") or 0.0)
+        self.min_samples = int(settings.get("RATES_OUTLIER_MIN_SAMPLES", 20))
+        self.min_sigma = float(settings.get("RATES_OUTLIER_MIN_SIGMA", 0.002))
+        self.alpha = float(settings.get("RATES_STATS_EWMA_ALPHA", 0.06))
+        self.max_streak = int(settings.get("RATES_QUARANTINE_MAX_STREAK", 3))
+        self.quarantine_file = Path(settings.get("RATES_QUARANTINE_FILE"))
+        self.quarantine_keep = int(settings.get("RATES_QUARANTINE_KEEP", 1000))
+        self._stats: Optional[Dict[Pair, PairStats]] = None
+
+    def _load(self) -> Dict[Pair, PairStats]:
+        # Статистика продолжается с записанной в rates.json
+        if self._stats is None:
+            stats: Dict[Pair, PairStats] = {}
+            for pair, info in get_db().load_rates_snapshot()["pairs"].items():
+                saved = info.get("stats")
+                if saved:
+                    stats[pair] = PairStats.from_dict(saved)
+                elif info.get("rate"):
+                    rate = float(info["rate"])
+                    stats[pair] = PairStats(last=rate, ewma=rate)
+            self._stats = stats
+        return self._stats
+
+    def filter(
+            self,
+            pairs: Mapping[PairLike, float],
+    ) -> Tuple[Dict[Pair, float], List[dict]]:
+        # -> (принятые курсы, записи карантина)
+        stats_by_pair = self._load()
+        accepted: Dict[Pair, float] = {}
+        quarantined: List[dict] = []
+        for key, raw_rate in pairs.items():
+            pair = as_pair(key)
+            stats = stats_by_pair.get(pair)
+            if stats is None:
+                stats = stats_by_pair[pair] = PairStats()
+            try:
+                rate = float(raw_rate)
+            except (TypeError, ValueError):
+                rate = math.nan
+            if not math.isfinite(rate) or rate <= 0:
+                quarantined.append(self._record(pair, raw_rate, stats, None))
+                continue
+
+            score = None
+            if self.zscore and stats.last and stats.n >= self.min_samples:
+                score = stats.zscore(rate, self.min_sigma)
+            if score is None or score <= self.zscore:
+                stats.add(rate, self.alpha)
+                accepted[pair] = rate
+                continue
+
+            stats.streak += 1
+            if stats.streak >= self.max_streak:
+                logger.warning(
+                    "Rate %s %.8g accepted as a new level after %d outliers "
+                    "(z=%.1f)", pair, rate, stats.streak, score,
+                )
+                stats.restart(rate)
+                accepted[pair] = rate
+                continue
+            quarantined.append(self._record(pair, rate, stats, score))
+        return accepted, quarantined
+
+    def _record(
+            self,
+            pair: Pair,
+            rate: object,
+            stats: PairStats,
+            score: Optional[float],
+    ) -> dict:
+        return {
+            "pair": str(pair),
+            "rate": rate if isinstance(rate, (int, float)) else str(rate),
+            "last": stats.last,
+            "zscore": None if score is None or math.isinf(score) else round(score, 2),
+            "reason": "z-score" if score is not None else "не положительный курс",
+        }
+
+    def export(self, pairs: Iterable[PairLike]) -> Dict[Pair, dict]:
+        stats_by_pair = self._load()
+        exported = {}
+        for key in pairs:
+            pair = as_pair(key)
+            if pair in stats_by_pair:
+                exported[pair] = stats_by_pair[pair].to_dict()
+        return exported
+
+    def quarantine(self, records: List[dict], source: str) -> None:
+        # Отсеянные тики - в RATES_QUARANTINE_FILE (последние quarantine_keep)
+        now_iso = datetime.utcnow().isoformat() + "Z"
+        counter = get_metrics().counter(
+            "valutatrade_rates_quarantined_total", "Ticks held back as outliers"
+        )
+        for record in records:
+            record["source"] = source
+            record["timestamp"] = now_iso
+            counter.inc(pair=record["pair"], reason=record["reason"])
+            logger.warning(
+                "Quarantined %s rate %s from %s (last %s, z=%s)",
+                record["pair"], record["rate"], source,
+                record["last"], record["zscore"],
+            )
+        kept = load_json(self.quarantine_file, []) + records
+        save_json(self.quarantine_file, kept[-self.quarantine_keep:])
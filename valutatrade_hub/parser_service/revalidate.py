@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Dict, Optional
+
+from ..core.rates import Pair
+from .api_clients import BaseApiClient, ExchangeRateApiClient
+from .config import ParserConfig
+from .hedging import crypto_client
+from .updater import RatesUpdater
+
+logger = logging.getLogger(__name__)
+
+CRYPTO = "crypto"
+FIAT = "fiat"
+
+
+class RatesRevalidator:
+    # Фоновое обновление устаревших курсов (stale-while-revalidate).
+    # На каждую группу источников (crypto/fiat) одновременно идёт не больше
+    # одного обновления, сколько бы читателей ни увидели устаревший курс
+    def __init__(self, config: Optional[ParserConfig] = None) -> None:
+        self.config = config or ParserConfig()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, threading.Thread] = {}
+        self._clients: Dict[str, BaseApiClient] = {}
+
+    def group_for(self, pair: Pair) -> str:
+        crypto = set(self.config.CRYPTO_CURRENCIES)
+        return CRYPTO if any(code in crypto for code in pair) else FIAT
+
+    def _client(self, group: str) -> BaseApiClient:
+        # Клиенты живут между обновлениями: HedgedClient копит статистику p95
+        client = self._clients.get(group)
+        if client is None:
+            if group == CRYPTO:
+                client = crypto_client(self.config)
+            else:
+                client = ExchangeRateApiClient(self.config)
+            self._clients[group] = client
+        return client
+
+    def _run(self, group: str) -> None:
+        from ..core.usecases import execute_triggered_orders
+
+        try:
+            updater = RatesUpdater(
+                [self._client(group)], listeners=[execute_triggered_orders]
+            )
+            result = updater.run_update()
+            logger.info(
+                "Revalidated %s rates: %d updated, errors=%s, skipped=%s",
+                group, result["total_rates"], result["errors"], result["skipped"],
+            )
+        except Exception as exc:
+            logger.error("Background %s rates refresh failed: %s", group, exc)
+        finally:
+            with self._lock:
+                self._inflight.pop(group, None)
+
+    def refresh_async(self, group: str) -> threading.Thread:
+        # Не daemon: разовая команда CLI дождётся обновления перед выходом
+        with self._lock:
+            thread = self._inflight.get(group)
+            if thread is None:
+                thread = threading.Thread(
+                    target=self._run,
+                    args=(group,),
+                    name=f"revalidate-{group}",
+                )
+                self._inflight[group] = thread
+                thread.start()
+            return thread
+
+    def refresh_sync(self, group: str) -> None:
+        # Присоединяется к уже идущему обновлению вместо второго запроса
+        self.refresh_async(group).join(timeout=2 * self.config.REQUEST_TIMEOUT)
+
+
+_REVALIDATOR: Optional[RatesRevalidator] = None
+_REVALIDATOR_LOCK = threading.Lock()
+
+
+def get_revalidator() -> RatesRevalidator:
+    global _REVALIDATOR
+    if _REVALIDATOR is None:
+        with _REVALIDATOR_LOCK:
+            if _REVALIDATOR is None:
+                _REVALIDATOR = RatesRevalidator()
+    return _REVALIDATOR
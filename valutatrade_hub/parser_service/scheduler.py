@@ -1,18 +1,40 @@
 import time
 import logging
+from pathlib import Path
 from typing import List, Optional
 
 from .config import ParserConfig
-from .api_clients import CoinGeckoClient, ExchangeRateApiClient, BaseApiClient
-from .updater import RatesUpdater
+from .api_clients import ExchangeRateApiClient, BaseApiClient
+from .hedging import crypto_client
+from .leader import LeaderElector, get_lease_election
+from .updater import RatesListener, RatesUpdater
+from ..infra.settings import get_settings
+from ..metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
 
-def run_scheduler(interval: int = 300) -> None:
+def _export_metrics(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        get_metrics().write_textfile(Path(path))
+    except OSError as e:
+        logger.error(f"Failed to write metrics textfile {path}: {e}")
+
+
+def run_scheduler(
+        interval: int = 300,
+        metrics_file: Optional[str] = None,
+        mem_snapshot_every: Optional[int] = None,
+) -> None:
     """
     Бесконечный цикл обновления курсов.
     interval: частота обновления в секундах (по умолчанию 5 минут).
+    metrics_file: путь для метрик в формате Prometheus (textfile collector),
+    по умолчанию берётся из настройки METRICS_TEXTFILE.
+    mem_snapshot_every: раз в сколько циклов сохранять снимок tracemalloc
+    с приростом памяти относительно первого цикла (None - не снимать).
     """
     # Настраиваем базовый логгер
     if not logger.handlers:
@@ -22,14 +44,15 @@ def run_scheduler(interval: int = 300) -> None:
         )
 
     config = ParserConfig()
+    metrics_file = metrics_file or get_settings().get("METRICS_TEXTFILE")
 
     # Инициализация клиентов внутри шедулера
     clients: List[BaseApiClient] = []
 
     try:
-        clients.append(CoinGeckoClient(config))
+        clients.append(crypto_client(config))
     except Exception as e:
-        logger.error(f"Failed to initialize CoinGeckoClient: {e}")
+        logger.error(f"Failed to initialize crypto clients: {e}")
 
     if config.EXCHANGERATE_API_KEY:
         try:
@@ -43,24 +66,69 @@ def run_scheduler(interval: int = 300) -> None:
         logger.error("No API clients configured. Exiting scheduler.")
         return
 
-    updater = RatesUpdater(clients)
+    from ..core.usecases import execute_triggered_orders, rebalance_on_rates
+
+    listeners: List[RatesListener] = [execute_triggered_orders]
+    targets = get_settings().get("REBALANCE_TARGETS")
+    if targets:
+        # Цели и NumPy (extra analytics) проверяются до старта: иначе
+        # ошибка повторялась бы в каждом цикле обновления курсов
+        from ..core.exceptions import CurrencyNotFoundError
+        from ..core.rebalance import parse_targets, require_numpy
+
+        try:
+            require_numpy()
+            parse_targets(targets)
+        except (ImportError, ValueError, CurrencyNotFoundError) as e:
+            logger.error(f"Auto-rebalance disabled: {e}")
+            print(f"Ошибка: REBALANCE_TARGETS не применяются: {e}")
+        else:
+            listeners.append(rebalance_on_rates)
+    updater = RatesUpdater(clients, listeners=listeners)
+
+    watcher = None
+    if mem_snapshot_every:
+        from ..profiling import MemoryWatcher
+
+        watcher = MemoryWatcher(every=mem_snapshot_every)
+
+    # Обновляет только лидер; резервные процессы ждут истечения его аренды
+    elector = None
+    if get_settings().get("SCHEDULER_LEADER_ELECTION", True):
+        elector = LeaderElector(get_lease_election())
+        elector.start()
+        role = "leader" if elector.is_leader() else "standby"
+        logger.info(f"Scheduler lease holder id {elector.election.holder}: {role}")
 
     logger.info(f"Starting Scheduler. Update interval: {interval} seconds.")
     print(f"Scheduler started. Updating every {interval}s. Press Ctrl+C to stop.")
 
     try:
         while True:
+            if elector is not None:
+                if not elector.is_leader():
+                    logger.info("Scheduler: standby, waiting for the lease...")
+                elector.wait_turn(interval)
             logger.info("Scheduler: Initiating update...")
             try:
                 updater.run_update()
             except Exception as e:
                 logger.error(f"Unexpected error in scheduler loop: {e}")
+            if elector is not None:
+                elector.mark_run()
+            _export_metrics(metrics_file)
+            if watcher is not None:
+                watcher.tick()
 
-            logger.info(f"Scheduler: Sleeping for {interval} seconds...")
-            time.sleep(interval)
+            if elector is None:
+                logger.info(f"Scheduler: Sleeping for {interval} seconds...")
+                time.sleep(interval)
     except KeyboardInterrupt:
         logger.info("Scheduler stopped by user.")
         print("\nScheduler stopped.")
+    finally:
+        if elector is not None:
+            elector.stop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import json
+import queue
+import random
+import socket
+import socketserver
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_PRICES = {"BTC_USD": 77000.0, "ETH_USD": 3500.0, "SOL_USD": 180.0}
+
+
+class _FeedHandler(socketserver.StreamRequestHandler):
+    server: "_FeedServer"
+
+    def handle(self) -> None:
+        feed = self.server.feed
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            hello = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            return
+        pairs = set(hello.get("pairs") or ()) or None
+        resume_from = hello.get("resume_from")
+
+        inbox, backlog, missed, resume_from = feed._subscribe(
+            self.connection, resume_from, hello.get("epoch")
+        )
+        try:
+            self._send({"type": "hello", "epoch": feed.epoch, "seq": feed.seq})
+            if missed:
+                self._send({"type": "gap", "missed": missed})
+            last = resume_from if resume_from is not None else 0
+            for tick in backlog:
+                if pairs is None or tick["pair"] in pairs:
+                    self._send(tick)
+                last = tick["seq"]
+            while not feed._stopped.is_set():
+                try:
+                    tick = inbox.get(timeout=feed.heartbeat)
+                except queue.Empty:
+                    self._send({"type": "heartbeat", "ts": time.time()})
+                    continue
+                if tick["seq"] <= last:
+                    continue
+                last = tick["seq"]
+                if pairs is None or tick["pair"] in pairs:
+                    self._send(tick)
+        except OSError:
+            pass
+        finally:
+            feed._unsubscribe(self.connection)
+
+    def _send(self, message: dict) -> None:
+        self.wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+class _FeedServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address: Tuple[str, int], feed: "FeedSimulator") -> None:
+        self.feed = feed
+        super().__init__(address, _FeedHandler)
+
+
+class FeedSimulator:
+    # Локальный NDJSON-фид для проверки потокового клиента: случайное
+    # блуждание цен с rate тиками в секунду, кольцевой буфер последних
+    # buffer_size тиков для resume и принудительный разрыв соединений
+    def __init__(
+            self,
+            host: str = "127.0.0.1",
+            port: int = 0,
+            prices: Optional[Dict[str, float]] = None,
+            rate: float = 50.0,
+            buffer_size: int = 10000,
+            heartbeat: float = 1.0,
+            seed: Optional[int] = None,
+    ) -> None:
+        self.prices = dict(prices or DEFAULT_PRICES)
+        self.rate = rate
+        self.heartbeat = heartbeat
+        self.seq = 0
+        # Эпоха - новая при каждом запуске: seq после перезапуска
+        # начинается с 1, и клиент по эпохе отличает это от повтора
+        self.epoch = uuid.uuid4().hex
+        self._random = random.Random(seed)
+        self._buffer: Deque[dict] = deque(maxlen=buffer_size)
+        self._subscribers: Dict[socket.socket, "queue.Queue[dict]"] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = _FeedServer((host, port), self)
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        host, port = self._server.server_address[:2]
+        return host, port
+
+    def _subscribe(
+            self,
+            conn: socket.socket,
+            resume_from: Optional[int],
+            epoch: Optional[str] = None,
+    ) -> Tuple["queue.Queue[dict]", List[dict], int, Optional[int]]:
+        # Подписка и выборка из буфера под одной блокировкой: ни один тик
+        # не теряется и не приходит дважды между досылкой и живым потоком.
+        # Тики, уже вытесненные из буфера, возвращаются числом missed.
+        # resume_from из другой эпохи или больше текущего seq - клиент
+        # помнит фид до перезапуска: досылается весь буфер
+        inbox: "queue.Queue[dict]" = queue.Queue()
+        backlog: List[dict] = []
+        missed = 0
+        with self._lock:
+            self._subscribers[conn] = inbox
+            if resume_from is not None and (
+                    resume_from > self.seq or epoch not in (None, self.epoch)
+            ):
+                resume_from = 0
+            if resume_from is not None:
+                backlog = [t for t in self._buffer if t["seq"] > resume_from]
+                oldest = backlog[0]["seq"] if backlog else self.seq + 1
+                missed = max(0, oldest - resume_from - 1)
+        return inbox, backlog, missed, resume_from
+
+    def _unsubscribe(self, conn: socket.socket) -> None:
+        with self._lock:
+            self._subscribers.pop(conn, None)
+
+    def emit(self, pair: Optional[str] = None) -> dict:
+        pair = pair or self._random.choice(list(self.prices))
+        price = self.prices[pair] * (1 + self._random.gauss(0, 0.0005))
+        self.prices[pair] = price
+        with self._lock:
+            self.seq += 1
+            tick = {
+                "type": "tick",
+                "seq": self.seq,
+                "pair": pair,
+                "rate": round(price, 8),
+                "ts": time.time(),
+            }
+            self._buffer.append(tick)
+            inboxes = list(self._subscribers.values())
+        for inbox in inboxes:
+            inbox.put(tick)
+        return tick
+
+    def _generate(self) -> None:
+        interval = 1.0 / self.rate
+        next_at = time.monotonic()
+        while not self._stopped.is_set():
+            self.emit()
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                self._stopped.wait(delay)
+
+    def start(self, generate: bool = True) -> Tuple[str, int]:
+        targets = [self._server.serve_forever]
+        if generate and self.rate > 0:
+            targets.append(self._generate)
+        for target in targets:
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self.address
+
+    def drop_connections(self) -> int:
+        # Имитация сетевого сбоя: клиенты должны переподключиться с resume
+        with self._lock:
+            conns = list(self._subscribers)
+        for conn in conns:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return len(conns)
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.drop_connections()
+        self._server.shutdown()
+        self._server.server_close()
+        for thread in self._threads:
+            thread.join(timeout=1)
+
+    def __enter__(self) -> "FeedSimulator":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+
+def run_simulator(
+        host: str = "127.0.0.1",
+        port: int = 9100,
+        rate: float = 50.0,
+        pairs: Optional[Iterable[str]] = None,
+) -> None:
+    prices = None
+    if pairs:
+        prices = {pair: DEFAULT_PRICES.get(pair, 100.0) for pair in pairs}
+    feed = FeedSimulator(host, port, prices=prices, rate=rate)
+    feed.start()
+    print(f"Feed simulator on {host}:{feed.address[1]}, {rate:g} ticks/s. "
+          f"Ctrl+C - stop.")
+    try:
+        while True:
+            time.sleep(1)
+    finally:
+        feed.stop()
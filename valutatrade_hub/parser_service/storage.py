@@ -3,59 +3,90 @@ from __future__ import annotations
 import json
 from datetime import datetime
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional
 
+from ..core.locks import FileLock
+from ..core.rates import Pair, as_pair
+from ..core.utils import save_json
 from ..infra.database import get_db
 
 
-def write_snapshot(pairs: Dict[str, float], source: str) -> None:
+# exchange_rates.json дописывает run-scheduler, а compact-history
+# перезаписывает без архивированных тиков: чтение-изменение-запись обоих
+# идёт под общей блокировкой, иначе тики между ними теряются
+HISTORY_LOCK_STALE_SECONDS = 60.0
+HISTORY_LOCK_WAIT_SECONDS = 30.0
+
+
+def history_lock(history_file: Path) -> FileLock:
+    return FileLock(
+        history_file.with_name(history_file.name + ".lock"),
+        HISTORY_LOCK_STALE_SECONDS,
+    )
+
+
+def write_snapshot(
+        pairs: Dict[Pair, float],
+        source: str,
+        stats: Optional[Dict[Pair, dict]] = None,
+) -> None:
     db = get_db()
     snapshot = db.load_rates_snapshot()
     existing_pairs = snapshot.get("pairs", {})
     now_iso = datetime.utcnow().isoformat() + "Z"
+    # Версия снапшота растёт с каждой записью, версия пары - только когда
+    # меняется её курс (по ней кеш оценок пересчитывает кошельки)
+    version = int(snapshot.get("version") or 0) + 1
 
-    for pair, rate in pairs.items():
+    for key, rate in pairs.items():
+        pair = as_pair(key)
+        previous = existing_pairs.get(pair) or {}
+        changed = previous.get("rate") != rate
         existing_pairs[pair] = {
             "rate": rate,
             "updated_at": now_iso,
             "source": source,
+            "version": version if changed else previous.get("version", 0),
         }
+    # Онлайн-статистика RateFilter - и для пар, чей тик ушёл в карантин
+    for pair, pair_stats in (stats or {}).items():
+        if pair in existing_pairs:
+            existing_pairs[pair]["stats"] = pair_stats
 
     snapshot["pairs"] = existing_pairs
+    snapshot["version"] = version
     snapshot["last_refresh"] = now_iso
     db.save_rates_snapshot(snapshot)
 
 
-def append_history(pairs: Dict[str, float], source: str) -> None:
+def append_history(pairs: Dict[Pair, float], source: str) -> None:
     db = get_db()
     history_file = Path(db.exchange_history_file)
-    if history_file.exists():
-        with history_file.open("r", encoding="utf-8") as f:
-            history = json.load(f)
-    else:
-        history = []
+    with history_lock(history_file).hold(HISTORY_LOCK_WAIT_SECONDS):
+        if history_file.exists():
+            with history_file.open("r", encoding="utf-8") as f:
+                history = json.load(f)
+        else:
+            history = []
 
-    now_iso = datetime.utcnow().isoformat() + "Z"
-    for pair, rate in pairs.items():
-        from_code, to_code = pair.split("_", maxsplit=1)
-        rec_id = f"{from_code}_{to_code}_{now_iso}"
-        record = {
-            "id": rec_id,
-            "from_currency": from_code,
-            "to_currency": to_code,
-            "rate": rate,
-            "timestamp": now_iso,
-            "source": source,
-            "meta": {
-                "raw_id": "",
-                "request_ms": 0,
-                "status_code": 200,
-                "etag": "",
-            },
-        }
-        history.append(record)
+        now_iso = datetime.utcnow().isoformat() + "Z"
+        for pair, rate in pairs.items():
+            from_code, to_code = as_pair(pair)
+            rec_id = f"{from_code}_{to_code}_{now_iso}"
+            record = {
+                "id": rec_id,
+                "from_currency": from_code,
+                "to_currency": to_code,
+                "rate": rate,
+                "timestamp": now_iso,
+                "source": source,
+                "meta": {
+                    "raw_id": "",
+                    "request_ms": 0,
+                    "status_code": 200,
+                    "etag": "",
+                },
+            }
+            history.append(record)
 
-    tmp = history_file.with_suffix(".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
-    tmp.replace(history_file)
+        save_json(history_file, history)
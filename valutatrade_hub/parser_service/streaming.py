@@ -0,0 +1,362 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import random
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..core.rates import Pair
+from ..metrics import get_metrics
+from .config import ParserConfig
+
+logger = logging.getLogger(__name__)
+
+# Протокол фида - JSON по строке в каждую сторону:
+#   клиент -> {"op": "subscribe", "pairs": ["BTC_USD", ...], "resume_from": 41,
+#              "epoch": "9f3c..."}
+#   фид    -> {"type": "hello", "epoch": "9f3c...", "seq": 57}
+#             {"type": "tick", "seq": 42, "pair": "BTC_USD", "rate": 77308.1,
+#              "ts": 1760000000.123}
+#             {"type": "heartbeat", "ts": ...}
+#             {"type": "gap", "missed": 120}
+# seq растёт монотонно в пределах эпохи фида (с фильтром по парам - с
+# пропусками). После переподключения фид досылает тики с seq > resume_from
+# из своего буфера; если часть уже вытеснена, сначала приходит gap.
+# hello идёт первым на каждом соединении: другая эпоха или seq меньше
+# resume_from - фид перезапустился и нумерует заново, тогда он досылает
+# буфер с начала, а клиент сбрасывает last_seq
+
+_MAX_LINE = 1 << 20
+_RECONNECT_BASE_DELAY = 0.5
+# Верхняя граница ожидания read, чтобы вовремя заметить stop
+_POLL_SLICE = 0.5
+
+BatchHandler = Callable[[Dict[Pair, float]], None]
+VisibleHandler = Callable[[List[float]], None]
+
+
+class MicroBatcher:
+    # Тики схлопываются до последнего курса по паре. Батч готов, когда
+    # набралось max_ticks тиков или с первого тика прошло max_delay секунд
+    def __init__(self, max_ticks: int, max_delay: float) -> None:
+        self.max_ticks = max(1, max_ticks)
+        self.max_delay = max(0.0, max_delay)
+        self.pairs: Dict[Pair, float] = {}
+        self.sent_at: List[float] = []
+        self._opened: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self.sent_at)
+
+    def add(self, pair: Pair, rate: float, sent_at: float) -> None:
+        if self._opened is None:
+            self._opened = time.monotonic()
+        self.pairs[pair] = rate
+        self.sent_at.append(sent_at)
+
+    def remaining(self, now: float) -> float:
+        if self._opened is None:
+            return math.inf
+        return max(0.0, self._opened + self.max_delay - now)
+
+    def due(self, now: float) -> bool:
+        return bool(self.sent_at) and (
+            len(self.sent_at) >= self.max_ticks or self.remaining(now) <= 0
+        )
+
+    def take(self) -> Tuple[Dict[Pair, float], List[float]]:
+        pairs, sent_at = self.pairs, self.sent_at
+        self.pairs, self.sent_at, self._opened = {}, [], None
+        return pairs, sent_at
+
+
+class BaseStreamClient(ABC):
+    # Долгоживущий push-источник курсов, в пару к опросному BaseApiClient.
+    # Реализация открывает соединение и отдаёт декодированные сообщения;
+    # переподключение с продолжением по seq и микробатчи общие
+    def __init__(self, config: ParserConfig) -> None:
+        self.config = config
+        self.last_seq: Optional[int] = None
+        self.epoch: Optional[str] = None
+        self.stats = {
+            "ticks": 0,
+            "duplicates": 0,
+            "gaps": 0,
+            "resets": 0,
+            "batches": 0,
+            "reconnects": 0,
+        }
+
+    @property
+    def source(self) -> str:
+        return self.__class__.__name__
+
+    @property
+    def pairs(self) -> List[Pair]:
+        base = self.config.BASE_CURRENCY
+        return [Pair(code, base) for code in self.config.CRYPTO_CURRENCIES]
+
+    @abstractmethod
+    def connect(self, resume_from: Optional[int]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def read(self, timeout: float) -> List[dict]:
+        # [] по таймауту, ConnectionError при разрыве, ValueError - мусор
+        raise NotImplementedError
+
+    @abstractmethod
+    def close(self) -> None:
+        raise NotImplementedError
+
+    def _accept(self, message: dict, batcher: MicroBatcher) -> None:
+        kind = message.get("type")
+        metrics = get_metrics()
+        if kind == "hello":
+            self._hello(message.get("epoch"), int(message.get("seq", 0)))
+            return
+        if kind == "gap":
+            # Разрыв дольше буфера фида: снапшот догонит следующий тик
+            # по паре, а в истории останется пропуск
+            missed = int(message.get("missed", 0))
+            self.stats["gaps"] += 1
+            metrics.counter(
+                "valutatrade_stream_missed_ticks_total",
+                "Ticks lost between reconnects",
+            ).inc(missed, client=self.source)
+            logger.warning("%s: feed lost %d ticks after seq %s",
+                           self.source, missed, self.last_seq)
+            return
+        if kind != "tick":
+            return
+        ticks = metrics.counter(
+            "valutatrade_stream_ticks_total", "Stream ticks by outcome"
+        )
+        seq = int(message["seq"])
+        if self.last_seq is not None and seq <= self.last_seq:
+            # Повтор после resume
+            self.stats["duplicates"] += 1
+            ticks.inc(client=self.source, outcome="duplicate")
+            return
+        self.last_seq = seq
+        rate = float(message["rate"])
+        try:
+            pair = Pair.parse(message["pair"])
+        except ValueError:
+            pair = None
+        if pair is None or not (math.isfinite(rate) and rate > 0):
+            ticks.inc(client=self.source, outcome="invalid")
+            return
+        self.stats["ticks"] += 1
+        ticks.inc(client=self.source, outcome="ok")
+        batcher.add(pair, rate, float(message.get("ts") or time.time()))
+
+    def _hello(self, epoch: Optional[str], seq: int) -> None:
+        # Без сброса все тики нового фида считались бы повторами,
+        # пока его seq не обгонит старый
+        restarted = (
+            self.epoch is not None and epoch is not None and epoch != self.epoch
+        ) or (self.last_seq is not None and seq < self.last_seq)
+        if restarted:
+            self.stats["resets"] += 1
+            get_metrics().counter(
+                "valutatrade_stream_resets_total", "Feed restarts seen by client"
+            ).inc(client=self.source)
+            logger.warning("%s: feed restarted (epoch %s, seq %d), was seq %s",
+                           self.source, epoch, seq, self.last_seq)
+            self.last_seq = None
+        self.epoch = epoch
+
+    def _flush(
+            self,
+            batcher: MicroBatcher,
+            on_batch: BatchHandler,
+            on_visible: Optional[VisibleHandler],
+    ) -> None:
+        pairs, sent_at = batcher.take()
+        metrics = get_metrics()
+        try:
+            on_batch(pairs)
+        except Exception as exc:
+            # Тики батча потеряны, но поток не прерывается
+            logger.error("%s: failed to store batch: %s", self.source, exc)
+            metrics.counter(
+                "valutatrade_stream_batches_total", "Stream batches by outcome"
+            ).inc(client=self.source, outcome="error")
+            return
+        # Время от отправки тика фидом до его появления в rates.json
+        visible_at = time.time()
+        latencies = [max(0.0, visible_at - ts) for ts in sent_at]
+        self.stats["batches"] += 1
+        metrics.counter(
+            "valutatrade_stream_batches_total", "Stream batches by outcome"
+        ).inc(client=self.source, outcome="ok")
+        metrics.histogram(
+            "valutatrade_stream_batch_ticks",
+            "Ticks coalesced per stream batch",
+            buckets=(1, 5, 10, 50, 100, 500, 1000),
+        ).observe(len(sent_at), client=self.source)
+        histogram = metrics.histogram(
+            "valutatrade_stream_visible_seconds",
+            "Tick-to-visible latency of streamed rates",
+            buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+        )
+        for latency in latencies:
+            histogram.observe(latency, client=self.source)
+        if on_visible is not None:
+            on_visible(latencies)
+
+    def _reconnect_delay(self, attempt: int) -> float:
+        delay = min(
+            self.config.STREAM_RECONNECT_MAX_DELAY,
+            _RECONNECT_BASE_DELAY * 2 ** attempt,
+        )
+        # Jitter, чтобы клиенты не переподключались к фиду разом
+        return delay * random.uniform(0.5, 1.0)
+
+    def _consume(
+            self,
+            batcher: MicroBatcher,
+            stop: threading.Event,
+            on_batch: BatchHandler,
+            on_visible: Optional[VisibleHandler],
+    ) -> None:
+        idle = self.config.STREAM_IDLE_TIMEOUT
+        idle_deadline = time.monotonic() + idle
+        while not stop.is_set():
+            now = time.monotonic()
+            timeout = min(batcher.remaining(now), idle_deadline - now, _POLL_SLICE)
+            messages = self.read(max(timeout, 0.0))
+            now = time.monotonic()
+            if messages:
+                idle_deadline = now + idle
+            elif now >= idle_deadline:
+                raise ConnectionError(f"no messages for {idle:.0f}s")
+            for message in messages:
+                self._accept(message, batcher)
+                if len(batcher) >= batcher.max_ticks:
+                    self._flush(batcher, on_batch, on_visible)
+            if batcher.due(now):
+                self._flush(batcher, on_batch, on_visible)
+
+    def run(
+            self,
+            on_batch: BatchHandler,
+            stop: Optional[threading.Event] = None,
+            on_visible: Optional[VisibleHandler] = None,
+    ) -> None:
+        # Работает до stop.set() (или Ctrl+C), переподключаясь при разрывах
+        stop = stop or threading.Event()
+        batcher = MicroBatcher(
+            self.config.STREAM_BATCH_MAX_TICKS, self.config.STREAM_BATCH_MAX_DELAY
+        )
+        reconnects = get_metrics().counter(
+            "valutatrade_stream_reconnects_total", "Stream reconnect attempts"
+        )
+        attempt = 0
+        while not stop.is_set():
+            try:
+                self.connect(self.last_seq)
+            except OSError as exc:
+                delay = self._reconnect_delay(attempt)
+                attempt += 1
+                logger.warning("%s: connect failed (%s), retry in %.1fs",
+                               self.source, exc, delay)
+                stop.wait(delay)
+                continue
+            if attempt or self.stats["batches"] or self.last_seq is not None:
+                logger.info("%s: resumed after seq %s", self.source, self.last_seq)
+            attempt = 0
+            try:
+                self._consume(batcher, stop, on_batch, on_visible)
+            except (OSError, ValueError, KeyError, TypeError) as exc:
+                self.stats["reconnects"] += 1
+                reconnects.inc(client=self.source)
+                logger.warning("%s: stream interrupted: %s", self.source, exc)
+            finally:
+                self.close()
+                # Принятое до разрыва не должно ждать нового соединения
+                if len(batcher):
+                    self._flush(batcher, on_batch, on_visible)
+
+
+class NdjsonStreamClient(BaseStreamClient):
+    # Фид в формате newline-delimited JSON поверх TCP
+    def __init__(
+            self,
+            config: ParserConfig,
+            host: Optional[str] = None,
+            port: Optional[int] = None,
+    ) -> None:
+        super().__init__(config)
+        self.host = host or config.STREAM_HOST
+        self.port = port or config.STREAM_PORT
+        self._sock: Optional[socket.socket] = None
+        self._buffer = b""
+
+    def connect(self, resume_from: Optional[int]) -> None:
+        sock = socket.create_connection(
+            (self.host, self.port), timeout=self.config.REQUEST_TIMEOUT
+        )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        hello = {
+            "op": "subscribe",
+            "pairs": [str(pair) for pair in self.pairs],
+            "resume_from": resume_from,
+            "epoch": self.epoch,
+        }
+        try:
+            sock.sendall(json.dumps(hello).encode("utf-8") + b"\n")
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._buffer = b""
+
+    def read(self, timeout: float) -> List[dict]:
+        if self._sock is None:
+            raise ConnectionError("not connected")
+        self._sock.settimeout(max(timeout, 0.001))
+        try:
+            chunk = self._sock.recv(65536)
+        except socket.timeout:
+            return []
+        if not chunk:
+            raise ConnectionError("feed closed the connection")
+        *lines, self._buffer = (self._buffer + chunk).split(b"\n")
+        if len(self._buffer) > _MAX_LINE:
+            raise ValueError("feed line too long")
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def close(self) -> None:
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            finally:
+                self._sock = None
+
+
+def run_stream(
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        stop: Optional[threading.Event] = None,
+        config: Optional[ParserConfig] = None,
+) -> NdjsonStreamClient:
+    # Поток курсов в rates.json и историю, с исполнением лимитных заявок
+    from ..core.usecases import execute_triggered_orders
+    from .updater import RatesUpdater
+
+    config = config or ParserConfig()
+    client = NdjsonStreamClient(config, host=host, port=port)
+    updater = RatesUpdater([], listeners=[execute_triggered_orders])
+
+    def store(pairs: Dict[Pair, float]) -> None:
+        updater.publish(pairs, client.source, config.CRYPTO_CURRENCIES)
+
+    client.run(store, stop=stop)
+    return client
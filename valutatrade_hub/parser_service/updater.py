@@ -1,44 +1,144 @@
 from __future__ import annotations
 
 import logging
-from typing import Dict, List
+import time
+from typing import Callable, Dict, Iterable, List, Optional
 
-from ..core.exceptions import ApiRequestError
+from ..core.currencies import get_registry
+from ..core.durability import deferred_commit
+from ..core.exceptions import ApiRequestError, CircuitOpenError
+from ..core.rates import Pair, as_pair
+from ..metrics import get_metrics
 from .api_clients import BaseApiClient
+from .rate_stats import RateFilter
 from .storage import append_history, write_snapshot
 
 logger = logging.getLogger(__name__)
 
 
+RatesListener = Callable[[Dict[Pair, float]], object]
+
+
 class RatesUpdater:
-    def __init__(self, clients: List[BaseApiClient]) -> None:
+    def __init__(
+            self,
+            clients: List[BaseApiClient],
+            listeners: Optional[List[RatesListener]] = None,
+            rate_filter: Optional[RateFilter] = None,
+    ) -> None:
         self.clients = clients
+        # Вызываются после каждого обновления со всеми новыми курсами
+        # (например, исполнение лимитных заявок)
+        self.listeners: List[RatesListener] = list(listeners or [])
+        # Онлайн-статистика пар и карантин выбросов: отсеянный тик не
+        # попадает ни в историю, ни в снапшот, ни к слушателям
+        self.rate_filter = rate_filter or RateFilter()
+
+    def _notify(self, pairs: Dict[Pair, float]) -> None:
+        for listener in self.listeners:
+            try:
+                listener(pairs)
+            except Exception as exc:
+                logger.error(
+                    "Rates listener %s failed: %s",
+                    getattr(listener, "__name__", listener), exc,
+                )
+
+    def _register_codes(
+            self,
+            crypto_codes: Iterable[str],
+            pairs: Dict[Pair, float],
+    ) -> None:
+        # Новые коды из ответа API сразу попадают в реестр валют
+        crypto = set(crypto_codes)
+        registry = get_registry()
+        try:
+            for pair in pairs:
+                for code in as_pair(pair):
+                    registry.ensure([code], kind="crypto" if code in crypto else "fiat")
+        except OSError as exc:
+            logger.warning("Failed to update currency registry: %s", exc)
+
+    def store(
+            self,
+            pairs: Dict[Pair, float],
+            source: str,
+            crypto_codes: Iterable[str] = (),
+    ) -> Dict[Pair, float]:
+        # Запись курсов без уведомления слушателей (его делает вызывающий).
+        # -> принятые курсы (без ушедших в карантин)
+        accepted, quarantined = self.rate_filter.filter(pairs)
+        self._register_codes(crypto_codes, accepted)
+        if not accepted and not quarantined:
+            return accepted
+        stats = self.rate_filter.export(pairs)
+        # История, снапшот и карантин - одна группа fsync (DURABILITY=group)
+        with deferred_commit():
+            if accepted:
+                append_history(accepted, source=source)
+            write_snapshot(accepted, source=source, stats=stats)
+            if quarantined:
+                self.rate_filter.quarantine(quarantined, source)
+        return accepted
+
+    def publish(
+            self,
+            pairs: Dict[Pair, float],
+            source: str,
+            crypto_codes: Iterable[str] = (),
+    ) -> None:
+        # Для потоковых источников: каждый микробатч - отдельное обновление
+        accepted = self.store(pairs, source, crypto_codes)
+        if accepted:
+            self._notify(accepted)
 
     def run_update(self) -> dict:
         logger.info("Starting rates update...")
-        all_pairs: Dict[str, float] = {}
+        started = time.perf_counter()
+        all_pairs: Dict[Pair, float] = {}
         errors: List[str] = []
+        skipped: List[str] = []
+        quarantined = 0
 
         for client in self.clients:
             name = client.__class__.__name__
             logger.info("Fetching from %s...", name)
             try:
                 pairs = client.fetch_rates()
+            except CircuitOpenError as exc:
+                logger.warning("Skipping %s: %s", name, exc.reason)
+                skipped.append(exc.reason)
+                continue
             except ApiRequestError as exc:
                 msg = f"Failed to fetch from {name}: {exc}"
                 logger.error(msg)
                 errors.append(msg)
                 continue
             logger.info("%s OK (%d rates)", name, len(pairs))
-            all_pairs.update(pairs)
-            source = name
-            append_history(pairs, source=source)
-            write_snapshot(pairs, source=source)
+            # У HedgedClient источник - провайдер, чей ответ был принят
+            accepted = self.store(
+                pairs, client.source, client.config.CRYPTO_CURRENCIES
+            )
+            all_pairs.update(accepted)
+            quarantined += len(pairs) - len(accepted)
 
         result = {
             "total_rates": len(all_pairs),
             "errors": errors,
+            "skipped": skipped,
+            "quarantined": quarantined,
         }
+
+        if all_pairs:
+            self._notify(all_pairs)
+
+        metrics = get_metrics()
+        metrics.histogram(
+            "valutatrade_rates_update_seconds", "RatesUpdater.run_update duration"
+        ).observe(time.perf_counter() - started)
+        metrics.counter(
+            "valutatrade_rates_updates_total", "Rate update runs by outcome"
+        ).inc(outcome="partial" if errors else "ok")
         if errors:
             logger.info(
                 "Update completed with errors. Total rates: %d",
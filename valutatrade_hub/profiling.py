@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import cProfile
+import logging
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+from .infra.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def _report_path(kind: str, command: str, suffix: str) -> Path:
+    logs_dir = Path(get_settings().get("LOG_DIR", "logs"))
+    logs_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%dT%H%M%S")
+    return logs_dir / f"{kind}-{command}-{stamp}{suffix}"
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def write_allocation_report(
+        path: Path,
+        snapshot: tracemalloc.Snapshot,
+        top_n: int,
+        baseline: Optional[tracemalloc.Snapshot] = None,
+) -> list:
+    # Топ-N мест выделения памяти (или прироста относительно baseline)
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, cProfile.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    if baseline is not None:
+        stats = snapshot.compare_to(baseline, "lineno")[:top_n]
+    else:
+        stats = snapshot.statistics("lineno")[:top_n]
+    with path.open("w", encoding="utf-8") as f:
+        for stat in stats:
+            f.write(f"{stat}\n")
+    return stats
+
+
+@contextmanager
+def profile_command(
+        command: str,
+        profile: bool = False,
+        trace_mem: bool = False,
+        top_n: Optional[int] = None,
+) -> Iterator[None]:
+    # Запуск команды под cProfile и/или tracemalloc с отчётами в LOG_DIR
+    if not profile and not trace_mem:
+        yield
+        return
+
+    top_n = top_n or int(get_settings().get("PROFILE_TOP_N", 20))
+    profiler = cProfile.Profile() if profile else None
+    started_tracing = trace_mem and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler:
+            profiler.disable()
+        elapsed = time.perf_counter() - started
+        # Снимок памяти до того, как отчёт профайлера начнёт выделять свою
+        snapshot = tracemalloc.take_snapshot() if trace_mem else None
+        lines = [f"[profile] {command}: {elapsed * 1000:.1f} ms"]
+
+        if profiler:
+            path = _report_path("profile", command, ".pstats")
+            profiler.dump_stats(str(path))
+            lines.append(f"[profile] pstats: {path}")
+            # Топ-5 функций по кумулятивному времени
+            entries = sorted(
+                pstats.Stats(profiler).stats.items(),  # type: ignore[attr-defined]
+                key=lambda item: item[1][3],
+                reverse=True,
+            )[:5]
+            for (filename, lineno, func), (_, ncalls, _, cumtime, _) in entries:
+                lines.append(
+                    f"  {cumtime * 1000:9.1f} ms {ncalls:>7} calls  "
+                    f"{func} ({Path(filename).name}:{lineno})"
+                )
+
+        if snapshot is not None:
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            path = _report_path("tracemem", command, ".txt")
+            top = write_allocation_report(path, snapshot, top_n)
+            lines.append(
+                f"[trace-mem] current {_format_size(current)}, "
+                f"peak {_format_size(peak)}, top {top_n}: {path}"
+            )
+            lines.extend(f"  {stat}" for stat in top[:3])
+
+        print("\n".join(lines))
+
+
+class MemoryWatcher:
+    # Периодические снимки tracemalloc для долгих процессов (run-scheduler):
+    # каждые `every` циклов пишет топ прироста относительно первого снимка
+    def __init__(self, every: int, top_n: Optional[int] = None) -> None:
+        self.every = max(1, every)
+        self.top_n = top_n or int(get_settings().get("PROFILE_TOP_N", 20))
+        self._cycle = 0
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def tick(self) -> None:
+        self._cycle += 1
+        if self._baseline is None:
+            self._baseline = tracemalloc.take_snapshot()
+            return
+        if self._cycle % self.every:
+            return
+
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        path = _report_path("tracemem", f"scheduler-cycle{self._cycle}", ".txt")
+        top = write_allocation_report(path, snapshot, self.top_n, self._baseline)
+        growth = sum(stat.size_diff for stat in top)
+        logger.info(
+            "Memory snapshot cycle=%d current=%s peak=%s top%d_growth=%s report=%s",
+            self._cycle,
+            _format_size(current),
+            _format_size(peak),
+            self.top_n,
+            _format_size(growth),
+            path,
+        )
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from ..core.exceptions import (
+    ApiRequestError,
+    CurrencyNotFoundError,
+    InsufficientFundsError,
+)
+from ..infra.database import DatabaseManager
+from ..infra.settings import get_settings
+from ..metrics import get_metrics
+from .service import CachedStore, TradingService
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/api/"
+
+
+class PooledHTTPServer(HTTPServer):
+    # HTTPServer, который обрабатывает соединения в фиксированном пуле потоков
+    # (ThreadingHTTPServer создаёт поток на каждый запрос)
+    request_queue_size = 128
+
+    def __init__(
+            self,
+            address: Tuple[str, int],
+            service: TradingService,
+            workers: int = 8,
+    ) -> None:
+        super().__init__(address, ApiRequestHandler)
+        self.service = service
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="valutatrade-worker",
+        )
+
+    def process_request(self, request: Any, client_address: Any) -> None:
+        self._pool.submit(self._process_in_worker, request, client_address)
+
+    def _process_in_worker(self, request: Any, client_address: Any) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    # POST /api/<команда> с JSON-телом, токен сессии в Authorization: Bearer
+    server: PooledHTTPServer
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_payload(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        if not isinstance(payload, dict):
+            raise ValueError("Тело запроса должно быть JSON-объектом")
+        return payload
+
+    def _token(self, payload: Dict[str, Any]) -> Optional[str]:
+        auth = self.headers.get("Authorization", "")
+        if auth.startswith("Bearer "):
+            return auth[len("Bearer "):].strip()
+        return payload.get("token")
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, {"ok": True})
+        elif self.path == "/metrics":
+            data = get_metrics().render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {"ok": False, "message": "Not found"})
+
+    def do_POST(self) -> None:
+        if not self.path.startswith(API_PREFIX):
+            self._send_json(404, {"ok": False, "message": "Not found"})
+            return
+        command = self.path[len(API_PREFIX):].strip("/")
+
+        try:
+            payload = self._read_payload()
+            result = self.server.service.dispatch(
+                command, payload, token=self._token(payload)
+            )
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            self._send_json(400, {"ok": False, "message": "Некорректный JSON"})
+        except KeyError as exc:
+            self._send_json(
+                400, {"ok": False, "message": f"Не указано поле {exc}"}
+            )
+        except LookupError as exc:
+            self._send_json(404, {"ok": False, "message": str(exc)})
+        except PermissionError as exc:
+            self._send_json(401, {"ok": False, "message": str(exc)})
+        except CurrencyNotFoundError as exc:
+            self._send_json(404, {"ok": False, "message": str(exc)})
+        except (InsufficientFundsError, ValueError, TypeError) as exc:
+            self._send_json(400, {"ok": False, "message": str(exc)})
+        except ApiRequestError as exc:
+            self._send_json(502, {"ok": False, "message": str(exc)})
+        except Exception as exc:
+            logger.exception("Unhandled error in %s", command)
+            self._send_json(500, {"ok": False, "message": str(exc)})
+        else:
+            self._send_json(200 if result.get("ok") else 409, result)
+
+
+def create_server(
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+) -> PooledHTTPServer:
+    settings = get_settings()
+    host = host or settings.get("SERVER_HOST", "127.0.0.1")
+    port = int(port if port is not None else settings.get("SERVER_PORT", 8765))
+    workers = int(workers or settings.get("SERVER_WORKERS", 8))
+
+    store = CachedStore(DatabaseManager())
+    service = TradingService(
+        store,
+        session_ttl=int(settings.get("SESSION_TTL_SECONDS", 3600)),
+    )
+    return PooledHTTPServer((host, port), service, workers=workers)
+
+
+def serve(
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        workers: Optional[int] = None,
+) -> None:
+    server = create_server(host, port, workers)
+    host, port = server.server_address[:2]
+    logger.info("API server listening on http://%s:%s", host, port)
+    print(f"Server started on http://{host}:{port}. Press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("API server stopped by user.")
+        print("\nServer stopped.")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,302 @@
+from __future__ import annotations
+
+import secrets
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..core.durability import deferred_commit
+from ..core.models import Portfolio, User
+from ..core.rates import RatesIndex
+from ..core.valuation import ValuationCache
+from ..core.usecases import (
+    authenticate_user,
+    buy_currency,
+    convert_currency,
+    get_portfolio_risk,
+    get_portfolio_valuation,
+    get_rate,
+    register_user,
+    sell_currency,
+)
+from ..infra.database import DatabaseManager
+
+
+def _file_sig(path: Path) -> Optional[tuple]:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class CachedStore:
+    # Общий для всех потоков кеш пользователей, портфелей и курсов.
+    # Повторяет интерфейс DatabaseManager, который используют usecases,
+    # чтение идёт из памяти, запись - в память и сразу на диск. Файлы
+    # перечитываются, если их изменил другой процесс (CLI, run-scheduler,
+    # import-users): иначе запись из памяти затёрла бы его изменения
+    def __init__(self, db: DatabaseManager) -> None:
+        self._db = db
+        self.settings = db.settings
+        self.valuation_cache = ValuationCache(
+            int(self.settings.get("VALUATION_CACHE_SIZE", 1024))
+        )
+        self._write_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._portfolios_generation = 0
+        self._flushed_generation = 0
+        # user_id -> поколение изменения, ещё не записанного на диск
+        self._unflushed: Dict[int, int] = {}
+        self._users_sig = _file_sig(db.users_file)
+        self._users: Dict[str, User] = {u.username: u for u in db.load_users()}
+        self._portfolios_sig = _file_sig(db.portfolios_file)
+        self._portfolios: Dict[int, Portfolio] = {
+            p.user_id: p for p in db.load_portfolios()
+        }
+
+    def _sync_users(self) -> None:
+        # Под _write_lock
+        sig = _file_sig(self._db.users_file)
+        if sig != self._users_sig:
+            self._users = {u.username: u for u in self._db.load_users()}
+            self._users_sig = sig
+
+    def _sync_portfolios(self) -> None:
+        # Под _write_lock. С диска берутся все портфели, кроме изменённых
+        # здесь и ещё не записанных
+        sig = _file_sig(self._db.portfolios_file)
+        if sig != self._portfolios_sig:
+            portfolios = {p.user_id: p for p in self._db.load_portfolios()}
+            for user_id in self._unflushed:
+                portfolios[user_id] = self._portfolios[user_id]
+            self._portfolios = portfolios
+            self._portfolios_sig = sig
+
+    def _fresh_users(self) -> Dict[str, User]:
+        if _file_sig(self._db.users_file) != self._users_sig:
+            with self._write_lock:
+                self._sync_users()
+        return self._users
+
+    def _fresh_portfolios(self) -> Dict[int, Portfolio]:
+        if _file_sig(self._db.portfolios_file) != self._portfolios_sig:
+            with self._write_lock:
+                self._sync_portfolios()
+        return self._portfolios
+
+    def load_users(self) -> List[User]:
+        return list(self._fresh_users().values())
+
+    def get_user_by_username(self, username: str) -> Optional[User]:
+        return self._fresh_users().get(username)
+
+    def save_user(self, user: User) -> None:
+        # fsync (DURABILITY=group) ждём уже без блокировки
+        with deferred_commit(), self._write_lock:
+            self._sync_users()
+            self._users[user.username] = user
+            self._db.save_users(list(self._users.values()))
+            self._users_sig = _file_sig(self._db.users_file)
+
+    def allocate_user_ids(self, count: int = 1) -> range:
+        return self._db.allocate_user_ids(count)
+
+    def load_portfolios(self) -> List[Portfolio]:
+        return [Portfolio(**p.to_dict()) for p in self._fresh_portfolios().values()]
+
+    def get_portfolio_by_user_id(self, user_id: int) -> Optional[Portfolio]:
+        portfolio = self._fresh_portfolios().get(user_id)
+        if portfolio is None:
+            return None
+        # Копия: usecases меняют кошельки до save_portfolio,
+        # в кеш попадает только сохранённое состояние
+        return Portfolio(**portfolio.to_dict())
+
+    def save_portfolio(self, portfolio: Portfolio) -> None:
+        self.update_portfolios([portfolio])
+
+    def update_portfolios(self, portfolios: Iterable[Portfolio]) -> None:
+        # Несколько портфелей - одна запись portfolios.json
+        with deferred_commit():
+            with self._write_lock:
+                self._sync_portfolios()
+                self._portfolios_generation += 1
+                generation = self._portfolios_generation
+                for portfolio in portfolios:
+                    stored = self._portfolios.get(portfolio.user_id)
+                    portfolio.bump_version(stored.version if stored else 0)
+                    self._portfolios[portfolio.user_id] = portfolio
+                    self._unflushed[portfolio.user_id] = generation
+            self._flush_portfolios(generation)
+
+    def _flush_portfolios(self, generation: int) -> None:
+        # Групповая запись portfolios.json: запись, начатая после нашего
+        # изменения, уже содержит его - тогда своя не нужна. Сделки разных
+        # пользователей не ждут друг друга на каждом rename. Перед записью
+        # файл сливается с изменениями других процессов по user_id
+        with self._flush_lock:
+            if self._flushed_generation >= generation:
+                return
+            with self._write_lock:
+                self._sync_portfolios()
+                portfolios = list(self._portfolios.values())
+                latest = self._portfolios_generation
+            self._db.save_portfolios(portfolios)
+            with self._write_lock:
+                self._portfolios_sig = _file_sig(self._db.portfolios_file)
+                self._unflushed = {
+                    user_id: gen
+                    for user_id, gen in self._unflushed.items()
+                    if gen > latest
+                }
+            self._flushed_generation = latest
+
+    def get_rates_index(self) -> RatesIndex:
+        # Индекс перечитывается с диска только при изменении rates.json,
+        # поэтому курсы от update-rates/run-scheduler видны без перезапуска
+        return self._db.get_rates_index()
+
+    def get_rates_snapshot(self) -> dict:
+        index = self.get_rates_index()
+        return {
+            "pairs": index.pairs,
+            "last_refresh": index.last_refresh,
+            "version": index.version,
+        }
+
+
+class TradingService:
+    # Многосессионный фасад над usecases: токены сессий вместо глобального
+    # _current_username и блокировка на пользователя для сделок
+    def __init__(self, store: CachedStore, session_ttl: int = 3600) -> None:
+        self.store = store
+        self.session_ttl = session_ttl
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._sessions_lock = threading.Lock()
+        self._user_locks: Dict[str, threading.Lock] = {}
+        self._user_locks_guard = threading.Lock()
+        # Проверка занятости имени и запись пользователя - атомарно
+        self._register_lock = threading.Lock()
+
+    def _user_lock(self, username: str) -> threading.Lock:
+        lock = self._user_locks.get(username)
+        if lock is None:
+            with self._user_locks_guard:
+                lock = self._user_locks.setdefault(username, threading.Lock())
+        return lock
+
+    def resolve_session(self, token: Optional[str]) -> str:
+        if not token:
+            raise PermissionError("Сначала выполните login")
+        with self._sessions_lock:
+            entry = self._sessions.get(token)
+            if entry is None:
+                raise PermissionError("Сессия не найдена, выполните login")
+            username, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._sessions[token]
+                raise PermissionError("Сессия истекла, выполните login заново")
+        return username
+
+    def register(self, username: str, password: str) -> Dict[str, Any]:
+        with self._register_lock:
+            if self.store.get_user_by_username(username):
+                return {
+                    "ok": False,
+                    "message": f"Имя пользователя '{username}' уже занято",
+                }
+            msg = register_user(username=username, password=password, db=self.store)
+            ok = self.store.get_user_by_username(username) is not None
+        return {"ok": ok, "message": msg}
+
+    def login(self, username: str, password: str) -> Dict[str, Any]:
+        user, msg = authenticate_user(username, password, db=self.store)
+        if user is None:
+            raise PermissionError(msg)
+        token = secrets.token_hex(16)
+        with self._sessions_lock:
+            self._sessions[token] = (
+                user.username,
+                time.monotonic() + self.session_ttl,
+            )
+        return {"ok": True, "message": msg, "token": token}
+
+    def logout(self, token: Optional[str]) -> Dict[str, Any]:
+        with self._sessions_lock:
+            self._sessions.pop(token or "", None)
+        return {"ok": True, "message": "Вы вышли из системы"}
+
+    def buy(self, token: Optional[str], currency: str, amount: float) -> Dict[str, Any]:
+        username = self.resolve_session(token)
+        with self._user_lock(username):
+            msg = buy_currency(
+                currency_code=currency,
+                amount=amount,
+                username=username,
+                db=self.store,
+            )
+        return {"ok": True, "message": msg}
+
+    def sell(self, token: Optional[str], currency: str, amount: float) -> Dict[str, Any]:
+        username = self.resolve_session(token)
+        with self._user_lock(username):
+            msg = sell_currency(
+                currency_code=currency,
+                amount=amount,
+                username=username,
+                db=self.store,
+            )
+        return {"ok": True, "message": msg}
+
+    def convert(self, from_code: str, to_code: str, amount: float) -> Dict[str, Any]:
+        msg = convert_currency(from_code, to_code, amount, db=self.store)
+        return {"ok": True, "message": msg}
+
+    def show_portfolio(self, token: Optional[str], base: str = "USD") -> Dict[str, Any]:
+        username = self.resolve_session(token)
+        with self._user_lock(username):
+            valuation = get_portfolio_valuation(base, username=username, db=self.store)
+        if valuation is None:
+            return {"ok": False, "message": "Портфель не найден"}
+        return {"ok": True, "portfolio": valuation}
+
+    def risk(self, token: Optional[str], window: str = "30d") -> Dict[str, Any]:
+        username = self.resolve_session(token)
+        report = get_portfolio_risk(window, username=username, db=self.store)
+        if report is None:
+            return {"ok": False, "message": "Портфель не найден"}
+        return {"ok": True, "risk": report}
+
+    def get_rate(self, from_code: str, to_code: str) -> Dict[str, Any]:
+        return {"ok": True, "message": get_rate(from_code, to_code, db=self.store)}
+
+    def dispatch(
+            self,
+            command: str,
+            payload: Dict[str, Any],
+            token: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        # Имена команд совпадают с командами CLI
+        if command == "register":
+            return self.register(payload["username"], payload["password"])
+        if command == "login":
+            return self.login(payload["username"], payload["password"])
+        if command == "logout":
+            return self.logout(token)
+        if command == "buy":
+            return self.buy(token, payload["currency"], float(payload["amount"]))
+        if command == "sell":
+            return self.sell(token, payload["currency"], float(payload["amount"]))
+        if command == "convert":
+            return self.convert(
+                payload["from"], payload["to"], float(payload["amount"])
+            )
+        if command == "show-portfolio":
+            return self.show_portfolio(token, payload.get("base", "USD"))
+        if command == "get-rate":
+            return self.get_rate(payload["from"], payload["to"])
+        if command == "risk":
+            return self.risk(token, payload.get("window", "30d"))
+        raise LookupError(f"Неизвестная команда '{command}'")
@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Запись нагрузки: VALUTA_RECORD_WORKLOAD=path/to/workload.jsonl (настройка
+# WORKLOAD_RECORD_FILE). Каждая команда run_cli - строка JSON:
+#   {"ts": 1760000000.12, "seconds": 0.0031, "argv": ["buy", ...],
+#    "ok": true, "session": 4242}
+# ts - время начала (для темпа воспроизведения), seconds - длительность,
+# session - pid процесса CLI. Пароли заменяются на REDACTED
+
+REDACTED = "<redacted>"
+# Подставляется вместо REDACTED при воспроизведении: register и login
+# одной нагрузки получают одинаковый пароль
+REPLAY_PASSWORD = "replay-secret"
+_SECRET_OPTIONS = ("--password",)
+
+# Не воспроизводятся никогда (работают до Ctrl+C) и по умолчанию (сеть)
+LONG_RUNNING = frozenset({"run-scheduler", "serve", "stream-rates", "simulate-feed"})
+NETWORK = frozenset({"update-rates"})
+
+
+def redact(tokens: Iterable[str]) -> List[str]:
+    result: List[str] = []
+    secret_next = False
+    for token in tokens:
+        if secret_next and not token.startswith("--"):
+            result.append(REDACTED)
+            secret_next = False
+            continue
+        secret_next = token in _SECRET_OPTIONS
+        option, sep, _ = token.partition("=")
+        if sep and option in _SECRET_OPTIONS:
+            token = f"{option}={REDACTED}"
+        result.append(token)
+    return result
+
+
+class WorkloadRecorder:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _append(self, entry: dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Одна запись в режиме append: строки нескольких процессов CLI
+            # не перемешиваются
+            with self._lock, self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as exc:
+            logger.warning("Failed to record workload to %s: %s", self.path, exc)
+
+    @contextmanager
+    def record(self, tokens: List[str]) -> Iterator[None]:
+        ts = time.time()
+        started = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self._append({
+                "ts": round(ts, 6),
+                "seconds": round(time.perf_counter() - started, 6),
+                "argv": redact(tokens),
+                "ok": ok,
+                "session": os.getpid(),
+            })
+
+
+_RECORDER: Optional[WorkloadRecorder] = None
+
+
+def get_recorder() -> Optional[WorkloadRecorder]:
+    global _RECORDER
+    from .infra.settings import get_settings
+
+    path = get_settings().get("WORKLOAD_RECORD_FILE")
+    if not path:
+        return None
+    if _RECORDER is None or _RECORDER.path != Path(path):
+        _RECORDER = WorkloadRecorder(Path(path))
+    return _RECORDER
+
+
+def load_workload(path: Path) -> List[dict]:
+    entries = []
+    with path.open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                if entry["argv"]:
+                    entries.append(entry)
+            except (ValueError, KeyError, TypeError):
+                logger.warning("Skipping malformed workload line %d", lineno)
+    entries.sort(key=lambda entry: entry.get("ts", 0))
+    return entries
+
+
+def replay(
+        entries: List[dict],
+        run: Callable[[List[str]], None],
+        speed: Optional[float] = 1.0,
+        include_network: bool = False,
+) -> dict:
+    # speed=1 - исходный темп (по ts), 10 - в 10 раз быстрее,
+    # None - без пауз. Команда, не успевшая к своему времени, идёт сразу
+    skip = LONG_RUNNING if include_network else LONG_RUNNING | NETWORK
+    latencies: Dict[str, List[float]] = {}
+    skipped = errors = 0
+    first_ts = entries[0].get("ts", 0) if entries else 0
+    started = time.perf_counter()
+    for entry in entries:
+        argv = [t.replace(REDACTED, REPLAY_PASSWORD) for t in entry["argv"]]
+        if argv[0] in skip:
+            skipped += 1
+            continue
+        if speed:
+            due = (entry.get("ts", first_ts) - first_ts) / speed
+            delay = due - (time.perf_counter() - started)
+            if delay > 0:
+                time.sleep(delay)
+        command_started = time.perf_counter()
+        try:
+            run(argv)
+        except Exception as exc:
+            # Упавшая команда быстрее настоящей - считаем отдельно
+            errors += 1
+            logger.warning("Replayed command %s failed: %s", argv[0], exc)
+        latencies.setdefault(argv[0], []).append(
+            time.perf_counter() - command_started
+        )
+    return {
+        "latencies": latencies,
+        "wall_seconds": time.perf_counter() - started,
+        "skipped": skipped,
+        "errors": errors,
+    }
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    # Ближайший ранг: одинаковые данные дают одинаковый результат
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def _stats(values: List[float]) -> dict:
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": _percentile(values, 50) * 1000,
+        "p95_ms": _percentile(values, 95) * 1000,
+        "p99_ms": _percentile(values, 99) * 1000,
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+    }
+
+
+def summarize(result: dict) -> dict:
+    latencies = result["latencies"]
+    everything = [v for values in latencies.values() for v in values]
+    wall = result["wall_seconds"]
+    return {
+        "commands": {cmd: _stats(values) for cmd, values in sorted(latencies.items())},
+        "overall": _stats(everything),
+        "throughput_per_s": len(everything) / wall if wall else 0.0,
+        "wall_seconds": wall,
+        "skipped": result["skipped"],
+        "errors": result["errors"],
+    }
+
+
+def _delta(value: float, base: Optional[float]) -> str:
+    if not base:
+        return ""
+    return f" ({(value - base) / base * 100:+.0f}%)"
+
+
+def format_summary(summary: dict, baseline: Optional[dict] = None) -> str:
+    # baseline - summary прошлого прогона (--compare): рядом с p50/p99
+    # печатается изменение в процентах
+    base_cmds = (baseline or {}).get("commands", {})
+    lines = [
+        f"{'command':<16} {'count':>6} {'p50 ms':>16} {'p95 ms':>9} {'p99 ms':>16}"
+    ]
+    rows = list(summary["commands"].items()) + [("ALL", summary["overall"])]
+    for cmd, stats in rows:
+        base = base_cmds.get(cmd) if cmd != "ALL" else (baseline or {}).get("overall")
+        base = base or {}
+        p50 = f"{stats['p50_ms']:.2f}{_delta(stats['p50_ms'], base.get('p50_ms'))}"
+        p99 = f"{stats['p99_ms']:.2f}{_delta(stats['p99_ms'], base.get('p99_ms'))}"
+        lines.append(
+            f"{cmd:<16} {stats['count']:>6} {p50:>16} "
+            f"{stats['p95_ms']:>9.2f} {p99:>16}"
+        )
+    throughput = summary["throughput_per_s"]
+    base_tp = (baseline or {}).get("throughput_per_s")
+    lines.append(
+        f"throughput: {throughput:.1f} cmd/s{_delta(throughput, base_tp)}, "
+        f"wall {summary['wall_seconds']:.2f} s, skipped {summary['skipped']}, "
+        f"errors {summary.get('errors', 0)}"
+    )
+    return "\n".join(lines)